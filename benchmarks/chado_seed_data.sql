@@ -0,0 +1,183 @@
+-- Seed data for the chado subset: the controlled vocabulary, dbs and
+-- organisms that the python bulk reports filter on, plus a handful of
+-- Dmel features on a small chromosome arm so that every report has rows.
+-- Volume for scale tests is added by benchmarks/generate_synthetic_chado.py.
+
+SET search_path = public;
+
+-- Return the cvterm_id for a term, creating the cv, db, dbxref and cvterm as needed.
+CREATE OR REPLACE FUNCTION bench_cvterm(cv_name text, term_name text, db_name text DEFAULT 'FlyBase_internal',
+                                        term_accession text DEFAULT NULL) RETURNS integer AS $$
+DECLARE
+    this_cv_id integer;
+    this_db_id integer;
+    this_dbxref_id integer;
+    this_cvterm_id integer;
+BEGIN
+    INSERT INTO cv (name) VALUES (cv_name) ON CONFLICT (name) DO NOTHING;
+    SELECT cv_id INTO this_cv_id FROM cv WHERE name = cv_name;
+    SELECT cvterm_id INTO this_cvterm_id FROM cvterm WHERE cv_id = this_cv_id AND name = term_name AND is_obsolete = 0;
+    IF this_cvterm_id IS NOT NULL THEN
+        RETURN this_cvterm_id;
+    END IF;
+    INSERT INTO db (name) VALUES (db_name) ON CONFLICT (name) DO NOTHING;
+    SELECT db_id INTO this_db_id FROM db WHERE name = db_name;
+    INSERT INTO dbxref (db_id, accession) VALUES (this_db_id, COALESCE(term_accession, cv_name || ':' || term_name))
+        RETURNING dbxref_id INTO this_dbxref_id;
+    INSERT INTO cvterm (cv_id, name, dbxref_id) VALUES (this_cv_id, term_name, this_dbxref_id)
+        RETURNING cvterm_id INTO this_cvterm_id;
+    RETURN this_cvterm_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Databases referenced by name in the reports.
+INSERT INTO db (name) VALUES
+    ('FlyBase'), ('FlyBase_internal'), ('FlyBase Annotation IDs'), ('SO'), ('GO'), ('EC'), ('MetaCyc'), ('FBbt'),
+    ('FBdv'), ('FBcv'), ('DOID'), ('pubmed'), ('PMCID'), ('GB'), ('GB_protein'), ('REFSEQ'), ('MIR'), ('UniProt/Swiss-Prot'),
+    ('UniProt/TrEMBL'), ('UniProt/GCRP'), ('RNAcentral'), ('INTERACTIVEFLY'), ('CHEBI'), ('PubChem'), ('HGNC'), ('OMIM_PHENOTYPE'),
+    ('psi-mi'), ('OrthoDB'), ('NCBITaxon'), ('EntrezGene')
+ON CONFLICT (name) DO NOTHING;
+
+-- Organisms.
+INSERT INTO organism (abbreviation, genus, species, common_name) VALUES
+    ('Dmel', 'Drosophila', 'melanogaster', 'fruit fly'),
+    ('Hsap', 'Homo', 'sapiens', 'human'),
+    ('Dsim', 'Drosophila', 'simulans', NULL),
+    ('Scer', 'Saccharomyces', 'cerevisiae', 'yeast'),
+    ('ssss', 'Unknown', 'unknown', NULL);
+INSERT INTO organismprop (organism_id, type_id, value)
+    SELECT organism_id, bench_cvterm('property type', 'taxgroup'), 'drosophilid'
+    FROM organism WHERE genus = 'Drosophila';
+
+-- Controlled vocabulary: (cv, term, db) triples.
+SELECT bench_cvterm(t.cv, t.term, t.db) FROM (VALUES
+    ('SO', 'gene', 'SO'), ('SO', 'mRNA', 'SO'), ('SO', 'ncRNA', 'SO'), ('SO', 'pre_miRNA', 'SO'), ('SO', 'miRNA', 'SO'),
+    ('SO', 'tRNA', 'SO'), ('SO', 'rRNA', 'SO'), ('SO', 'snRNA', 'SO'), ('SO', 'snoRNA', 'SO'), ('SO', 'lncRNA', 'SO'),
+    ('SO', 'pseudogene', 'SO'), ('SO', 'polypeptide', 'SO'), ('SO', 'protein', 'SO'), ('SO', 'CDS', 'SO'), ('SO', 'exon', 'SO'),
+    ('SO', 'chromosome_arm', 'SO'), ('SO', 'golden_path', 'SO'), ('SO', 'golden_path_region', 'SO'), ('SO', 'chromosome', 'SO'),
+    ('SO', 'allele', 'SO'), ('SO', 'transgenic_transposable_element', 'SO'), ('SO', 'engineered_plasmid', 'SO'),
+    ('SO', 'transposable_element_insertion_site', 'SO'), ('SO', 'insertion_site', 'SO'),
+    ('SO', 'chromosome_structure_variation', 'SO'), ('SO', 'protein_coding_gene', 'SO'), ('SO', 'lncRNA_gene', 'SO'),
+    ('SO', 'antisense_lncRNA_gene', 'SO'), ('SO', 'SRP_RNA_gene', 'SO'), ('SO', 'sgRNA', 'SO'),
+    ('relationship type', 'partof', 'FlyBase_internal'), ('relationship type', 'producedby', 'FlyBase_internal'),
+    ('relationship type', 'alleleof', 'FlyBase_internal'), ('relationship type', 'associated_with', 'FlyBase_internal'),
+    ('relationship type', 'belongs_to', 'FlyBase_internal'), ('relationship type', 'has_component_gene', 'FlyBase_internal'),
+    ('relationship type', 'encoded_by', 'FlyBase_internal'), ('relationship type', 'member_gene_of', 'FlyBase_internal'),
+    ('relationship type', 'paralogous_to', 'FlyBase_internal'), ('relationship type', 'orthologous_to', 'FlyBase_internal'),
+    ('relationship type', 'tool_uses', 'FlyBase_internal'), ('relationship type', 'propagate_transgenic_uses', 'FlyBase_internal'),
+    ('relationship type', 'is_a', 'FlyBase_internal'),
+    ('synonym type', 'symbol', 'FlyBase_internal'), ('synonym type', 'fullname', 'FlyBase_internal'),
+    ('pub type', 'paper', 'FlyBase_internal'), ('pub type', 'review', 'FlyBase_internal'),
+    ('pub type', 'computer file', 'FlyBase_internal'), ('pub type', 'personal communication to FlyBase', 'FlyBase_internal'),
+    ('pub type', 'database', 'FlyBase_internal'),
+    ('property type', 'annotation_ID', 'FlyBase_internal'), ('property type', 'gene_summary_text', 'FlyBase_internal'),
+    ('property type', 'if_summary', 'FlyBase_internal'), ('property type', 'UniProt_Function_comment', 'FlyBase_internal'),
+    ('property type', 'description', 'FlyBase_internal'), ('property type', 'evidence_code', 'FlyBase_internal'),
+    ('property type', 'ec_description', 'FlyBase_internal'), ('property type', 'provenance', 'FlyBase_internal'),
+    ('property type', 'date', 'FlyBase_internal'), ('property type', 'derived_pheno_class', 'FlyBase_internal'),
+    ('property type', 'derived_pheno_manifest', 'FlyBase_internal'), ('property type', 'aminoacid_rep', 'FlyBase_internal'),
+    ('property type', 'molecular_info', 'FlyBase_internal'), ('property type', 'nucleotide_sub', 'FlyBase_internal'),
+    ('property type', 'comment', 'FlyBase_internal'), ('property type', 'webcv', 'FlyBase_internal'),
+    ('property type', 'transgenic_product_class', 'FlyBase_internal'),
+    ('library_featureprop type', 'mean_expr', 'FlyBase_internal'), ('library_featureprop type', 'spread', 'FlyBase_internal'),
+    ('library_featureprop type', 'RPKM', 'FlyBase_internal'), ('library_featureprop type', 'TPM', 'FlyBase_internal'),
+    ('library_featureprop type', 'FPKM', 'FlyBase_internal'),
+    ('library_featureprop type', 'testis_specificity_index_score', 'FlyBase_internal'),
+    ('FlyBase miscellaneous CV', 'result', 'FBcv'), ('FlyBase miscellaneous CV', 'project', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'biosample', 'FBcv'), ('FlyBase miscellaneous CV', 'cell clustering analysis', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'transcriptional cell cluster', 'FBcv'), ('FlyBase miscellaneous CV', 'anatomy', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'stage', 'FBcv'), ('FlyBase miscellaneous CV', 'derived_stage', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'derived_anatomy', 'FBcv'), ('FlyBase miscellaneous CV', 'adult stage', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'female', 'FBcv'), ('FlyBase miscellaneous CV', 'male', 'FBcv'),
+    ('FlyBase miscellaneous CV', 'mixed sex', 'FBcv'),
+    ('FlyBase anatomy CV', 'organism', 'FBbt'), ('FlyBase anatomy CV', 'neuron', 'FBbt'), ('FlyBase anatomy CV', 'glial cell', 'FBbt'),
+    ('FlyBase anatomy CV', 'muscle cell', 'FBbt'), ('FlyBase anatomy CV', 'epithelial cell', 'FBbt'),
+    ('FlyBase development CV', 'embryonic stage', 'FBdv'), ('FlyBase development CV', 'larval stage', 'FBdv'),
+    ('FlyBase development CV', 'adult stage', 'FBdv'),
+    ('molecular_function', 'catalytic activity', 'GO'), ('molecular_function', 'protein binding', 'GO'),
+    ('molecular_function', 'kinase activity', 'GO'), ('molecular_function', 'hydrolase activity', 'GO'),
+    ('biological_process', 'metabolic process', 'GO'), ('biological_process', 'signal transduction', 'GO'),
+    ('cellular_component', 'nucleus', 'GO'), ('cellular_component', 'cytoplasm', 'GO'),
+    ('disease_ontology', 'cancer', 'DOID'), ('disease_ontology', 'Parkinson''s disease', 'DOID'),
+    ('PSI-MI', 'physical association', 'psi-mi'), ('PSI-MI', 'two hybrid', 'psi-mi'), ('PSI-MI', 'bait', 'psi-mi'),
+    ('PSI-MI', 'prey', 'psi-mi'), ('PSI-MI', 'protein', 'psi-mi'), ('PSI-MI', 'interaction_group', 'psi-mi'),
+    ('interaction property type', 'comment', 'FlyBase_internal'), ('interaction property type', 'interacting isoforms', 'FlyBase_internal'),
+    ('feature_interaction property type', 'participating feature', 'FlyBase_internal'),
+    ('genotype_feature type', 'single balancer', 'FlyBase_internal'),
+    ('phenotype type', 'phenotype', 'FlyBase_internal')
+) AS t (cv, term, db);
+
+-- GO accessions (FlyCyc projects GO:nnnnnnn; EC and MetaCyc mappings hang off the GO term dbxref).
+UPDATE dbxref SET accession = '0003824' WHERE accession = 'molecular_function:catalytic activity';
+UPDATE dbxref SET accession = '0005515' WHERE accession = 'molecular_function:protein binding';
+UPDATE dbxref SET accession = '0016301' WHERE accession = 'molecular_function:kinase activity';
+UPDATE dbxref SET accession = '0016787' WHERE accession = 'molecular_function:hydrolase activity';
+UPDATE dbxref SET accession = '0008152' WHERE accession = 'biological_process:metabolic process';
+UPDATE dbxref SET accession = '0007165' WHERE accession = 'biological_process:signal transduction';
+UPDATE dbxref SET accession = '0005634' WHERE accession = 'cellular_component:nucleus';
+UPDATE dbxref SET accession = '0005737' WHERE accession = 'cellular_component:cytoplasm';
+
+-- Publications.
+INSERT INTO pub (uniquename, title, pyear, miniref, type_id) VALUES
+    ('FBrf0000001', 'Seed paper one.', '2001', 'Seed et al., 2001', bench_cvterm('pub type', 'paper')),
+    ('FBrf0000002', 'Seed paper two.', '2011', 'Seed et al., 2011', bench_cvterm('pub type', 'paper')),
+    ('FBrf0243181', 'Seed computer file.', '2019', 'Seed, 2019', bench_cvterm('pub type', 'computer file')),
+    ('unattributed', NULL, NULL, NULL, bench_cvterm('pub type', 'computer file'));
+INSERT INTO dbxref (db_id, accession) SELECT db_id, '10000001' FROM db WHERE name = 'pubmed';
+INSERT INTO pub_dbxref (pub_id, dbxref_id)
+    SELECT p.pub_id, dx.dbxref_id FROM pub p, dbxref dx JOIN db ON db.db_id = dx.db_id
+    WHERE p.uniquename = 'FBrf0000001' AND db.name = 'pubmed' AND dx.accession = '10000001';
+INSERT INTO pubauthor (pub_id, rank, surname, givennames)
+    SELECT pub_id, 1, 'Seed', 'A.' FROM pub WHERE uniquename LIKE 'FBrf%';
+
+-- A small chromosome arm with three genes, each with one transcript, CDS and polypeptide.
+INSERT INTO feature (organism_id, name, uniquename, residues, seqlen, type_id)
+    SELECT organism_id, '2L', '2L', repeat('ACGT', 2500), 10000, bench_cvterm('SO', 'golden_path')
+    FROM organism WHERE abbreviation = 'Dmel';
+INSERT INTO feature (organism_id, name, uniquename, type_id)
+    SELECT o.organism_id, f.name, f.uniquename, bench_cvterm('SO', f.type)
+    FROM organism o, (VALUES
+        ('seedA', 'FBgn0000001', 'gene'), ('seedB', 'FBgn0000002', 'gene'), ('seedC', 'FBgn0000003', 'gene'),
+        ('seedA-RA', 'FBtr0000001', 'mRNA'), ('seedB-RA', 'FBtr0000002', 'mRNA'), ('seedC-RA', 'FBtr0000003', 'ncRNA'),
+        ('seedA-PA', 'FBpp0000001', 'polypeptide'), ('seedB-PA', 'FBpp0000002', 'polypeptide'),
+        ('seedA-RA_CDS', 'FBtr0000001_CDS', 'CDS'), ('seedB-RA_CDS', 'FBtr0000002_CDS', 'CDS'),
+        ('seedA[1]', 'FBal0000001', 'allele')
+    ) AS f (name, uniquename, type)
+    WHERE o.abbreviation = 'Dmel';
+INSERT INTO featureloc (feature_id, srcfeature_id, fmin, fmax, strand)
+    SELECT f.feature_id, arm.feature_id, l.fmin, l.fmax, l.strand
+    FROM feature f, feature arm, (VALUES
+        ('FBgn0000001', 100, 2000, 1), ('FBgn0000002', 3000, 5000, -1), ('FBgn0000003', 6000, 6500, 1),
+        ('FBtr0000001', 100, 2000, 1), ('FBtr0000002', 3000, 5000, -1), ('FBtr0000003', 6000, 6500, 1),
+        ('FBpp0000001', 200, 1900, 1), ('FBpp0000002', 3100, 4900, -1),
+        ('FBtr0000001_CDS', 200, 1900, 1), ('FBtr0000002_CDS', 3100, 4900, -1)
+    ) AS l (uniquename, fmin, fmax, strand)
+    WHERE f.uniquename = l.uniquename AND arm.uniquename = '2L';
+INSERT INTO feature_relationship (subject_id, object_id, type_id)
+    SELECT s.feature_id, o.feature_id, bench_cvterm('relationship type', r.type)
+    FROM feature s, feature o, (VALUES
+        ('FBtr0000001', 'FBgn0000001', 'partof'), ('FBtr0000002', 'FBgn0000002', 'partof'),
+        ('FBtr0000003', 'FBgn0000003', 'partof'), ('FBpp0000001', 'FBtr0000001', 'producedby'),
+        ('FBpp0000002', 'FBtr0000002', 'producedby'), ('FBtr0000001_CDS', 'FBtr0000001', 'partof'),
+        ('FBtr0000002_CDS', 'FBtr0000002', 'partof'), ('FBal0000001', 'FBgn0000001', 'alleleof')
+    ) AS r (subject, object, type)
+    WHERE s.uniquename = r.subject AND o.uniquename = r.object;
+INSERT INTO synonym (name, synonym_sgml, type_id)
+    SELECT name, name, bench_cvterm('synonym type', 'symbol') FROM feature WHERE uniquename ~ '^FB[a-z]{2}[0-9]{7}$';
+INSERT INTO feature_synonym (synonym_id, feature_id, pub_id, is_current)
+    SELECT s.synonym_id, f.feature_id, p.pub_id, true
+    FROM feature f JOIN synonym s ON s.name = f.name, pub p
+    WHERE p.uniquename = 'FBrf0000001';
+INSERT INTO feature_pub (feature_id, pub_id)
+    SELECT f.feature_id, p.pub_id FROM feature f, pub p
+    WHERE f.uniquename ~ '^FB(gn|al)[0-9]{7}$' AND p.uniquename = 'FBrf0000001';
+INSERT INTO featureprop (feature_id, type_id, value)
+    SELECT feature_id, bench_cvterm('property type', 'annotation_ID'), 'CG' || substr(uniquename, 8)
+    FROM feature WHERE uniquename ~ '^FBgn[0-9]{7}$';
+INSERT INTO feature_cvterm (feature_id, cvterm_id, pub_id)
+    SELECT f.feature_id, cvt.cvterm_id, p.pub_id
+    FROM feature f, cvterm cvt JOIN cv ON cv.cv_id = cvt.cv_id, pub p
+    WHERE f.uniquename IN ('FBgn0000001', 'FBgn0000002') AND cv.name = 'molecular_function' AND p.uniquename = 'FBrf0000001';
+INSERT INTO feature_cvtermprop (feature_cvterm_id, type_id, value)
+    SELECT feature_cvterm_id, bench_cvterm('property type', 'evidence_code'), 'inferred from direct assay'
+    FROM feature_cvterm;
@@ -0,0 +1,642 @@
+-- Subset of the FlyBase chado schema used by the python bulk reports.
+-- Column names and types follow chado 1.x (plus FlyBase-specific modules:
+-- interaction groups, humanhealth, grp, library-centric tables), but only
+-- the tables that the scripts in src/ query are included. Loaded into an
+-- empty database by benchmarks/run_benchmarks.py (--load).
+
+DROP SCHEMA IF EXISTS public CASCADE;
+CREATE SCHEMA public;
+SET search_path = public;
+
+-- General.
+CREATE TABLE db (
+    db_id serial PRIMARY KEY,
+    name varchar(255) NOT NULL UNIQUE,
+    description varchar(255),
+    urlprefix varchar(255),
+    url varchar(255)
+);
+CREATE TABLE dbxref (
+    dbxref_id serial PRIMARY KEY,
+    db_id integer NOT NULL REFERENCES db ON DELETE CASCADE,
+    accession varchar(255) NOT NULL,
+    version varchar(255) NOT NULL DEFAULT '',
+    description text,
+    url varchar(255),
+    UNIQUE (db_id, accession, version)
+);
+CREATE INDEX dbxref_idx2 ON dbxref (accession);
+
+-- Controlled vocabularies.
+CREATE TABLE cv (
+    cv_id serial PRIMARY KEY,
+    name varchar(255) NOT NULL UNIQUE,
+    definition text
+);
+CREATE TABLE cvterm (
+    cvterm_id serial PRIMARY KEY,
+    cv_id integer NOT NULL REFERENCES cv ON DELETE CASCADE,
+    name varchar(1024) NOT NULL,
+    definition text,
+    dbxref_id integer NOT NULL UNIQUE REFERENCES dbxref ON DELETE SET NULL,
+    is_obsolete integer NOT NULL DEFAULT 0,
+    is_relationshiptype integer NOT NULL DEFAULT 0,
+    UNIQUE (name, cv_id, is_obsolete)
+);
+CREATE INDEX cvterm_idx2 ON cvterm (name);
+CREATE TABLE dbxrefprop (
+    dbxrefprop_id serial PRIMARY KEY,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text NOT NULL DEFAULT '',
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE cvterm_relationship (
+    cvterm_relationship_id serial PRIMARY KEY,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    subject_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    UNIQUE (type_id, subject_id, object_id)
+);
+CREATE TABLE cvterm_dbxref (
+    cvterm_dbxref_id serial PRIMARY KEY,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_for_definition integer NOT NULL DEFAULT 0,
+    UNIQUE (cvterm_id, dbxref_id)
+);
+CREATE TABLE cvtermprop (
+    cvtermprop_id serial PRIMARY KEY,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text NOT NULL DEFAULT '',
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE cvtermsynonym (
+    cvtermsynonym_id serial PRIMARY KEY,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    synonym varchar(1024) NOT NULL,
+    type_id integer REFERENCES cvterm ON DELETE CASCADE
+);
+
+-- Organisms.
+CREATE TABLE organism (
+    organism_id serial PRIMARY KEY,
+    abbreviation varchar(255),
+    genus varchar(255) NOT NULL,
+    species varchar(255) NOT NULL,
+    common_name varchar(255),
+    comment text,
+    UNIQUE (genus, species)
+);
+CREATE TABLE organismprop (
+    organismprop_id serial PRIMARY KEY,
+    organism_id integer NOT NULL REFERENCES organism ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE organism_dbxref (
+    organism_dbxref_id serial PRIMARY KEY,
+    organism_id integer NOT NULL REFERENCES organism ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true
+);
+
+-- Publications.
+CREATE TABLE pub (
+    pub_id serial PRIMARY KEY,
+    title text,
+    volumetitle text,
+    volume varchar(255),
+    series_name varchar(255),
+    issue varchar(255),
+    pyear varchar(255),
+    pages varchar(255),
+    miniref varchar(255),
+    uniquename text NOT NULL UNIQUE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    is_obsolete boolean DEFAULT false,
+    publisher varchar(255),
+    pubplace varchar(255)
+);
+CREATE TABLE pubprop (
+    pubprop_id serial PRIMARY KEY,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text NOT NULL,
+    rank integer
+);
+CREATE TABLE pub_dbxref (
+    pub_dbxref_id serial PRIMARY KEY,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true
+);
+CREATE TABLE pub_relationship (
+    pub_relationship_id serial PRIMARY KEY,
+    subject_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE
+);
+CREATE TABLE pubauthor (
+    pubauthor_id serial PRIMARY KEY,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    rank integer NOT NULL,
+    editor boolean DEFAULT false,
+    surname varchar(100) NOT NULL,
+    givennames varchar(100),
+    suffix varchar(100)
+);
+
+-- Features.
+CREATE TABLE synonym (
+    synonym_id serial PRIMARY KEY,
+    name varchar(255) NOT NULL,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    synonym_sgml varchar(255) NOT NULL,
+    UNIQUE (name, type_id)
+);
+CREATE TABLE feature (
+    feature_id serial PRIMARY KEY,
+    dbxref_id integer REFERENCES dbxref ON DELETE SET NULL,
+    organism_id integer NOT NULL REFERENCES organism ON DELETE CASCADE,
+    name varchar(255),
+    uniquename text NOT NULL,
+    residues text,
+    seqlen integer,
+    md5checksum char(32),
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    is_analysis boolean NOT NULL DEFAULT false,
+    is_obsolete boolean NOT NULL DEFAULT false,
+    timeaccessioned timestamp NOT NULL DEFAULT current_timestamp,
+    timelastmodified timestamp NOT NULL DEFAULT current_timestamp,
+    UNIQUE (organism_id, uniquename, type_id)
+);
+CREATE INDEX feature_idx1 ON feature (dbxref_id);
+CREATE INDEX feature_idx2 ON feature (organism_id);
+CREATE INDEX feature_idx3 ON feature (type_id);
+CREATE INDEX feature_idx4 ON feature (uniquename);
+CREATE INDEX feature_name_ind1 ON feature (name);
+CREATE TABLE featureloc (
+    featureloc_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    srcfeature_id integer REFERENCES feature ON DELETE SET NULL,
+    fmin integer,
+    is_fmin_partial boolean NOT NULL DEFAULT false,
+    fmax integer,
+    is_fmax_partial boolean NOT NULL DEFAULT false,
+    strand smallint,
+    phase integer,
+    residue_info text,
+    locgroup integer NOT NULL DEFAULT 0,
+    rank integer NOT NULL DEFAULT 0,
+    UNIQUE (feature_id, locgroup, rank)
+);
+CREATE INDEX featureloc_idx1 ON featureloc (feature_id);
+CREATE INDEX featureloc_idx2 ON featureloc (srcfeature_id);
+CREATE TABLE featureprop (
+    featureprop_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0,
+    UNIQUE (feature_id, type_id, rank)
+);
+CREATE INDEX featureprop_idx1 ON featureprop (feature_id);
+CREATE TABLE featureprop_pub (
+    featureprop_pub_id serial PRIMARY KEY,
+    featureprop_id integer NOT NULL REFERENCES featureprop ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    UNIQUE (featureprop_id, pub_id)
+);
+CREATE TABLE feature_pub (
+    feature_pub_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    UNIQUE (feature_id, pub_id)
+);
+CREATE INDEX feature_pub_idx1 ON feature_pub (feature_id);
+CREATE INDEX feature_pub_idx2 ON feature_pub (pub_id);
+CREATE TABLE feature_pubprop (
+    feature_pubprop_id serial PRIMARY KEY,
+    feature_pub_id integer NOT NULL REFERENCES feature_pub ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE feature_synonym (
+    feature_synonym_id serial PRIMARY KEY,
+    synonym_id integer NOT NULL REFERENCES synonym ON DELETE CASCADE,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT false,
+    is_internal boolean NOT NULL DEFAULT false,
+    UNIQUE (synonym_id, feature_id, pub_id)
+);
+CREATE INDEX feature_synonym_idx2 ON feature_synonym (feature_id);
+CREATE TABLE feature_dbxref (
+    feature_dbxref_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true,
+    UNIQUE (feature_id, dbxref_id)
+);
+CREATE INDEX feature_dbxref_idx1 ON feature_dbxref (feature_id);
+CREATE INDEX feature_dbxref_idx2 ON feature_dbxref (dbxref_id);
+CREATE TABLE feature_relationship (
+    feature_relationship_id serial PRIMARY KEY,
+    subject_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0,
+    UNIQUE (subject_id, object_id, type_id, rank)
+);
+CREATE INDEX feature_relationship_idx1 ON feature_relationship (subject_id);
+CREATE INDEX feature_relationship_idx2 ON feature_relationship (object_id);
+CREATE TABLE feature_relationshipprop (
+    feature_relationshipprop_id serial PRIMARY KEY,
+    feature_relationship_id integer NOT NULL REFERENCES feature_relationship ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE feature_relationship_pub (
+    feature_relationship_pub_id serial PRIMARY KEY,
+    feature_relationship_id integer NOT NULL REFERENCES feature_relationship ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE TABLE feature_cvterm (
+    feature_cvterm_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    is_not boolean NOT NULL DEFAULT false,
+    rank integer NOT NULL DEFAULT 0,
+    UNIQUE (feature_id, cvterm_id, pub_id, rank)
+);
+CREATE INDEX feature_cvterm_idx1 ON feature_cvterm (feature_id);
+CREATE INDEX feature_cvterm_idx2 ON feature_cvterm (cvterm_id);
+CREATE TABLE feature_cvtermprop (
+    feature_cvtermprop_id serial PRIMARY KEY,
+    feature_cvterm_id integer NOT NULL REFERENCES feature_cvterm ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE INDEX feature_cvtermprop_idx1 ON feature_cvtermprop (feature_cvterm_id);
+
+-- Genetics and phenotypes.
+CREATE TABLE genotype (
+    genotype_id serial PRIMARY KEY,
+    name text,
+    uniquename text NOT NULL UNIQUE,
+    description varchar(255),
+    type_id integer REFERENCES cvterm ON DELETE CASCADE,
+    is_obsolete boolean NOT NULL DEFAULT false
+);
+CREATE TABLE feature_genotype (
+    feature_genotype_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    genotype_id integer NOT NULL REFERENCES genotype ON DELETE CASCADE,
+    chromosome_id integer REFERENCES feature ON DELETE SET NULL,
+    rank integer NOT NULL DEFAULT 0,
+    cgroup integer NOT NULL DEFAULT 0,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE
+);
+CREATE TABLE environment (
+    environment_id serial PRIMARY KEY,
+    uniquename text NOT NULL UNIQUE,
+    description text
+);
+CREATE TABLE phenotype (
+    phenotype_id serial PRIMARY KEY,
+    uniquename text NOT NULL UNIQUE,
+    name text,
+    observable_id integer REFERENCES cvterm ON DELETE CASCADE,
+    attr_id integer REFERENCES cvterm ON DELETE SET NULL,
+    value text,
+    cvalue_id integer REFERENCES cvterm ON DELETE SET NULL,
+    assay_id integer REFERENCES cvterm ON DELETE SET NULL
+);
+CREATE TABLE phenotype_cvterm (
+    phenotype_cvterm_id serial PRIMARY KEY,
+    phenotype_id integer NOT NULL REFERENCES phenotype ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE phenstatement (
+    phenstatement_id serial PRIMARY KEY,
+    genotype_id integer NOT NULL REFERENCES genotype ON DELETE CASCADE,
+    environment_id integer NOT NULL REFERENCES environment ON DELETE CASCADE,
+    phenotype_id integer NOT NULL REFERENCES phenotype ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+
+-- Libraries (datasets) and expression.
+CREATE TABLE library (
+    library_id serial PRIMARY KEY,
+    organism_id integer NOT NULL REFERENCES organism,
+    name varchar(255),
+    uniquename text NOT NULL,
+    type_id integer NOT NULL REFERENCES cvterm,
+    is_obsolete boolean NOT NULL DEFAULT false,
+    timeaccessioned timestamp NOT NULL DEFAULT current_timestamp,
+    timelastmodified timestamp NOT NULL DEFAULT current_timestamp,
+    UNIQUE (organism_id, uniquename, type_id)
+);
+CREATE TABLE libraryprop (
+    libraryprop_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE library_cvterm (
+    library_cvterm_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm,
+    pub_id integer NOT NULL REFERENCES pub
+);
+CREATE TABLE library_cvtermprop (
+    library_cvtermprop_id serial PRIMARY KEY,
+    library_cvterm_id integer NOT NULL REFERENCES library_cvterm ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE library_dbxref (
+    library_dbxref_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true
+);
+CREATE TABLE library_synonym (
+    library_synonym_id serial PRIMARY KEY,
+    synonym_id integer NOT NULL REFERENCES synonym ON DELETE CASCADE,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true,
+    is_internal boolean NOT NULL DEFAULT false
+);
+CREATE TABLE library_pub (
+    library_pub_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE TABLE library_relationship (
+    library_relationship_id serial PRIMARY KEY,
+    subject_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm
+);
+CREATE INDEX library_relationship_idx1 ON library_relationship (subject_id);
+CREATE INDEX library_relationship_idx2 ON library_relationship (object_id);
+CREATE TABLE library_feature (
+    library_feature_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    UNIQUE (library_id, feature_id)
+);
+CREATE INDEX library_feature_idx1 ON library_feature (library_id);
+CREATE INDEX library_feature_idx2 ON library_feature (feature_id);
+CREATE TABLE library_featureprop (
+    library_featureprop_id serial PRIMARY KEY,
+    library_feature_id integer NOT NULL REFERENCES library_feature ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE INDEX library_featureprop_idx1 ON library_featureprop (library_feature_id);
+CREATE TABLE library_interaction (
+    library_interaction_id serial PRIMARY KEY,
+    interaction_id integer NOT NULL,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE TABLE expression (
+    expression_id serial PRIMARY KEY,
+    uniquename text NOT NULL UNIQUE,
+    md5checksum char(32),
+    description text
+);
+CREATE TABLE expression_cvterm (
+    expression_cvterm_id serial PRIMARY KEY,
+    expression_id integer NOT NULL REFERENCES expression ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    rank integer NOT NULL DEFAULT 0,
+    cvterm_type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE
+);
+CREATE TABLE feature_expression (
+    feature_expression_id serial PRIMARY KEY,
+    expression_id integer NOT NULL REFERENCES expression ON DELETE CASCADE,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE TABLE library_expression (
+    library_expression_id serial PRIMARY KEY,
+    library_id integer NOT NULL REFERENCES library ON DELETE CASCADE,
+    expression_id integer NOT NULL REFERENCES expression ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+
+-- Interactions (FlyBase interaction groups).
+CREATE TABLE interaction (
+    interaction_id serial PRIMARY KEY,
+    uniquename text NOT NULL,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    description text,
+    is_obsolete boolean NOT NULL DEFAULT false,
+    UNIQUE (uniquename, type_id)
+);
+ALTER TABLE library_interaction ADD FOREIGN KEY (interaction_id) REFERENCES interaction ON DELETE CASCADE;
+CREATE TABLE interactionprop (
+    interactionprop_id serial PRIMARY KEY,
+    interaction_id integer NOT NULL REFERENCES interaction ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE interaction_cvterm (
+    interaction_cvterm_id serial PRIMARY KEY,
+    interaction_id integer NOT NULL REFERENCES interaction ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE
+);
+CREATE INDEX interaction_cvterm_idx1 ON interaction_cvterm (interaction_id);
+CREATE TABLE interaction_pub (
+    interaction_pub_id serial PRIMARY KEY,
+    interaction_id integer NOT NULL REFERENCES interaction ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE INDEX interaction_pub_idx1 ON interaction_pub (interaction_id);
+CREATE TABLE feature_interaction (
+    feature_interaction_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    interaction_id integer NOT NULL REFERENCES interaction ON DELETE CASCADE,
+    role_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE INDEX feature_interaction_idx1 ON feature_interaction (feature_id);
+CREATE INDEX feature_interaction_idx2 ON feature_interaction (interaction_id);
+CREATE TABLE feature_interactionprop (
+    feature_interactionprop_id serial PRIMARY KEY,
+    feature_interaction_id integer NOT NULL REFERENCES feature_interaction ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE INDEX feature_interactionprop_idx1 ON feature_interactionprop (feature_interaction_id);
+CREATE TABLE interaction_group (
+    interaction_group_id serial PRIMARY KEY,
+    uniquename text NOT NULL UNIQUE,
+    is_obsolete boolean NOT NULL DEFAULT false,
+    description text
+);
+CREATE TABLE interaction_group_feature_interaction (
+    interaction_group_feature_interaction_id serial PRIMARY KEY,
+    interaction_group_id integer NOT NULL REFERENCES interaction_group ON DELETE CASCADE,
+    feature_interaction_id integer NOT NULL REFERENCES feature_interaction ON DELETE CASCADE,
+    rank integer NOT NULL DEFAULT 0,
+    ftype varchar(255)
+);
+
+-- Human disease models.
+CREATE TABLE humanhealth (
+    humanhealth_id serial PRIMARY KEY,
+    name varchar(255),
+    uniquename text NOT NULL,
+    organism_id integer NOT NULL REFERENCES organism ON DELETE CASCADE,
+    dbxref_id integer REFERENCES dbxref ON DELETE SET NULL,
+    is_obsolete boolean NOT NULL DEFAULT false
+);
+CREATE TABLE humanhealthprop (
+    humanhealthprop_id serial PRIMARY KEY,
+    humanhealth_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE humanhealth_dbxref (
+    humanhealth_dbxref_id serial PRIMARY KEY,
+    humanhealth_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true
+);
+CREATE TABLE humanhealth_dbxrefprop (
+    humanhealth_dbxrefprop_id serial PRIMARY KEY,
+    humanhealth_dbxref_id integer NOT NULL REFERENCES humanhealth_dbxref ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE humanhealth_feature (
+    humanhealth_feature_id serial PRIMARY KEY,
+    humanhealth_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+CREATE TABLE humanhealth_featureprop (
+    humanhealth_featureprop_id serial PRIMARY KEY,
+    humanhealth_feature_id integer NOT NULL REFERENCES humanhealth_feature ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE humanhealth_relationship (
+    humanhealth_relationship_id serial PRIMARY KEY,
+    subject_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE humanhealth_synonym (
+    humanhealth_synonym_id serial PRIMARY KEY,
+    synonym_id integer NOT NULL REFERENCES synonym ON DELETE CASCADE,
+    humanhealth_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT false,
+    is_internal boolean NOT NULL DEFAULT false
+);
+CREATE TABLE humanhealth_cvterm (
+    humanhealth_cvterm_id serial PRIMARY KEY,
+    humanhealth_id integer NOT NULL REFERENCES humanhealth ON DELETE CASCADE,
+    cvterm_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    pub_id integer NOT NULL REFERENCES pub ON DELETE CASCADE
+);
+
+-- Gene groups.
+CREATE TABLE grp (
+    grp_id serial PRIMARY KEY,
+    name varchar(255),
+    uniquename text NOT NULL,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    is_analysis boolean NOT NULL DEFAULT false,
+    is_obsolete boolean NOT NULL DEFAULT false
+);
+CREATE TABLE grpprop (
+    grpprop_id serial PRIMARY KEY,
+    grp_id integer NOT NULL REFERENCES grp ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE grp_relationship (
+    grp_relationship_id serial PRIMARY KEY,
+    subject_id integer NOT NULL REFERENCES grp ON DELETE CASCADE,
+    object_id integer NOT NULL REFERENCES grp ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE grp_dbxref (
+    grp_dbxref_id serial PRIMARY KEY,
+    grp_id integer NOT NULL REFERENCES grp ON DELETE CASCADE,
+    dbxref_id integer NOT NULL REFERENCES dbxref ON DELETE CASCADE,
+    is_current boolean NOT NULL DEFAULT true
+);
+CREATE TABLE grpmember (
+    grpmember_id serial PRIMARY KEY,
+    grp_id integer NOT NULL REFERENCES grp ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE grpmemberprop (
+    grpmemberprop_id serial PRIMARY KEY,
+    grpmember_id integer NOT NULL REFERENCES grpmember ON DELETE CASCADE,
+    type_id integer NOT NULL REFERENCES cvterm ON DELETE CASCADE,
+    value text,
+    rank integer NOT NULL DEFAULT 0
+);
+CREATE TABLE feature_grpmember (
+    feature_grpmember_id serial PRIMARY KEY,
+    grpmember_id integer NOT NULL REFERENCES grpmember ON DELETE CASCADE,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE
+);
+
+-- Analyses.
+CREATE TABLE analysis (
+    analysis_id serial PRIMARY KEY,
+    name varchar(255),
+    description text,
+    program varchar(255) NOT NULL,
+    programversion varchar(255) NOT NULL,
+    algorithm varchar(255),
+    sourcename varchar(255),
+    sourceversion varchar(255),
+    sourceuri text,
+    timeexecuted timestamp NOT NULL DEFAULT current_timestamp,
+    UNIQUE (program, programversion, sourcename)
+);
+CREATE TABLE analysisfeature (
+    analysisfeature_id serial PRIMARY KEY,
+    feature_id integer NOT NULL REFERENCES feature ON DELETE CASCADE,
+    analysis_id integer NOT NULL REFERENCES analysis ON DELETE CASCADE,
+    rawscore double precision,
+    normscore double precision,
+    significance double precision,
+    identity double precision,
+    UNIQUE (feature_id, analysis_id)
+);
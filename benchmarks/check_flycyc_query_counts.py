@@ -0,0 +1,108 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Check that the FlyCyc query steps run the same number of SQL statements whatever the data volume.
+
+Usage:
+    check_flycyc_query_counts.py [-h] -s SERVER -d DATABASE -u USERNAME -p PASSWORD [-r RELEASE]
+        [-m MULTIPLIERS [MULTIPLIERS ...]] [-f FRACTION]
+
+Example:
+    python check_flycyc_query_counts.py -s localhost -d chado_bench -u postgres -p postgres -m 1 2 -f 0.01
+
+Notes:
+    For each multiplier, the database is reloaded from chado_subset_schema.sql
+    and chado_seed_data.sql (so it must be disposable, as for run_benchmarks.py
+    -l), filled with synthetic data at that scale (see
+    generate_synthetic_chado.py), then the query steps of
+    generate_flycyc_files.py are run in this process. The SQL statements of
+    each step are counted by its "before_cursor_execute" listener. Each query
+    step must run a fixed number of statements (e.g., no lazy relationship
+    loads per gene or per GO term), so the per-step counts must be equal at
+    every scale. The exit code is 1 if any count differs.
+
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import psycopg2
+from generate_synthetic_chado import SyntheticChadoGenerator
+from run_benchmarks import SQL_FILES, SRC_DIR, load_database
+
+log = logging.getLogger(__name__)
+
+
+def main():
+    """Count the SQL statements of each FlyCyc query step at each scale, and compare the counts."""
+    parser = argparse.ArgumentParser(description='Check that FlyCyc query counts do not grow with the data.')
+    parser.add_argument('-s', '--server', help='Postgres server.', required=True)
+    parser.add_argument('-d', '--database', help='Benchmark database (reloaded for each scale).', required=True)
+    parser.add_argument('-u', '--username', help='Postgres user name.', required=True)
+    parser.add_argument('-p', '--password', help='Postgres password.', required=True)
+    parser.add_argument('-r', '--release', default='2099_01', help='Release label given to the report.', required=False)
+    parser.add_argument('-m', '--multipliers', type=float, nargs='+', default=[1.0, 2.0],
+                        help='Scales relative to current FlyBase (at least two).', required=False)
+    parser.add_argument('-f', '--fraction', type=float, default=0.01, help='Further scale factor for quick runs.', required=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+    if len(args.multipliers) < 2:
+        parser.error('Give at least two multipliers to compare.')
+
+    counts_by_scale = {}
+    for multiplier in args.multipliers:
+        scale = multiplier * args.fraction
+        load_database(args.server, args.database, args.username, args.password, SQL_FILES)
+        conn = psycopg2.connect(host=args.server, dbname=args.database, user=args.username, password=args.password)
+        SyntheticChadoGenerator(conn, scale, 1, False).generate()
+        conn.close()
+        counts_by_scale[scale] = count_flycyc_queries(args)
+        log.info('Scale {}: {}'.format(scale, counts_by_scale[scale]))
+    return 0 if compare_counts(counts_by_scale) else 1
+
+
+def count_flycyc_queries(args):
+    """Run the FlyCyc query steps against the benchmark database; return the step name-keyed statement counts."""
+    sys.path.insert(0, SRC_DIR)
+    import generate_flycyc_files
+    with tempfile.TemporaryDirectory(prefix='flycyc_query_counts_') as output_dir:
+        set_up_dict = {
+            'server': args.server,
+            'database': args.database,
+            'username': args.username,
+            'password': args.password,
+            'annotation_release': 'R6.99',
+            'database_release': args.release,
+            'output_dir': output_dir + os.sep,
+            'log': logging.getLogger('generate_flycyc_files'),
+        }
+        generate_flycyc_files.configure(set_up_dict)
+        flycyc_generator = generate_flycyc_files.FlyCycGenerator()
+        try:
+            generate_flycyc_files.db_query_transaction(flycyc_generator)
+        finally:
+            generate_flycyc_files.engine.dispose()
+    return flycyc_generator.step_query_counts
+
+
+def compare_counts(counts_by_scale):
+    """Log the query steps whose statement counts differ across scales; return True if none do."""
+    scales = sorted(counts_by_scale)
+    steps = list(counts_by_scale[scales[0]])
+    steps += [i for scale in scales for i in counts_by_scale[scale] if i not in steps]
+    constant = True
+    for step in steps:
+        counts = [counts_by_scale[scale].get(step) for scale in scales]
+        if len(set(counts)) > 1:
+            constant = False
+            log.error('{}(): statement counts differ across scales {}: {}'.format(step, scales, counts))
+        else:
+            log.info('{}(): {} statement(s) at every scale.'.format(step, counts[0]))
+    if constant:
+        log.info('Every FlyCyc query step ran a constant number of SQL statements.')
+    return constant
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Check that alternative ways of running a report give the same output as the reference run.
+
+Usage:
+    check_output_equivalence.py [-h] -s SERVER -d DATABASE -u USERNAME -p PASSWORD [-r RELEASE]
+        -S SCRIPT [-m MODE] [-t TIMEOUT] [-n MAX_DIFFS] [-k KEEP_OUTPUTS]
+    check_output_equivalence.py [-h] -f REFERENCE_FILE OTHER_FILE [-n MAX_DIFFS]
+
+Example:
+    python check_output_equivalence.py -s localhost -d chado_bench -u postgres -p postgres
+        -S ../src/report_rnacentral_json.py -m "baseline=@HEAD~1" -m "gzip=BULK_REPORT_COMPRESS=1"
+    python check_output_equivalence.py -f old/mitab.tsv new/mitab.tsv
+
+Notes:
+    Each mode is "LABEL=SPEC", where SPEC is a shell-style list of tokens:
+    "@GIT_REF" runs the script as of a git revision (from "git archive"),
+    "NAME=VALUE" tokens set environment variables and anything else is
+    passed to the script as arguments. The first mode is the reference; if
+    only one mode is given, a reference "current" mode (the working tree,
+    no extra arguments) is run first. Every mode runs against the same
+    database, in its own directory (see run_benchmarks.py).
+
+    Output files are paired by name (".gz" removed, gzipped files are read
+    decompressed; logs and manifests are ignored). Only "## Generated:" lines
+    and "dateProduced" values are normalized. Files must then be identical
+    byte for byte, or, for JSON, equal once parsed (canonical JSON). For
+    files that differ, rows (TSV lines or JSON "data" records) found in
+    only one of the files are shown. The exit code is 1 if any file differs.
+
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from itertools import zip_longest
+from run_benchmarks import REPO_DIR, run_script
+
+log = logging.getLogger(__name__)
+
+GENERATED_REGEX = re.compile(r'^## Generated:.*$')
+DATE_PRODUCED_REGEX = re.compile(r'("dateProduced"\s*:\s*)"[^"]*"')
+ENV_TOKEN_REGEX = re.compile(r'^[A-Z_][A-Z0-9_]*=')
+IGNORED_OUTPUT_REGEX = re.compile(r'(\.log$|\.manifest\.json$|\.cfg$|^benchmark_stats\.json$)')
+NORMALIZED = '[normalized]'
+
+
+def main():
+    """Run a report in each mode (or take two files) and compare outputs against the reference."""
+    parser = argparse.ArgumentParser(description='Check report output equivalence across run modes.')
+    parser.add_argument('-s', '--server', help='Postgres server.', required=False)
+    parser.add_argument('-d', '--database', help='Benchmark database.', required=False)
+    parser.add_argument('-u', '--username', help='Postgres user name.', required=False)
+    parser.add_argument('-p', '--password', help='Postgres password.', required=False)
+    parser.add_argument('-r', '--release', default='2099_01', help='Release label given to scripts.', required=False)
+    parser.add_argument('-S', '--script', help='Report script to run.', required=False)
+    parser.add_argument('-m', '--mode', action='append', default=[], help='LABEL=SPEC run mode (repeatable).', required=False)
+    parser.add_argument('-t', '--timeout', type=int, default=3600, help='Seconds before a run is killed.', required=False)
+    parser.add_argument('-n', '--max_diffs', type=int, default=10, help='Differing rows to show per file.', required=False)
+    parser.add_argument('-k', '--keep_outputs', help='Directory in which to keep run directories.', required=False)
+    parser.add_argument('-f', '--files', nargs=2, help='Compare two existing files instead of running.', required=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+
+    if args.files:
+        equivalent = compare_files(args.files[0], args.files[1], args.max_diffs)
+        return 0 if equivalent else 1
+    if not all((args.server, args.database, args.username, args.password, args.script)):
+        parser.error('-s, -d, -u, -p and -S are required unless -f is given.')
+    modes = [parse_mode(i) for i in args.mode]
+    if len(modes) < 2:
+        modes.insert(0, parse_mode('current='))
+    work_dir = args.keep_outputs or tempfile.mkdtemp(prefix='equivalence_runs_')
+    try:
+        outputs = {}
+        for label, git_ref, extra_args, extra_env in modes:
+            outputs[label] = run_mode(args, work_dir, label, git_ref, extra_args, extra_env)
+        equivalent = compare_modes(outputs, args.max_diffs)
+    finally:
+        if not args.keep_outputs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0 if equivalent else 1
+
+
+def parse_mode(mode):
+    """Parse "LABEL=SPEC" into (label, git ref, script arguments, environment variables)."""
+    label, _, spec = mode.partition('=')
+    git_ref = None
+    extra_args = []
+    extra_env = {}
+    for token in shlex.split(spec):
+        if token.startswith('@'):
+            git_ref = token[1:]
+        elif ENV_TOKEN_REGEX.match(token) and not extra_args:
+            name, _, value = token.partition('=')
+            extra_env[name] = value
+        else:
+            extra_args.append(token)
+    return label, git_ref, extra_args, extra_env
+
+
+def run_mode(args, work_dir, label, git_ref, extra_args, extra_env):
+    """Run the script in one mode, returning a dict of output names (".gz" removed) and paths."""
+    script = os.path.abspath(args.script)
+    if git_ref:
+        # Run the whole src/ tree as of the git revision, so that helper modules match the script.
+        source_dir = os.path.join(work_dir, '{}_source'.format(label))
+        os.makedirs(source_dir, exist_ok=True)
+        archive = subprocess.run(['git', 'archive', git_ref, 'src'], cwd=REPO_DIR, check=True, stdout=subprocess.PIPE)
+        subprocess.run(['tar', '-x', '-C', source_dir], input=archive.stdout, check=True)
+        script = os.path.join(source_dir, os.path.relpath(script, REPO_DIR))
+    run_dir = os.path.join(work_dir, label)
+    log.info('Running mode "{}": {} {} {}'.format(label, git_ref or 'working tree', extra_env, extra_args))
+    result = run_script(script, run_dir, args, extra_args=extra_args, extra_env=extra_env)
+    if result['exit_code'] != 0:
+        log.error('Mode "{}" exited with code {}; see {}.'.format(label, result['exit_code'], run_dir))
+    outputs = {}
+    for relative_path in result['output_files'].keys():
+        if IGNORED_OUTPUT_REGEX.search(os.path.basename(relative_path)):
+            continue
+        name = relative_path[:-3] if relative_path.endswith('.gz') else relative_path
+        outputs[name] = os.path.join(run_dir, relative_path)
+    log.info('Mode "{}" wrote {} output files in {}s.'.format(label, len(outputs), result['wall_seconds']))
+    return outputs
+
+
+def compare_modes(outputs, max_diffs):
+    """Compare every mode's output files with the reference mode's, returning True if all are equivalent."""
+    labels = list(outputs.keys())
+    reference_label = labels[0]
+    equivalent = True
+    for label in labels[1:]:
+        names = sorted(set(outputs[reference_label].keys()) | set(outputs[label].keys()))
+        for name in names:
+            reference_path = outputs[reference_label].get(name)
+            other_path = outputs[label].get(name)
+            if not reference_path or not other_path:
+                log.error('{}: only written by mode "{}".'.format(name, reference_label if reference_path else label))
+                equivalent = False
+                continue
+            log.info('Comparing {} ("{}" vs "{}").'.format(name, reference_label, label))
+            equivalent = compare_files(reference_path, other_path, max_diffs) and equivalent
+    return equivalent
+
+
+def open_text(path):
+    """Open a plain or gzipped file for reading as text, keeping line endings as written."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def normalize_line(line):
+    """Mask the run timestamp in a line, if it has one."""
+    if line.startswith('## Generated:'):
+        return GENERATED_REGEX.sub('## Generated: ' + NORMALIZED, line.rstrip('\r\n')) + line[len(line.rstrip('\r\n')):]
+    if '"dateProduced"' in line:
+        return DATE_PRODUCED_REGEX.sub(r'\1"{}"'.format(NORMALIZED), line)
+    return line
+
+
+def iter_normalized_lines(path):
+    """Yield the normalized lines of a file."""
+    with open_text(path) as input_file:
+        for line in input_file:
+            yield normalize_line(line)
+
+
+def is_json_file(path):
+    """Return True if a file looks like JSON (by name or first character)."""
+    if '.json' in os.path.basename(path):
+        return True
+    with open_text(path) as input_file:
+        return input_file.read(1) in ('{', '[')
+
+
+def compare_files(reference_path, other_path, max_diffs):
+    """Compare two output files, logging differences; return True if they are equivalent."""
+    first_difference = None
+    for line_number, (reference_line, other_line) in enumerate(zip_longest(iter_normalized_lines(reference_path),
+                                                                           iter_normalized_lines(other_path)), start=1):
+        if reference_line != other_line:
+            first_difference = line_number
+            break
+    if first_difference is None:
+        log.info('Identical (after normalization): {} and {}.'.format(reference_path, other_path))
+        return True
+    log.info('Files differ from line {}; checking rows.'.format(first_difference))
+    if is_json_file(reference_path) and is_json_file(other_path):
+        return compare_json_files(reference_path, other_path, max_diffs)
+    return compare_text_files(reference_path, other_path, max_diffs)
+
+
+def canonical_json(data):
+    """Return a canonical string for JSON data."""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def mask_date_produced(data):
+    """Replace "dateProduced" values (at any depth) with a constant."""
+    if isinstance(data, dict):
+        return {k: NORMALIZED if k == 'dateProduced' else mask_date_produced(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [mask_date_produced(i) for i in data]
+    return data
+
+
+def compare_json_files(reference_path, other_path, max_diffs):
+    """Compare JSON files as parsed data, reporting records found in only one file."""
+    with open_text(reference_path) as reference_file, open_text(other_path) as other_file:
+        reference_data = mask_date_produced(json.load(reference_file))
+        other_data = mask_date_produced(json.load(other_file))
+    if canonical_json(reference_data) == canonical_json(other_data):
+        log.info('Equivalent as canonical JSON (formatting differs only): {} and {}.'.format(reference_path, other_path))
+        return True
+    reference_records = reference_data.get('data', []) if isinstance(reference_data, dict) else reference_data
+    other_records = other_data.get('data', []) if isinstance(other_data, dict) else other_data
+    if isinstance(reference_data, dict) and isinstance(other_data, dict):
+        for key in sorted(set(reference_data.keys()) | set(other_data.keys())):
+            if key != 'data' and canonical_json(reference_data.get(key)) != canonical_json(other_data.get(key)):
+                log.error('Top-level "{}" differs.'.format(key))
+    report_row_differences([canonical_json(i) for i in reference_records], [canonical_json(i) for i in other_records],
+                           reference_path, other_path, max_diffs)
+    return False
+
+
+def compare_text_files(reference_path, other_path, max_diffs):
+    """Compare text files line by line, reporting lines found in only one file."""
+    reference_lines = [i.rstrip('\r\n') for i in iter_normalized_lines(reference_path)]
+    other_lines = [i.rstrip('\r\n') for i in iter_normalized_lines(other_path)]
+    if reference_lines == other_lines:
+        log.error('Only line endings differ: {} and {}.'.format(reference_path, other_path))
+    else:
+        report_row_differences(reference_lines, other_lines, reference_path, other_path, max_diffs)
+    return False
+
+
+def report_row_differences(reference_rows, other_rows, reference_path, other_path, max_diffs):
+    """Log the rows (as strings) found in only one of two lists, or note an ordering difference."""
+    reference_counts = Counter(reference_rows)
+    other_counts = Counter(other_rows)
+    only_reference = reference_counts - other_counts
+    only_other = other_counts - reference_counts
+    if not only_reference and not only_other:
+        log.error('Same {} rows, in a different order: {} and {}.'.format(len(reference_rows), reference_path, other_path))
+        return
+    log.error('{} rows only in {}; {} rows only in {}.'.format(sum(only_reference.values()), reference_path,
+                                                               sum(only_other.values()), other_path))
+    for label, rows in (('-', only_reference), ('+', only_other)):
+        for row in list(rows.elements())[:max_diffs]:
+            log.error('{} {}'.format(label, row))
+    return
+
+
+if __name__ == "__main__":
+    sys.exit(main())
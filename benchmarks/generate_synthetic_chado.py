@@ -0,0 +1,640 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Fill a benchmark chado database with synthetic FlyBase-like data at a chosen scale.
+
+Usage:
+    generate_synthetic_chado.py [-h] -s SERVER -d DATABASE -u USERNAME -p PASSWORD
+        [-m MULTIPLIER] [-f FRACTION] [-r RANDOM_SEED] [-e FULL_RESIDUES]
+
+Example:
+    python generate_synthetic_chado.py -s localhost -d chado_bench -u postgres -p postgres -m 5
+    python generate_synthetic_chado.py -s localhost -d chado_bench -u postgres -p postgres -m 1 -f 0.01
+
+Notes:
+    Run against a database loaded with chado_subset_schema.sql and
+    chado_seed_data.sql (run_benchmarks.py -l), which provide the controlled
+    vocabulary. Entity counts are BASE_COUNTS (roughly current FlyBase) times
+    the multiplier (e.g., 1, 5, 20); the fraction shrinks everything further
+    for quick runs. The data are random but reproducible for a given seed.
+
+    Generated: pubs (FBrf) with authors and PubMed IDs, related in a pub
+    graph (papers related to the reviews that cite them, papers also in
+    other papers); Dmel genes (FBgn), transcripts (FBtr), CDS and
+    polypeptides (FBpp) on chromosome arms, with featurelocs, synonyms,
+    dbxrefs, annotation IDs and GO annotations;
+    alleles (FBal), insertions (FBti), constructs (FBtp) and aberrations
+    (FBch); genotypes, phenotypes and phenstatements; physical interactions
+    grouped into interaction groups; human disease models (FBhh); and
+    libraries (FBlc) for high-throughput expression datasets (RPKM/TPM etc.)
+    and scRNA-Seq clustering analyses (mean_expr/spread per gene/cluster).
+
+    Rows are buffered per table and written with COPY in chunks (parent
+    tables first), using explicit primary keys (sequences are reset at the
+    end), so memory stays bounded at 20x and load time is set by postgres.
+
+"""
+
+import argparse
+import io
+import logging
+import random
+import time
+from array import array
+import psycopg2
+
+log = logging.getLogger(__name__)
+
+# Approximate counts for current FlyBase (multiplier = 1).
+BASE_COUNTS = {
+    'pub': 250000,
+    'gene': 17900,
+    'allele': 270000,
+    'insertion': 210000,
+    'construct': 110000,
+    'aberration': 22000,
+    'phenstatement': 400000,
+    'interaction': 80000,
+    'humanhealth': 1600,
+    'ht_sample': 400,
+    'scrna_analysis': 60,
+}
+# Per-entity ratios (not scaled).
+TRANSCRIPTS_PER_GENE = (1, 4)           # Random range.
+NCRNA_GENE_FRACTION = 0.15
+GO_TERMS_PER_GENE = (0, 6)
+SYNONYMS_PER_FEATURE = (0, 3)
+CLUSTERS_PER_ANALYSIS = (5, 45)
+GENES_PER_CLUSTER_FRACTION = (0.2, 0.5)
+PARTICIPANTS_PER_INTERACTION = (2, 3)
+PAPERS_PER_REVIEW = (2, 20)
+ALSO_IN_PAPER_FRACTION = 0.05
+# Chromosome arms and their (real) lengths.
+CHROMOSOME_ARMS = {
+    '2L': 23513712,
+    '2R': 25286936,
+    '3L': 28110227,
+    '3R': 32079331,
+    '4': 1348131,
+    'X': 23542271,
+    'Y': 3667352,
+}
+RESIDUES_LENGTH = 100000                # Arm residues length unless full residues are asked for.
+# High-throughput datasets: dataset name, unit(s).
+HT_DATASETS = {
+    'FlyAtlas2': ['RPKM', 'TPM'],
+    'modENCODE_mRNA-Seq_tissues': ['RPKM'],
+    'modENCODE_mRNA-Seq_development': ['RPKM'],
+    'modENCODE_mRNA-Seq_cell.B': ['RPKM'],
+    'modENCODE_mRNA-Seq_treatments': ['RPKM'],
+    'Knoblich_Neural_Cell_RNA-Seq': ['TPM'],
+    'Lai_miRNA_RPMM_expression_development': ['RPMM'],
+    'Lai_miRNA_RPMM_expression_tissues': ['RPMM'],
+    'Lai_miRNA_RPMM_expression_cells': ['RPMM'],
+    'Casas-Vila_proteome_life_cycle': ['LFQ_geom_mean_intensity'],
+    'Casas-Vila_proteome_embryogenesis': ['LFQ_geom_mean_intensity'],
+}
+# Columns written per table (primary key first), in foreign key dependency order.
+TABLE_COLUMNS = {
+    'dbxref': ('dbxref_id', 'db_id', 'accession'),
+    'pub': ('pub_id', 'uniquename', 'title', 'pyear', 'miniref', 'type_id'),
+    'pubauthor': ('pubauthor_id', 'pub_id', 'rank', 'surname', 'givennames'),
+    'pub_dbxref': ('pub_dbxref_id', 'pub_id', 'dbxref_id'),
+    'pub_relationship': ('pub_relationship_id', 'subject_id', 'object_id', 'type_id'),
+    'synonym': ('synonym_id', 'name', 'type_id', 'synonym_sgml'),
+    'feature': ('feature_id', 'organism_id', 'name', 'uniquename', 'residues', 'seqlen', 'type_id'),
+    'featureloc': ('featureloc_id', 'feature_id', 'srcfeature_id', 'fmin', 'fmax', 'strand'),
+    'featureprop': ('featureprop_id', 'feature_id', 'type_id', 'value'),
+    'feature_pub': ('feature_pub_id', 'feature_id', 'pub_id'),
+    'feature_synonym': ('feature_synonym_id', 'synonym_id', 'feature_id', 'pub_id', 'is_current'),
+    'feature_dbxref': ('feature_dbxref_id', 'feature_id', 'dbxref_id'),
+    'feature_relationship': ('feature_relationship_id', 'subject_id', 'object_id', 'type_id'),
+    'feature_cvterm': ('feature_cvterm_id', 'feature_id', 'cvterm_id', 'pub_id', 'is_not'),
+    'feature_cvtermprop': ('feature_cvtermprop_id', 'feature_cvterm_id', 'type_id', 'value'),
+    'genotype': ('genotype_id', 'uniquename'),
+    'feature_genotype': ('feature_genotype_id', 'feature_id', 'genotype_id', 'cvterm_id'),
+    'environment': ('environment_id', 'uniquename'),
+    'phenotype': ('phenotype_id', 'uniquename', 'observable_id', 'value'),
+    'phenstatement': ('phenstatement_id', 'genotype_id', 'environment_id', 'phenotype_id', 'type_id', 'pub_id'),
+    'interaction_group': ('interaction_group_id', 'uniquename'),
+    'interaction': ('interaction_id', 'uniquename', 'type_id'),
+    'interactionprop': ('interactionprop_id', 'interaction_id', 'type_id', 'value'),
+    'interaction_cvterm': ('interaction_cvterm_id', 'interaction_id', 'cvterm_id'),
+    'interaction_pub': ('interaction_pub_id', 'interaction_id', 'pub_id'),
+    'feature_interaction': ('feature_interaction_id', 'feature_id', 'interaction_id', 'role_id', 'rank'),
+    'feature_interactionprop': ('feature_interactionprop_id', 'feature_interaction_id', 'type_id', 'value'),
+    'interaction_group_feature_interaction': ('interaction_group_feature_interaction_id', 'interaction_group_id',
+                                              'feature_interaction_id'),
+    'humanhealth': ('humanhealth_id', 'name', 'uniquename', 'organism_id'),
+    'humanhealth_dbxref': ('humanhealth_dbxref_id', 'humanhealth_id', 'dbxref_id'),
+    'humanhealth_feature': ('humanhealth_feature_id', 'humanhealth_id', 'feature_id', 'pub_id'),
+    'library': ('library_id', 'organism_id', 'name', 'uniquename', 'type_id'),
+    'library_cvterm': ('library_cvterm_id', 'library_id', 'cvterm_id', 'pub_id'),
+    'library_cvtermprop': ('library_cvtermprop_id', 'library_cvterm_id', 'type_id'),
+    'library_pub': ('library_pub_id', 'library_id', 'pub_id'),
+    'library_relationship': ('library_relationship_id', 'subject_id', 'object_id', 'type_id'),
+    'library_feature': ('library_feature_id', 'library_id', 'feature_id'),
+    'library_featureprop': ('library_featureprop_id', 'library_feature_id', 'type_id', 'value'),
+    'expression': ('expression_id', 'uniquename'),
+    'expression_cvterm': ('expression_cvterm_id', 'expression_id', 'cvterm_id', 'cvterm_type_id'),
+    'library_expression': ('library_expression_id', 'library_id', 'expression_id', 'pub_id'),
+}
+CHUNK_ROWS = 500000     # Buffered rows (all tables) that trigger a COPY of every buffer.
+# FlyBase IDs made here start at this number, well above seed data IDs.
+FBID_START = 1000000
+
+
+def main():
+    """Generate synthetic data at the requested scale."""
+    parser = argparse.ArgumentParser(description='Generate synthetic chado data for benchmarks.')
+    parser.add_argument('-s', '--server', help='Postgres server.', required=True)
+    parser.add_argument('-d', '--database', help='Benchmark database.', required=True)
+    parser.add_argument('-u', '--username', help='Postgres user name.', required=True)
+    parser.add_argument('-p', '--password', help='Postgres password.', required=True)
+    parser.add_argument('-m', '--multiplier', type=float, default=1.0, help='Scale relative to current FlyBase.', required=False)
+    parser.add_argument('-f', '--fraction', type=float, default=1.0, help='Further scale factor for quick runs.', required=False)
+    parser.add_argument('-r', '--random_seed', type=int, default=1, help='Random seed.', required=False)
+    parser.add_argument('-e', '--full_residues', action='store_true', help='Give arms full-length residues.', required=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+
+    conn = psycopg2.connect(host=args.server, dbname=args.database, user=args.username, password=args.password)
+    generator = SyntheticChadoGenerator(conn, args.multiplier * args.fraction, args.random_seed, args.full_residues)
+    generator.generate()
+    conn.close()
+    return
+
+
+def copy_value(value):
+    """Format a python value for COPY text format."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+class SyntheticChadoGenerator(object):
+    """Write synthetic chado rows with COPY."""
+
+    def __init__(self, conn, scale, random_seed, full_residues):
+        """Create a generator.
+
+        Args:
+            arg1 (conn): A psycopg2 connection to a seeded benchmark database.
+            arg2 (scale): (float) Multiplier applied to BASE_COUNTS.
+            arg3 (random_seed): (int) Seed for reproducible data.
+            arg4 (full_residues): (bool) If True, give chromosome arms full-length residues.
+
+        """
+        self.conn = conn
+        self.scale = scale
+        self.rng = random.Random(random_seed)
+        self.full_residues = full_residues
+        self.next_id = {}                           # Table name-keyed next primary key.
+        self.next_fbid = {}                         # FB prefix-keyed next ID number.
+        self.buffers = {i: [] for i in TABLE_COLUMNS.keys()}
+        self.buffered_rows = 0
+        self.copied_rows = {i: 0 for i in TABLE_COLUMNS.keys()}
+        self.cvterm_ids = {}                        # (cv name, cvterm name)-keyed cvterm_id.
+        self.db_ids = {}                            # Db name-keyed db_id.
+        self.organism_id = None                     # Dmel organism_id.
+        self.arm_ids = {}                           # Arm name-keyed feature_id.
+        # Ids sampled from when linking data (arrays keep memory low at high scales).
+        self.pub_ids = array('q')
+        self.paper_ids = array('q')
+        self.gene_ids = array('q')
+        self.polypeptide_ids = array('q')
+        self.allele_ids = array('q')
+        self.go_term_ids = []
+        self.anatomy_term_ids = []
+        self.stage_term_ids = []
+
+    def count(self, entity):
+        """Return the scaled number of entities to make (at least one)."""
+        return max(1, int(BASE_COUNTS[entity] * self.scale))
+
+    def new_fbid(self, prefix):
+        """Return the next FlyBase ID for a prefix (e.g., FBgn)."""
+        number = self.next_fbid.get(prefix, FBID_START)
+        self.next_fbid[prefix] = number + 1
+        return '{}{:07d}'.format(prefix, number)
+
+    def add_row(self, table, *values):
+        """Buffer a row (all TABLE_COLUMNS values except the primary key), returning its new primary key."""
+        row_id = self.next_id[table]
+        self.next_id[table] += 1
+        self.buffers[table].append((row_id,) + values)
+        self.buffered_rows += 1
+        if self.buffered_rows >= CHUNK_ROWS:
+            self.flush()
+        return row_id
+
+    def flush(self):
+        """COPY all buffered rows into their tables, parent tables first."""
+        with self.conn.cursor() as cursor:
+            for table, rows in self.buffers.items():
+                if not rows:
+                    continue
+                copy_data = io.StringIO()
+                for row in rows:
+                    copy_data.write('\t'.join(copy_value(i) for i in row) + '\n')
+                copy_data.seek(0)
+                cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(table, ', '.join(TABLE_COLUMNS[table])), copy_data)
+                self.copied_rows[table] += len(rows)
+                rows.clear()
+        self.buffered_rows = 0
+        return
+
+    def commit(self, step):
+        """Flush buffers and commit the work of a step."""
+        self.flush()
+        self.conn.commit()
+        log.info('Done: {}. Rows so far: {}.'.format(step, sum(self.copied_rows.values())))
+        return
+
+    def cvterm(self, cv_name, term_name, db_name='FlyBase_internal'):
+        """Return a cvterm_id, creating the term with the seed data's bench_cvterm() function if needed."""
+        key = (cv_name, term_name)
+        if key not in self.cvterm_ids:
+            with self.conn.cursor() as cursor:
+                cursor.execute('SELECT bench_cvterm(%s, %s, %s)', (cv_name, term_name, db_name))
+                self.cvterm_ids[key] = cursor.fetchone()[0]
+        return self.cvterm_ids[key]
+
+    def generate(self):
+        """Generate all data types, then reset sequences and analyze."""
+        start_time = time.perf_counter()
+        self.load_reference_data()
+        self.add_pubs()
+        self.add_chromosome_arms()
+        self.add_genes()
+        self.add_genetic_features()
+        self.add_phenotypes()
+        self.add_interactions()
+        self.add_humanhealth()
+        self.add_ht_expression()
+        self.add_scrna_expression()
+        self.finish()
+        for table, row_count in self.copied_rows.items():
+            log.info('{}: {} rows.'.format(table, row_count))
+        log.info('Generated synthetic data at scale {} in {:.1f}s.'.format(self.scale, time.perf_counter() - start_time))
+        return
+
+    def load_reference_data(self):
+        """Look up seed data ids and the next free primary key of every table."""
+        log.info('Loading reference data.')
+        with self.conn.cursor() as cursor:
+            for table, columns in TABLE_COLUMNS.items():
+                cursor.execute('SELECT COALESCE(MAX({}), 0) + 1 FROM {}'.format(columns[0], table))
+                self.next_id[table] = cursor.fetchone()[0]
+            cursor.execute('SELECT name, db_id FROM db')
+            self.db_ids = dict(cursor.fetchall())
+            cursor.execute("SELECT organism_id FROM organism WHERE abbreviation = 'Dmel'")
+            self.organism_id = cursor.fetchone()[0]
+            cursor.execute('SELECT cv.name, cvt.name, cvt.cvterm_id FROM cvterm cvt JOIN cv ON cv.cv_id = cvt.cv_id')
+            for cv_name, term_name, cvterm_id in cursor.fetchall():
+                self.cvterm_ids[(cv_name, term_name)] = cvterm_id
+                if cv_name == 'FlyBase anatomy CV':
+                    self.anatomy_term_ids.append(cvterm_id)
+                elif cv_name == 'FlyBase development CV':
+                    self.stage_term_ids.append(cvterm_id)
+                elif cv_name in ('molecular_function', 'biological_process', 'cellular_component'):
+                    self.go_term_ids.append(cvterm_id)
+        self.conn.commit()
+        return
+
+    def add_dbxref(self, db_name, accession):
+        """Buffer a dbxref, returning its id."""
+        return self.add_row('dbxref', self.db_ids[db_name], accession)
+
+    def add_pubs(self):
+        """Add papers and reviews, with authors and PubMed IDs for most, then the pub graph."""
+        paper_type_id = self.cvterm('pub type', 'paper')
+        review_type_id = self.cvterm('pub type', 'review')
+        review_ids = array('q')
+        for number in range(self.count('pub')):
+            pub_type_id = review_type_id if self.rng.random() < 0.1 else paper_type_id
+            year = str(self.rng.randint(1910, 2024))
+            pub_id = self.add_row('pub', self.new_fbid('FBrf'), 'Synthetic paper {}.'.format(number), year,
+                                  'Author et al., {}'.format(year), pub_type_id)
+            self.pub_ids.append(pub_id)
+            if pub_type_id == paper_type_id:
+                self.paper_ids.append(pub_id)
+            else:
+                review_ids.append(pub_id)
+            for rank in range(1, self.rng.randint(1, 6) + 1):
+                self.add_row('pubauthor', pub_id, rank, 'Surname{}'.format(self.rng.randint(1, 50000)), 'A.')
+            if self.rng.random() < 0.8:
+                self.add_row('pub_dbxref', pub_id, self.add_dbxref('pubmed', str(20000000 + number)))
+        self.add_pub_relationships(review_ids)
+        self.commit('pubs')
+        return
+
+    def add_pub_relationships(self, review_ids):
+        """Relate each review to the papers it cites, and a few papers to another paper they are also in."""
+        related_to_id = self.cvterm('pub relationship type', 'related_to')
+        also_in_id = self.cvterm('pub relationship type', 'also_in')
+        if not self.paper_ids:
+            return
+        for review_id in review_ids:
+            for paper_id in set(self.rng.choice(self.paper_ids) for i in range(self.rng.randint(*PAPERS_PER_REVIEW))):
+                self.add_row('pub_relationship', paper_id, review_id, related_to_id)
+        for paper_id in self.paper_ids:
+            if self.rng.random() < ALSO_IN_PAPER_FRACTION:
+                other_paper_id = self.rng.choice(self.paper_ids)
+                if other_paper_id != paper_id:
+                    self.add_row('pub_relationship', paper_id, other_paper_id, also_in_id)
+        return
+
+    def add_chromosome_arms(self):
+        """Add Dmel chromosome arms (golden_path features) with residues."""
+        arm_type_id = self.cvterm('SO', 'golden_path', 'SO')
+        for arm_name, arm_length in CHROMOSOME_ARMS.items():
+            residues_length = arm_length if self.full_residues else min(arm_length, RESIDUES_LENGTH)
+            residues = ''.join(self.rng.choice('ACGT') for i in range(residues_length))
+            self.arm_ids[arm_name] = self.add_row('feature', self.organism_id, arm_name, arm_name + '_synthetic',
+                                                  residues, residues_length, arm_type_id)
+        self.commit('chromosome arms')
+        return
+
+    def add_feature(self, name, uniquename, type_id):
+        """Buffer a Dmel feature (without residues), returning its feature_id."""
+        return self.add_row('feature', self.organism_id, name, uniquename, None, None, type_id)
+
+    def random_location(self, max_length=20000):
+        """Return a random (arm feature_id, fmin, fmax, strand) on a chromosome arm."""
+        arm_name = self.rng.choice(list(CHROMOSOME_ARMS.keys()))
+        length = self.rng.randint(200, max(200, max_length))
+        fmin = self.rng.randint(0, CHROMOSOME_ARMS[arm_name] - length)
+        return self.arm_ids[arm_name], fmin, fmin + length, self.rng.choice((1, -1))
+
+    def add_names(self, feature_id, symbol, fullname=None):
+        """Add a current symbol (and fullname) plus a few non-current synonyms for a feature."""
+        symbol_type_id = self.cvterm('synonym type', 'symbol')
+        names = [(symbol, symbol_type_id, True)]
+        if fullname:
+            names.append((fullname, self.cvterm('synonym type', 'fullname'), True))
+        for number in range(self.rng.randint(*SYNONYMS_PER_FEATURE)):
+            names.append(('{}-syn{}'.format(symbol, number), symbol_type_id, False))
+        pub_id = self.rng.choice(self.pub_ids)
+        for name, type_id, is_current in names:
+            synonym_id = self.add_row('synonym', name, type_id, name)
+            self.add_row('feature_synonym', synonym_id, feature_id, pub_id, is_current)
+        return
+
+    def add_feature_pubs(self, feature_id, pubs_per_feature=(1, 8)):
+        """Associate a feature with random publications."""
+        for pub_id in set(self.rng.choice(self.pub_ids) for i in range(self.rng.randint(*pubs_per_feature))):
+            self.add_row('feature_pub', feature_id, pub_id)
+        return
+
+    def add_feature_dbxref(self, feature_id, db_name, accession):
+        """Add a current dbxref for a feature."""
+        self.add_row('feature_dbxref', feature_id, self.add_dbxref(db_name, accession))
+        return
+
+    def add_genes(self):
+        """Add genes, transcripts, CDSs and polypeptides, with locations, names, xrefs and GO annotations."""
+        type_ids = {i: self.cvterm('SO', i, 'SO') for i in ('gene', 'mRNA', 'ncRNA', 'CDS', 'polypeptide')}
+        partof_id = self.cvterm('relationship type', 'partof')
+        producedby_id = self.cvterm('relationship type', 'producedby')
+        annotation_id_type_id = self.cvterm('property type', 'annotation_ID')
+        for gene_number in range(self.count('gene')):
+            symbol = 'Syn{}'.format(gene_number)
+            is_ncrna = self.rng.random() < NCRNA_GENE_FRACTION
+            arm_id, fmin, fmax, strand = self.random_location()
+            gene_id = self.add_feature(symbol, self.new_fbid('FBgn'), type_ids['gene'])
+            self.gene_ids.append(gene_id)
+            self.add_row('featureloc', gene_id, arm_id, fmin, fmax, strand)
+            self.add_names(gene_id, symbol, fullname='{} fullname'.format(symbol))
+            self.add_feature_pubs(gene_id)
+            annotation_id = '{}{}'.format('CR' if is_ncrna else 'CG', 30000 + gene_number)
+            self.add_row('featureprop', gene_id, annotation_id_type_id, annotation_id)
+            self.add_feature_dbxref(gene_id, 'FlyBase Annotation IDs', annotation_id)
+            self.add_feature_dbxref(gene_id, 'EntrezGene', str(40000000 + gene_number))
+            self.add_feature_dbxref(gene_id, 'REFSEQ', 'NM_{:09d}'.format(gene_number))
+            self.add_go_annotations(gene_id)
+            for transcript_number in range(self.rng.randint(*TRANSCRIPTS_PER_GENE)):
+                suffix = chr(ord('A') + transcript_number)
+                transcript_symbol = '{}-R{}'.format(symbol, suffix)
+                transcript_type = 'ncRNA' if is_ncrna else 'mRNA'
+                transcript_id = self.add_feature(transcript_symbol, self.new_fbid('FBtr'), type_ids[transcript_type])
+                self.add_row('featureloc', transcript_id, arm_id, fmin, fmax, strand)
+                self.add_row('feature_relationship', transcript_id, gene_id, partof_id)
+                self.add_names(transcript_id, transcript_symbol)
+                if is_ncrna:
+                    self.add_feature_dbxref(transcript_id, 'RNAcentral', 'URS{:010X}_7227'.format(transcript_id))
+                    continue
+                # CDS segments (as parts of the transcript), then the polypeptide.
+                segment_starts = sorted(self.rng.sample(range(fmin, fmax - 10), self.rng.randint(1, 6)))
+                for segment_number, segment_start in enumerate(segment_starts):
+                    segment_end = min(fmax, segment_start + self.rng.randint(50, 500))
+                    cds_id = self.add_feature(None, '{}_CDS_{}'.format(transcript_id, segment_number), type_ids['CDS'])
+                    self.add_row('featureloc', cds_id, arm_id, segment_start, segment_end, strand)
+                    self.add_row('feature_relationship', cds_id, transcript_id, partof_id)
+                polypeptide_symbol = '{}-P{}'.format(symbol, suffix)
+                polypeptide_id = self.add_feature(polypeptide_symbol, self.new_fbid('FBpp'), type_ids['polypeptide'])
+                self.polypeptide_ids.append(polypeptide_id)
+                self.add_row('featureloc', polypeptide_id, arm_id, fmin, fmax, strand)
+                self.add_row('feature_relationship', polypeptide_id, transcript_id, producedby_id)
+                self.add_names(polypeptide_id, polypeptide_symbol)
+                self.add_feature_dbxref(polypeptide_id, 'UniProt/Swiss-Prot', 'Q{:07d}'.format(polypeptide_id))
+                if transcript_number == 0:
+                    self.add_feature_dbxref(polypeptide_id, 'UniProt/GCRP', 'Q{:07d}'.format(polypeptide_id))
+        self.commit('genes')
+        return
+
+    def add_go_annotations(self, gene_id):
+        """Add GO annotations (with evidence codes, a few negative) to a gene."""
+        evidence_code_type_id = self.cvterm('property type', 'evidence_code')
+        evidence_codes = ['inferred from direct assay', 'inferred from mutant phenotype', 'inferred from electronic annotation',
+                          'inferred from sequence or structural similarity with UniProtKB:P12345']
+        n_terms = min(len(self.go_term_ids), self.rng.randint(*GO_TERMS_PER_GENE))
+        for cvterm_id in self.rng.sample(self.go_term_ids, n_terms):
+            feature_cvterm_id = self.add_row('feature_cvterm', gene_id, cvterm_id, self.rng.choice(self.paper_ids),
+                                             self.rng.random() < 0.02)
+            self.add_row('feature_cvtermprop', feature_cvterm_id, evidence_code_type_id, self.rng.choice(evidence_codes))
+        return
+
+    def add_genetic_features(self):
+        """Add alleles (of genes), insertions and aberrations (located) and constructs."""
+        alleleof_id = self.cvterm('relationship type', 'alleleof')
+        kinds = [
+            ('allele', 'FBal', 'allele'),
+            ('insertion', 'FBti', 'transposable_element_insertion_site'),
+            ('construct', 'FBtp', 'transgenic_transposable_element'),
+            ('aberration', 'FBch', 'chromosome_structure_variation'),
+        ]
+        for entity, prefix, so_term in kinds:
+            type_id = self.cvterm('SO', so_term, 'SO')
+            for number in range(self.count(entity)):
+                if entity == 'allele':
+                    gene_number = self.rng.randrange(len(self.gene_ids))
+                    symbol = 'Syn{}[{}]'.format(gene_number, number)
+                else:
+                    symbol = '{}{}'.format(prefix[2:], number)
+                feature_id = self.add_feature(symbol, self.new_fbid(prefix), type_id)
+                if entity == 'allele':
+                    self.add_row('feature_relationship', feature_id, self.gene_ids[gene_number], alleleof_id)
+                    self.allele_ids.append(feature_id)
+                elif entity == 'insertion':
+                    self.add_row('featureloc', feature_id, *self.random_location(max_length=1))
+                elif entity == 'aberration':
+                    self.add_row('featureloc', feature_id, *self.random_location(max_length=100000))
+                self.add_names(feature_id, symbol)
+                self.add_feature_pubs(feature_id, pubs_per_feature=(1, 3))
+            self.commit(entity)
+        return
+
+    def add_phenotypes(self):
+        """Add single-allele genotypes, phenotypes and phenstatements."""
+        environment_id = self.add_row('environment', 'unspecified')
+        genotype_type_id = self.cvterm('genotype_feature type', 'single balancer')
+        genotype_ids = array('q')
+        for allele_id in self.allele_ids[:max(1, self.count('phenstatement') // 3)]:
+            genotype_id = self.add_row('genotype', 'genotype_{}'.format(allele_id))
+            self.add_row('feature_genotype', allele_id, genotype_id, genotype_type_id)
+            genotype_ids.append(genotype_id)
+        phenotype_ids = []
+        for term_id in self.anatomy_term_ids + self.go_term_ids:
+            for value in ('abnormal', 'lethal', 'viable', None):
+                phenotype_ids.append(self.add_row('phenotype', 'phenotype_{}_{}'.format(term_id, value), term_id, value))
+        phenotype_type_id = self.cvterm('phenotype type', 'phenotype')
+        for number in range(self.count('phenstatement')):
+            self.add_row('phenstatement', self.rng.choice(genotype_ids), environment_id, self.rng.choice(phenotype_ids),
+                         phenotype_type_id, self.rng.choice(self.paper_ids))
+        self.commit('phenotypes')
+        return
+
+    def add_interactions(self):
+        """Add physical interactions between polypeptides, grouped into interaction groups."""
+        interaction_type_id = self.cvterm('PSI-MI', 'physical association', 'psi-mi')
+        method_ids = [self.cvterm('PSI-MI', 'two hybrid', 'psi-mi'), interaction_type_id]
+        role_ids = [self.cvterm('PSI-MI', 'bait', 'psi-mi'), self.cvterm('PSI-MI', 'prey', 'psi-mi')]
+        comment_type_id = self.cvterm('interaction property type', 'comment')
+        participating_type_id = self.cvterm('feature_interaction property type', 'participating feature')
+        fi_comment_type_id = self.cvterm('feature_interaction property type', 'comment')
+        group_id = None
+        for number in range(self.count('interaction')):
+            # Two interactions per group on average.
+            if group_id is None or self.rng.random() < 0.5:
+                group_id = self.add_row('interaction_group', self.new_fbid('FBig'))
+            pub_id = self.rng.choice(self.paper_ids)
+            interaction_id = self.add_row('interaction', 'FBrf{}-{}.DPiM'.format(pub_id, number), interaction_type_id)
+            self.add_row('interaction_cvterm', interaction_id, self.rng.choice(method_ids))
+            self.add_row('interaction_pub', interaction_id, pub_id)
+            if self.rng.random() < 0.3:
+                self.add_row('interactionprop', interaction_id, comment_type_id, 'Synthetic comment.')
+            n_participants = min(len(self.polypeptide_ids), self.rng.randint(*PARTICIPANTS_PER_INTERACTION))
+            for rank, polypeptide_id in enumerate(self.rng.sample(self.polypeptide_ids, n_participants)):
+                feature_interaction_id = self.add_row('feature_interaction', polypeptide_id, interaction_id,
+                                                      role_ids[min(rank, 1)], rank)
+                self.add_row('interaction_group_feature_interaction', group_id, feature_interaction_id)
+                if self.rng.random() < 0.2:
+                    self.add_row('feature_interactionprop', feature_interaction_id, participating_type_id, 'tag')
+                    self.add_row('feature_interactionprop', feature_interaction_id, fi_comment_type_id, 'FLAG-tagged')
+        self.commit('interactions')
+        return
+
+    def add_humanhealth(self):
+        """Add human disease model reports linked to OMIM phenotypes and Dmel genes."""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT organism_id FROM organism WHERE abbreviation = 'Hsap'")
+            human_id = cursor.fetchone()[0]
+        for number in range(self.count('humanhealth')):
+            humanhealth_id = self.add_row('humanhealth', 'Synthetic disease {}'.format(number), self.new_fbid('FBhh'), human_id)
+            self.add_row('humanhealth_dbxref', humanhealth_id, self.add_dbxref('OMIM_PHENOTYPE', str(100000 + number)))
+            for i in range(self.rng.randint(1, 5)):
+                self.add_row('humanhealth_feature', humanhealth_id, self.rng.choice(self.gene_ids), self.rng.choice(self.paper_ids))
+        self.commit('human disease models')
+        return
+
+    def add_library(self, name, type_id):
+        """Buffer a new FBlc library, returning its id."""
+        return self.add_row('library', self.organism_id, name, self.new_fbid('FBlc'), type_id)
+
+    def add_library_feature(self, library_id, feature_id, typed_values):
+        """Add a library_feature and its (type_id, value) props."""
+        library_feature_id = self.add_row('library_feature', library_id, feature_id)
+        for type_id, value in typed_values:
+            self.add_row('library_featureprop', library_feature_id, type_id, '{:.4f}'.format(value))
+        return
+
+    def add_ht_expression(self):
+        """Add high-throughput datasets with samples, each having a value for every gene per unit."""
+        project_type_id = self.cvterm('FlyBase miscellaneous CV', 'project', 'FBcv')
+        sample_type_id = self.cvterm('FlyBase miscellaneous CV', 'biosample', 'FBcv')
+        belongs_to_id = self.cvterm('relationship type', 'belongs_to')
+        samples_per_dataset = max(1, self.count('ht_sample') // len(HT_DATASETS))
+        for dataset_name, units in HT_DATASETS.items():
+            unit_ids = [self.cvterm('library_featureprop type', i) for i in units]
+            dataset_id = self.add_library(dataset_name, project_type_id)
+            for number in range(samples_per_dataset):
+                # FlyAtlas2 also has miRNA samples, which the report puts in their own section.
+                prefix = 'microRNA_' if dataset_name == 'FlyAtlas2' and number % 4 == 0 else ''
+                sample_id = self.add_library('{}{}_sample_{}'.format(prefix, dataset_name, number), sample_type_id)
+                self.add_row('library_relationship', sample_id, dataset_id, belongs_to_id)
+                for gene_id in self.gene_ids:
+                    self.add_library_feature(sample_id, gene_id, [(i, self.rng.lognormvariate(1, 2)) for i in unit_ids])
+            self.commit('HT dataset {}'.format(dataset_name))
+        return
+
+    def add_expression(self, library_id, cvterm_id, cvterm_type_id, pub_id):
+        """Attach an expression statement (a term of a given type) to a library."""
+        expression_id = self.add_row('expression', 'expression_{}'.format(self.next_id['expression']))
+        self.add_row('expression_cvterm', expression_id, cvterm_id, cvterm_type_id)
+        self.add_row('library_expression', library_id, expression_id, pub_id)
+        return
+
+    def add_scrna_expression(self):
+        """Add scRNA-Seq clustering analyses and clusters, with mean_expr/spread for a subset of genes per cluster."""
+        result_type_id = self.cvterm('FlyBase miscellaneous CV', 'result', 'FBcv')
+        analysis_term_id = self.cvterm('FlyBase miscellaneous CV', 'cell clustering analysis', 'FBcv')
+        cluster_term_id = self.cvterm('FlyBase miscellaneous CV', 'transcriptional cell cluster', 'FBcv')
+        anatomy_type_id = self.cvterm('FlyBase miscellaneous CV', 'anatomy', 'FBcv')
+        stage_type_id = self.cvterm('FlyBase miscellaneous CV', 'stage', 'FBcv')
+        derived_stage_id = self.cvterm('FlyBase miscellaneous CV', 'derived_stage', 'FBcv')
+        sex_term_ids = [self.cvterm('FlyBase miscellaneous CV', i, 'FBcv') for i in ('female', 'male', 'mixed sex')]
+        belongs_to_id = self.cvterm('relationship type', 'belongs_to')
+        mean_expr_id = self.cvterm('library_featureprop type', 'mean_expr')
+        spread_id = self.cvterm('library_featureprop type', 'spread')
+        for number in range(self.count('scrna_analysis')):
+            pub_id = self.rng.choice(self.paper_ids)
+            analysis_id = self.add_library('scRNA_analysis_{}'.format(number), result_type_id)
+            self.add_row('library_cvterm', analysis_id, analysis_term_id, pub_id)
+            stage_library_cvterm_id = self.add_row('library_cvterm', analysis_id, self.rng.choice(self.stage_term_ids), pub_id)
+            self.add_row('library_cvtermprop', stage_library_cvterm_id, derived_stage_id)
+            self.add_row('library_pub', analysis_id, pub_id)
+            self.add_expression(analysis_id, self.rng.choice(self.anatomy_term_ids), anatomy_type_id, pub_id)
+            self.add_expression(analysis_id, self.rng.choice(sex_term_ids), stage_type_id, pub_id)
+            for cluster_number in range(self.rng.randint(*CLUSTERS_PER_ANALYSIS)):
+                cluster_id = self.add_library('scRNA_analysis_{}_cluster_{}'.format(number, cluster_number), result_type_id)
+                self.add_row('library_relationship', cluster_id, analysis_id, belongs_to_id)
+                self.add_row('library_cvterm', cluster_id, cluster_term_id, pub_id)
+                self.add_expression(cluster_id, self.rng.choice(self.anatomy_term_ids), anatomy_type_id, pub_id)
+                n_genes = int(len(self.gene_ids) * self.rng.uniform(*GENES_PER_CLUSTER_FRACTION))
+                for gene_id in self.rng.sample(self.gene_ids, n_genes):
+                    self.add_library_feature(cluster_id, gene_id, [(mean_expr_id, self.rng.expovariate(0.5)),
+                                                                   (spread_id, self.rng.random())])
+            self.commit('scRNA-Seq analysis {}'.format(number))
+        return
+
+    def finish(self):
+        """Reset sequences past the ids used and analyze the tables."""
+        log.info('Resetting sequences and analyzing tables.')
+        with self.conn.cursor() as cursor:
+            for table, columns in TABLE_COLUMNS.items():
+                cursor.execute('SELECT setval(pg_get_serial_sequence(%s, %s), %s, false)',
+                               (table, columns[0], self.next_id[table]))
+        self.conn.commit()
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.conn.autocommit = False
+        return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run a script with every database query it sends through psycopg2 counted.
+
+Usage:
+    query_counter.py SCRIPT [SCRIPT_ARGS ...]
+
+Example:
+    BENCHMARK_STATS_FILE=stats.json python query_counter.py ../src/report_hdm.py -c bench.cfg
+
+Notes:
+    Used by run_benchmarks.py. The psycopg2.connect() function is wrapped so
+    that every connection (including those made by SQLAlchemy engines) gets a
+    counting cursor factory, then the script is run as "__main__". On exit,
+    the query count is written as JSON to the file named by the
+    BENCHMARK_STATS_FILE environment variable (if set).
+
+"""
+
+import atexit
+import json
+import os
+import runpy
+import sys
+import psycopg2
+import psycopg2.extensions
+
+query_count = 0
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """A psycopg2 cursor that counts the statements it executes."""
+
+    def execute(self, query, vars=None):
+        """Count, then execute a statement."""
+        global query_count
+        query_count += 1
+        return super(CountingCursor, self).execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        """Count, then execute a statement for each set of parameters."""
+        global query_count
+        vars_list = list(vars_list)
+        query_count += len(vars_list)
+        return super(CountingCursor, self).executemany(query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        """Count, then call a stored procedure."""
+        global query_count
+        query_count += 1
+        return super(CountingCursor, self).callproc(procname, parameters)
+
+
+def counting_connect(*args, **kwargs):
+    """Open a psycopg2 connection that uses counting cursors by default."""
+    kwargs.setdefault('cursor_factory', CountingCursor)
+    return psycopg2_connect(*args, **kwargs)
+
+
+def write_stats():
+    """Write the query count to the stats file."""
+    stats_filename = os.environ.get('BENCHMARK_STATS_FILE')
+    if stats_filename:
+        with open(stats_filename, 'w') as stats_file:
+            json.dump({'query_count': query_count}, stats_file)
+    return
+
+
+psycopg2_connect = psycopg2.connect
+
+
+def main():
+    """Patch psycopg2 and run the script given on the command line."""
+    if len(sys.argv) < 2:
+        sys.exit('Usage: query_counter.py SCRIPT [SCRIPT_ARGS ...]')
+    script = os.path.abspath(sys.argv[1])
+    psycopg2.connect = counting_connect
+    atexit.register(write_stats)
+    sys.argv = [script] + sys.argv[2:]
+    sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == "__main__":
+    main()
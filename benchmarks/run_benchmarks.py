@@ -0,0 +1,252 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the python report scripts against a local chado stand-in database.
+
+Usage:
+    run_benchmarks.py [-h] -s SERVER -d DATABASE -u USERNAME -p PASSWORD [-r RELEASE]
+        [-l LOAD] [-i INCLUDE] [-x EXCLUDE] [-o RESULTS] [-t TIMEOUT] [-k KEEP_OUTPUTS]
+        [-n NOTE]
+
+Example:
+    python run_benchmarks.py -s localhost -d chado_bench -u postgres -p postgres -l
+    python run_benchmarks.py -s localhost -d chado_bench -u postgres -p postgres -i 'scrna|ht_gene'
+
+Notes:
+    With -l, the database is (re)loaded from chado_subset_schema.sql and
+    chado_seed_data.sql first; it must already exist and be empty or
+    disposable (the public schema is dropped). For a non-default port, set
+    PGPORT in the environment.
+
+    Each src/report_*.py script, mitab.py and generate_flycyc_files.py is run
+    in its own working directory through query_counter.py, with a
+    harvdev_utils config file pointing at the database. For each run, the
+    wall time, number of queries, peak RSS, exit code and total size of
+    output files are appended as one JSON line to the results file (default:
+    benchmarks/results/benchmark_results.jsonl), tagged with the git commit,
+    so that performance can be compared from commit to commit. The previous
+    result for each script from a different commit is shown alongside.
+
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import psycopg2
+
+log = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+SQL_FILES = [
+    os.path.join(BENCHMARK_DIR, 'chado_subset_schema.sql'),
+    os.path.join(BENCHMARK_DIR, 'chado_seed_data.sql'),
+]
+DEFAULT_RESULTS = os.path.join(BENCHMARK_DIR, 'results', 'benchmark_results.jsonl')
+CONFIG_FILENAME = 'benchmark.cfg'
+STATS_FILENAME = 'benchmark_stats.json'
+# Files in a run directory that are not report output.
+NON_OUTPUT_REGEX = re.compile(r'(\.log$|^{}$|^{}$)'.format(re.escape(CONFIG_FILENAME), re.escape(STATS_FILENAME)))
+CONFIG_TEMPLATE = """[connection]
+server = {server}
+database = {database}
+user = {username}
+PGPassword = {password}
+svn_username = none
+svn_password = none
+
+[release]
+database_release = {release}
+annotation_release = R6.99
+assembly = R6
+alliance_schema = none
+alliance_release = none
+"""
+
+
+def main():
+    """Load the benchmark database if asked, run every script and record the results."""
+    parser = argparse.ArgumentParser(description='Benchmark python report scripts on a local chado database.')
+    parser.add_argument('-s', '--server', help='Postgres server.', required=True)
+    parser.add_argument('-d', '--database', help='Benchmark database.', required=True)
+    parser.add_argument('-u', '--username', help='Postgres user name.', required=True)
+    parser.add_argument('-p', '--password', help='Postgres password.', required=True)
+    parser.add_argument('-r', '--release', default='2099_01', help='Release label given to scripts.', required=False)
+    parser.add_argument('-l', '--load', action='store_true', help='Load schema and seed data first.', required=False)
+    parser.add_argument('-i', '--include', help='Regex: only run scripts whose names match.', required=False)
+    parser.add_argument('-x', '--exclude', help='Regex: skip scripts whose names match.', required=False)
+    parser.add_argument('-o', '--results', default=DEFAULT_RESULTS, help='Results file (JSON lines).', required=False)
+    parser.add_argument('-t', '--timeout', type=int, default=3600, help='Seconds before a script is killed.', required=False)
+    parser.add_argument('-k', '--keep_outputs', help='Directory in which to keep run directories.', required=False)
+    parser.add_argument('-n', '--note', help='Free text note recorded with results (e.g., data scale).', required=False)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+
+    if args.load:
+        load_database(args.server, args.database, args.username, args.password, SQL_FILES)
+    scripts = list_scripts(args.include, args.exclude)
+    log.info('Benchmarking {} scripts.'.format(len(scripts)))
+    commit, dirty = get_git_commit()
+    previous_results = read_previous_results(args.results, commit)
+    work_dir = args.keep_outputs or tempfile.mkdtemp(prefix='benchmark_runs_')
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    try:
+        with open(args.results, 'a') as results_file:
+            for script in scripts:
+                run_dir = os.path.join(work_dir, os.path.splitext(os.path.basename(script))[0])
+                result = run_script(script, run_dir, args)
+                result.update({
+                    'results_version': RESULTS_VERSION,
+                    'commit': commit,
+                    'commit_dirty': dirty,
+                    'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'host': socket.gethostname(),
+                    'database': args.database,
+                    'note': args.note,
+                })
+                results_file.write(json.dumps(result, sort_keys=True) + '\n')
+                results_file.flush()
+                log_result(result, previous_results.get(result['script']))
+    finally:
+        if not args.keep_outputs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return
+
+
+def load_database(server, database, username, password, sql_files):
+    """Run SQL files (schema, then data) against the benchmark database."""
+    conn = psycopg2.connect(host=server, dbname=database, user=username, password=password)
+    for sql_file in sql_files:
+        log.info('Loading {}.'.format(sql_file))
+        with open(sql_file) as sql_input, conn.cursor() as cursor:
+            cursor.execute(sql_input.read())
+        conn.commit()
+    conn.close()
+    return
+
+
+def list_scripts(include, exclude):
+    """Return paths of the scripts to benchmark, filtered by include/exclude regexes."""
+    names = sorted(i for i in os.listdir(SRC_DIR) if i.startswith('report_') and i.endswith('.py'))
+    names += ['mitab.py', 'generate_flycyc_files.py']
+    if include:
+        names = [i for i in names if re.search(include, i)]
+    if exclude:
+        names = [i for i in names if not re.search(exclude, i)]
+    return [os.path.join(SRC_DIR, i) for i in names]
+
+
+def get_git_commit():
+    """Return the current git commit hash and whether the working tree has changes."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+        status = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def read_previous_results(results_filename, commit):
+    """Return a script-keyed dict of the latest result from a different commit."""
+    previous_results = {}
+    if not os.path.exists(results_filename):
+        return previous_results
+    with open(results_filename) as results_file:
+        for line in results_file:
+            result = json.loads(line)
+            if result.get('commit') != commit:
+                previous_results[result['script']] = result
+    return previous_results
+
+
+def script_arguments(script, run_dir, args):
+    """Return the command line arguments a script needs to reach the benchmark database."""
+    if os.path.basename(script) == 'mitab.py':
+        return ['-s', args.server, '-d', args.database, '-u', args.username, '-p', args.password, '-r', args.release]
+    config_filename = os.path.join(run_dir, CONFIG_FILENAME)
+    with open(config_filename, 'w') as config_file:
+        config_file.write(CONFIG_TEMPLATE.format(server=args.server, database=args.database, username=args.username,
+                                                 password=args.password, release=args.release))
+    return ['-c', config_filename]
+
+
+def run_script(script, run_dir, args, extra_args=(), extra_env=None):
+    """Run one script in its own directory, returning its resource usage and output size.
+
+    Args:
+        arg1 (script): (str) Path to the script.
+        arg2 (run_dir): (str) Working directory for the run (created if needed).
+        arg3 (args): (argparse.Namespace) Connection info (server, database, username, password, release) and timeout.
+        arg4 (extra_args): (list) Additional command line arguments for the script.
+        arg5 (extra_env): (dict) Additional environment variables for the script.
+
+    Returns:
+        A dict of run statistics.
+
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    stats_filename = os.path.join(run_dir, STATS_FILENAME)
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, 'query_counter.py'), script]
+    command += script_arguments(script, run_dir, args) + list(extra_args)
+    env = dict(os.environ, BENCHMARK_STATS_FILE=stats_filename, **(extra_env or {}))
+    log.info('Running {}.'.format(os.path.basename(script)))
+    with open(os.path.join(run_dir, 'benchmark_stdout.log'), 'w') as stdout_file:
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, cwd=run_dir, env=env, stdout=stdout_file, stderr=subprocess.STDOUT)
+        timer = threading.Timer(args.timeout, process.kill)
+        timer.start()
+        # os.wait4() gives the rusage of this child alone (peak RSS in KB on Linux).
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall_seconds = time.perf_counter() - start_time
+        timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    query_count = None
+    if os.path.exists(stats_filename):
+        with open(stats_filename) as stats_file:
+            query_count = json.load(stats_file)['query_count']
+    output_files = {}
+    for dirpath, _, filenames in os.walk(run_dir):
+        for filename in filenames:
+            if not NON_OUTPUT_REGEX.search(filename):
+                path = os.path.join(dirpath, filename)
+                output_files[os.path.relpath(path, run_dir)] = os.path.getsize(path)
+    return {
+        'script': os.path.basename(script),
+        'exit_code': process.returncode,
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(rusage.ru_utime + rusage.ru_stime, 3),
+        'peak_rss_kb': rusage.ru_maxrss,
+        'query_count': query_count,
+        'output_bytes': sum(output_files.values()),
+        'output_files': output_files,
+    }
+
+
+def log_result(result, previous_result):
+    """Log a result, with the change from the previous commit's result where there is one."""
+    message = '{script}: exit {exit_code}, {wall_seconds}s, {query_count} queries, {peak_rss_kb} KB peak RSS, {output_bytes} bytes'
+    message = message.format(**result)
+    if previous_result:
+        message += ' (was {}s, {} queries, {} KB, {} bytes at {})'.format(
+            previous_result['wall_seconds'], previous_result['query_count'], previous_result['peak_rss_kb'],
+            previous_result['output_bytes'], str(previous_result['commit'])[:8])
+    if result['exit_code'] != 0:
+        log.warning(message)
+    else:
+        log.info(message)
+    return
+
+
+if __name__ == "__main__":
+    main()
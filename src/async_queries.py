@@ -0,0 +1,190 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run many small parameterized lookups concurrently over a few connections.
+
+Usage:
+    from async_queries import AsyncQueryExecutor
+
+Example:
+    with AsyncQueryExecutor(conn_string, connections=4) as executor:
+        featurelocs = executor.gather(featureloc_query, [(i, ) for i in feature_ids])
+
+    prefetched = {}
+    executor.prefetch(get_cg_query, [(i, ) for i in gene_uniquenames], prefetched)
+    records = prefetched[(get_cg_query, (gene_uniquename, ))]
+
+Notes:
+    Queries are written as for psycopg2 ("%s" placeholders, "%%" for a
+    literal "%"), and results are lists of tuples, as from the connect()
+    helpers. gather() runs one statement over a list of parameter tuples,
+    gather_queries() runs a list of (statement, parameters) pairs, and
+    prefetch() gathers a lookup for distinct parameters into a
+    (statement, parameters)-keyed dict, so that a script can serve its
+    existing per-row lookups from it. Results keep the order of the input.
+
+    With the optional "asyncpg" driver installed, lookups run on an asyncio
+    event loop owned by the executor, one query in flight per connection
+    (asyncpg prepares each distinct statement once per connection).
+    Without it, the executor falls back to one thread per psycopg2
+    connection, running the lookups as prepared statements (see
+    prepared_statements.py). Either way, at most "connections" lookups are
+    in flight.
+
+    Given a snapshot ID (see snapshot_group.py), every executor connection
+    reads from that snapshot, e.g., in the shard workers of sharding.py.
+
+"""
+
+import asyncio
+import logging
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+import psycopg2.extensions
+from prepared_statements import log_plan_stats, run_prepared, to_numbered_placeholders
+from snapshot_group import follower_connection
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONNECTIONS = 4
+SNAPSHOT_REGEX = re.compile(r'^[0-9A-Fa-f-]+$')
+
+
+class AsyncQueryExecutor(object):
+    """A small set of connections that run parameterized lookups concurrently."""
+
+    def __init__(self, conn_string, connections=DEFAULT_CONNECTIONS, snapshot=None):
+        """Open the connections.
+
+        Args:
+            arg1 (conn_string): (str) A psycopg2 connection string (e.g., "host=... dbname=... user=... password=...").
+            arg2 (connections): (int) The number of connections, i.e., the most lookups in flight at once.
+            arg3 (snapshot): (str) An exported snapshot ID for all connections to read from, or None.
+
+        """
+        self.conn_string = conn_string
+        self.snapshot = snapshot
+        self.lookups = 0
+        self.seconds = 0.0
+        if asyncpg:
+            self.loop = asyncio.new_event_loop()
+            self.connections = self.loop.run_until_complete(self._connect_async(connections))
+        else:
+            self.thread_pool = ThreadPoolExecutor(max_workers=connections)
+            self.connections = [self._connect_sync() for i in range(connections)]
+        log.info('Opened {} {} connections for concurrent lookups.'.format(connections, 'asyncpg' if asyncpg else 'psycopg2'))
+
+    def __enter__(self):
+        """Return the executor."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the executor."""
+        self.close()
+        return False
+
+    async def _connect_async(self, connections):
+        """Open asyncpg connections, importing the snapshot if there is one."""
+        dsn_dict = psycopg2.extensions.parse_dsn(self.conn_string)
+        opened = []
+        for i in range(connections):
+            conn = await asyncpg.connect(host=dsn_dict.get('host'), port=dsn_dict.get('port'), user=dsn_dict.get('user'),
+                                         password=dsn_dict.get('password'), database=dsn_dict.get('dbname'))
+            if self.snapshot:
+                if not SNAPSHOT_REGEX.match(self.snapshot):
+                    raise ValueError('Unexpected snapshot ID: {}'.format(self.snapshot))
+                await conn.execute('BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY')
+                await conn.execute("SET TRANSACTION SNAPSHOT '{}'".format(self.snapshot))
+            opened.append(conn)
+        return opened
+
+    def _connect_sync(self):
+        """Open a psycopg2 connection, importing the snapshot if there is one."""
+        if self.snapshot:
+            return follower_connection(self.conn_string, self.snapshot)
+        return psycopg2.connect(self.conn_string)
+
+    def gather(self, statement, param_list):
+        """Run one statement for each parameter tuple; return the lists of result tuples, in order."""
+        return self.gather_queries([(statement, params) for params in param_list])
+
+    def gather_queries(self, queries):
+        """Run (statement, parameters) pairs concurrently; return the lists of result tuples, in order."""
+        start_time = time.perf_counter()
+        if asyncpg:
+            results = self.loop.run_until_complete(self._gather_async(queries))
+        else:
+            results = self._gather_sync(queries)
+        self.lookups += len(queries)
+        self.seconds += time.perf_counter() - start_time
+        return results
+
+    async def _gather_async(self, queries):
+        """Run the queries with one asyncpg worker per connection."""
+        results = [None] * len(queries)
+        pending = iter(enumerate(queries))
+        numbered = {}    # Cache of psycopg2-style statement: asyncpg-style statement.
+
+        async def work(conn):
+            for index, (statement, params) in pending:
+                if statement not in numbered:
+                    numbered[statement] = to_numbered_placeholders(statement)
+                rows = await conn.fetch(numbered[statement], *params)
+                results[index] = [tuple(row) for row in rows]
+
+        await asyncio.gather(*[work(conn) for conn in self.connections])
+        return results
+
+    def _gather_sync(self, queries):
+        """Run the queries with one thread per psycopg2 connection."""
+        results = [None] * len(queries)
+        pending = queue.SimpleQueue()
+        for index_query in enumerate(queries):
+            pending.put(index_query)
+
+        def work(conn):
+            while True:
+                try:
+                    index, (statement, params) = pending.get_nowait()
+                except queue.Empty:
+                    break
+                results[index] = run_prepared(statement, params, conn)
+
+        for future in [self.thread_pool.submit(work, conn) for conn in self.connections]:
+            future.result()
+        return results
+
+    def prefetch(self, statement, param_list, prefetched):
+        """Gather a lookup for the distinct parameter tuples into a dict keyed by (statement, parameters).
+
+        Args:
+            arg1 (statement): (str) The psycopg2-style statement.
+            arg2 (param_list): (list) Parameter tuples (duplicates and ones already prefetched are skipped).
+            arg3 (prefetched): (dict) The dict to add results to.
+
+        """
+        param_list = [i for i in dict.fromkeys(param_list) if (statement, i) not in prefetched]
+        for params, rows in zip(param_list, self.gather(statement, param_list)):
+            prefetched[(statement, params)] = rows
+        return
+
+    def close(self):
+        """Close the connections."""
+        if asyncpg:
+            self.loop.run_until_complete(asyncio.gather(*[conn.close() for conn in self.connections]))
+            self.loop.close()
+        else:
+            log_plan_stats(*self.connections)
+            for conn in self.connections:
+                conn.rollback()
+                conn.close()
+            self.thread_pool.shutdown()
+        self.connections = []
+        log.info('Ran {} concurrent lookups in {:.1f}s.'.format(self.lookups, self.seconds))
+        return
@@ -0,0 +1,188 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Checkpoint a long per-entity report loop, so that an interrupted run can be resumed.
+
+Usage:
+    from checkpoint import Checkpoint
+
+Example:
+    checkpoint = Checkpoint(output_filename, database, [i[KEY] for i in driver_rows], resume=args.resume)
+    output_file = checkpoint.open_output(output_filename)
+    if not checkpoint.resuming:
+        output_file.write(header)
+    for row in driver_rows[checkpoint.start_index:]:
+        output_file.write(process(row))
+        checkpoint.completed()
+    checkpoint.finish()
+
+Notes:
+    The driver rows must come from a query with a deterministic ORDER BY.
+    Every CHECKPOINT_INTERVAL seconds, the output files opened through the
+    checkpoint are flushed and fsync'ed, then their sizes, the number of
+    driver rows completed (and the last driver key) are written to
+    "<output_filename>.checkpoint.json" via a temporary file and an atomic
+    rename. The checkpoint also records the database name and a fingerprint
+    of the ordered driver keys.
+
+    With resume=True, a checkpoint made against the same database and
+    driver keys is loaded: the output files are truncated to their
+    checkpointed sizes (dropping anything written after the checkpoint) and
+    reopened for appending, and the loop continues from start_index. If the
+    database or driver keys differ, a RuntimeError is raised; if there is
+    no checkpoint, the run starts from the beginning.
+
+    A report whose final output cannot be appended to directly (e.g., JSON
+    that is gzipped or hashed as it is written) can journal its records to
+    a side file opened with journal=True, and replay them with
+    replay_lines() on resume. Journals and the checkpoint are removed by
+    finish() when the loop completes.
+
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_INTERVAL = 60    # Seconds between checkpoints.
+
+
+def driver_fingerprint(driver_keys):
+    """Return a hash of an ordered list of driver keys."""
+    key_hash = hashlib.sha256()
+    for key in driver_keys:
+        key_hash.update(str(key).encode('utf-8'))
+        key_hash.update(b'\n')
+    return '{}:{}'.format(len(driver_keys), key_hash.hexdigest())
+
+
+class Checkpoint(object):
+    """Track the progress of a loop over ordered driver rows, saving it with output file sizes."""
+
+    def __init__(self, output_filename, database, driver_keys, resume=False, interval=CHECKPOINT_INTERVAL):
+        """Set up a new checkpoint, or load the last one if resuming.
+
+        Args:
+            arg1 (output_filename): (str) The report output file; the checkpoint file is named after it.
+            arg2 (database): (str) The database queried; a checkpoint is only resumed against the same one.
+            arg3 (driver_keys): (list) The keys of the driver rows, in processing order.
+            arg4 (resume): (bool) Continue from the last checkpoint, if there is one.
+            arg5 (interval): (int) Seconds between checkpoints.
+
+        Raises:
+            Raises a RuntimeError if resuming a checkpoint made against a different database or driver keys.
+
+        """
+        self.filename = '{}.checkpoint.json'.format(output_filename)
+        self.database = database
+        self.driver_keys = driver_keys
+        self.fingerprint = driver_fingerprint(driver_keys)
+        self.interval = interval
+        self.completed_count = 0
+        self.offsets = {}      # Output file path-keyed dict of checkpointed sizes (bytes).
+        self.files = {}        # Output file path-keyed dict of open files.
+        self.journals = []     # Paths of side files to remove when the loop completes.
+        self.resuming = False
+        self.last_save = time.monotonic()
+        if resume:
+            self.load()
+
+    @property
+    def start_index(self):
+        """Return the index of the first driver row still to be processed."""
+        return self.completed_count
+
+    def load(self):
+        """Load the last checkpoint, checking that it was made against the same database and driver keys."""
+        if not os.path.exists(self.filename):
+            log.warning('No checkpoint found at {}; starting from the beginning.'.format(self.filename))
+            return
+        with open(self.filename) as checkpoint_file:
+            state = json.load(checkpoint_file)
+        if state['database'] != self.database or state['driver_fingerprint'] != self.fingerprint:
+            raise RuntimeError('Checkpoint {} was made against different data (database {}); rerun without --resume.'.
+                               format(self.filename, state['database']))
+        self.completed_count = state['completed_count']
+        self.offsets = state['offsets']
+        self.resuming = True
+        log.info('Resuming from checkpoint {} (saved {}): {} of {} done, last key {}.'.format(
+            self.filename, state['saved'], self.completed_count, len(self.driver_keys), state['last_key']))
+        return
+
+    def open_output(self, path, journal=False):
+        """Open an output file for appending: cut back to its checkpointed size if resuming, else new.
+
+        Args:
+            arg1 (path): (str) The output file path.
+            arg2 (journal): (bool) The file is a side file, to be removed by finish().
+
+        Returns:
+            A text file object open for appending.
+
+        """
+        if self.resuming:
+            if path not in self.offsets or not os.path.exists(path):
+                raise RuntimeError('Cannot resume: {} is missing or was not checkpointed; rerun without --resume.'.format(path))
+            os.truncate(path, self.offsets[path])
+            output_file = open(path, 'a', newline='')
+        else:
+            output_file = open(path, 'w', newline='')
+        self.files[path] = output_file
+        if journal:
+            self.journals.append(path)
+        return output_file
+
+    def replay_lines(self, path):
+        """Yield the checkpointed lines of an output file (nothing unless resuming)."""
+        if not self.resuming:
+            return
+        self.files[path].flush()
+        with open(path, newline='') as input_file:
+            for line in input_file:
+                yield line
+        return
+
+    def completed(self):
+        """Record that the next driver row is done, saving a checkpoint if the interval has passed."""
+        self.completed_count += 1
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save()
+        return
+
+    def save(self):
+        """Flush the output files to disk, then atomically replace the checkpoint file."""
+        for path, output_file in self.files.items():
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            self.offsets[path] = os.path.getsize(path)
+        state = {
+            'database': self.database,
+            'driver_fingerprint': self.fingerprint,
+            'completed_count': self.completed_count,
+            'last_key': self.driver_keys[self.completed_count - 1] if self.completed_count else None,
+            'offsets': self.offsets,
+            'saved': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        temp_filename = '{}.tmp'.format(self.filename)
+        with open(temp_filename, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file, indent=2)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_filename, self.filename)
+        self.last_save = time.monotonic()
+        log.debug('Saved checkpoint: {} of {} done, last key {}.'.format(self.completed_count, len(self.driver_keys), state['last_key']))
+        return
+
+    def finish(self):
+        """Close the output files, and remove journals and the checkpoint now that the loop is complete."""
+        for output_file in self.files.values():
+            output_file.close()
+        for path in self.journals + [self.filename]:
+            if os.path.exists(path):
+                os.remove(path)
+        log.info('Completed all {} driver rows.'.format(len(self.driver_keys)))
+        return
@@ -0,0 +1,441 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare bulk report files against those from a reference (usually the previous) release.
+
+Usage:
+    compare_release_outputs.py [-h] -c CURRENT_DIR -p PREVIOUS_DIR [-o OUTPUT]
+        [-j JOBS] [-b BUCKETS] [-k KEY_COLUMN] [-t SIZE_THRESHOLD] [-v VERBOSE]
+
+Example:
+    python compare_release_outputs.py -c /data/build-reporting/fb_2024_02_reporting/bulk_reports
+        -p /data/build-reporting/fb_2024_01_reporting/bulk_reports -o bulk_report_comparison.tsv
+
+Notes:
+    Files are paired by name after release tokens (e.g., "fb_2024_01",
+    "2024_01", "FB2024_01") are masked; gzipped files are read directly,
+    and sizes are compared on uncompressed content.
+    Each file is streamed once, in parallel across worker processes, to get
+    its row count, distinct FlyBase IDs per ID column and a hashed
+    (key, row) pair for every row. The hashes are spilled to per-bucket
+    files on disk, so memory stays bounded by one bucket at a time when
+    the two versions of a report are diffed.
+
+    TSV files: "#" lines are skipped; the last "#" line with tabs gives the
+    column headers. The key is the first column (see -k). JSON files: each
+    record in the top-level "data" array is a row; the key is its
+    "primaryId", "fbid", "id" or "uniquename" value (first found, at the top
+    level or one level down). Other files are compared line by line.
+
+    Summary columns:
+    - status: OK, SMALL (current file < SIZE_THRESHOLD of previous size),
+      MISSING (no current file) or NEW (no previous file).
+    - rows_added/rows_removed: rows whose key is only in one version.
+    - keys_changed: keys in both versions whose set of rows differs.
+
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Masks for release-specific parts of bulk report filenames.
+RELEASE_REGEX = re.compile(r'(fb_|FB)?[0-9]{4}_[0-9]{2}(_reporting)?(_[0-9]{2})?')
+# FlyBase IDs (optionally prefixed: e.g., "flybase:FBgn0000001").
+FB_ID_REGEX = re.compile(r'^(flybase:|FLYBASE:)?FB[a-z]{2}[0-9]{7,10}$')
+JSON_KEY_NAMES = ('primaryId', 'fbid', 'id', 'uniquename')
+SAMPLE_ROWS = 1000          # Rows sampled to decide which columns hold FlyBase IDs.
+ID_COLUMN_FRACTION = 0.9    # Fraction of non-empty sampled values that must be FlyBase IDs.
+SPILL_SIZE = 65536          # Hash pairs held in memory per bucket before spilling to disk.
+READ_SIZE = 1 << 22         # Characters read per chunk when streaming JSON.
+
+SUMMARY_HEADERS = [
+    'report',
+    'current_file',
+    'previous_file',
+    'status',
+    'current_bytes',
+    'previous_bytes',
+    'size_ratio',
+    'current_rows',
+    'previous_rows',
+    'rows_added',
+    'rows_removed',
+    'keys_changed',
+    'distinct_ids',
+]
+
+
+def main():
+    """Pair up current and previous bulk report files, compare them and print a summary."""
+    parser = argparse.ArgumentParser(description='Compare bulk report files between releases.')
+    parser.add_argument('-c', '--current_dir', help='Directory of bulk reports for the current release.', required=True)
+    parser.add_argument('-p', '--previous_dir', help='Directory of bulk reports for the reference release.', required=True)
+    parser.add_argument('-o', '--output', help='Summary TSV output file (default: STDOUT).', required=False)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Number of worker processes.', required=False)
+    parser.add_argument('-b', '--buckets', type=int, default=256, help='Number of on-disk hash buckets per file.', required=False)
+    parser.add_argument('-k', '--key_column', type=int, default=0, help='0-based TSV column to use as row key.', required=False)
+    parser.add_argument('-t', '--size_threshold', type=float, default=0.99, help='Minimum current/previous size ratio.', required=False)
+    parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
+    args = parser.parse_args()
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=level)
+
+    start_time = time.perf_counter()
+    report_pairs = pair_report_files(args.current_dir, args.previous_dir)
+    log.info('Found {} reports to compare.'.format(len(report_pairs)))
+    spill_dir = tempfile.mkdtemp(prefix='compare_release_outputs_')
+    try:
+        summaries = compare_reports(report_pairs, spill_dir, args.jobs, args.buckets, args.key_column, args.size_threshold)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    output_file = open(args.output, 'w') if args.output else sys.stdout
+    output_file.write('\t'.join(SUMMARY_HEADERS) + '\n')
+    for summary in summaries:
+        output_file.write('\t'.join('' if summary[i] is None else str(summary[i]) for i in SUMMARY_HEADERS) + '\n')
+    if args.output:
+        output_file.close()
+    problems = [i for i in summaries if i['status'] in ('SMALL', 'MISSING')]
+    for problem in problems:
+        log.warning('{}: {} (size ratio {}).'.format(problem['report'], problem['status'], problem['size_ratio']))
+    log.info('Compared {} reports in {:.1f}s; {} need attention.'.format(len(summaries), time.perf_counter() - start_time, len(problems)))
+    return 1 if problems else 0
+
+
+def report_name(filename):
+    """Mask release tokens in a bulk report filename."""
+    return RELEASE_REGEX.sub('RELEASE', filename)
+
+
+def pair_report_files(current_dir, previous_dir):
+    """Return a report name-keyed dict of (current path, previous path) tuples (None if absent)."""
+    pairs = {}
+    for position, directory in enumerate((current_dir, previous_dir)):
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if not os.path.isfile(path) or filename.endswith('.manifest.json'):
+                continue
+            name = report_name(filename[:-3] if filename.endswith('.gz') else filename)
+            pairs.setdefault(name, [None, None])[position] = path
+    return {name: tuple(paths) for name, paths in sorted(pairs.items())}
+
+
+def compare_reports(report_pairs, spill_dir, jobs, n_buckets, key_column, size_threshold):
+    """Scan every file in parallel, then diff each report's two versions in parallel."""
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        scan_jobs = {}
+        for name, paths in report_pairs.items():
+            for position, path in enumerate(paths):
+                if path:
+                    bucket_prefix = os.path.join(spill_dir, '{}.{}'.format(len(scan_jobs), position))
+                    scan_jobs[path] = executor.submit(scan_file, path, bucket_prefix, n_buckets, key_column)
+        scans = {path: job.result() for path, job in scan_jobs.items()}
+        diff_jobs = {}
+        for name, (current_path, previous_path) in report_pairs.items():
+            if current_path and previous_path:
+                diff_jobs[name] = executor.submit(diff_buckets, scans[current_path]['bucket_prefix'],
+                                                  scans[previous_path]['bucket_prefix'], n_buckets)
+        summaries = []
+        for name, (current_path, previous_path) in report_pairs.items():
+            current = scans.get(current_path, {})
+            previous = scans.get(previous_path, {})
+            summary = {
+                'report': name,
+                'current_file': os.path.basename(current_path) if current_path else None,
+                'previous_file': os.path.basename(previous_path) if previous_path else None,
+                'current_bytes': current.get('bytes'),
+                'previous_bytes': previous.get('bytes'),
+                'current_rows': current.get('rows'),
+                'previous_rows': previous.get('rows'),
+                'size_ratio': None,
+                'rows_added': None,
+                'rows_removed': None,
+                'keys_changed': None,
+                'distinct_ids': format_distinct_ids(current.get('distinct_ids', {}), previous.get('distinct_ids', {})),
+            }
+            if not current_path:
+                summary['status'] = 'MISSING'
+            elif not previous_path:
+                summary['status'] = 'NEW'
+            else:
+                summary.update(diff_jobs[name].result())
+                if previous['bytes']:
+                    summary['size_ratio'] = round(current['bytes'] / previous['bytes'], 4)
+                small = summary['size_ratio'] is not None and summary['size_ratio'] < size_threshold
+                summary['status'] = 'SMALL' if small else 'OK'
+            summaries.append(summary)
+    return summaries
+
+
+def format_distinct_ids(current_counts, previous_counts):
+    """Format per-column distinct ID counts as "column:current/previous" pairs."""
+    columns = list(current_counts.keys()) + [i for i in previous_counts.keys() if i not in current_counts]
+    return ';'.join('{}:{}/{}'.format(i, current_counts.get(i, '-'), previous_counts.get(i, '-')) for i in columns) or None
+
+
+class CountingReader(io.RawIOBase):
+    """A plain or gzipped input file that counts the (uncompressed) bytes read from it."""
+
+    def __init__(self, path):
+        """Open the file."""
+        super().__init__()
+        self.raw_file = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        self.bytes_read = 0
+
+    def readable(self):
+        """Report that this stream is readable."""
+        return True
+
+    def readinto(self, buffer):
+        """Read bytes into a buffer, counting them."""
+        size = self.raw_file.readinto(buffer)
+        self.bytes_read += size
+        return size
+
+    def size(self):
+        """Return the size of the file's content, counting any bytes not read yet (e.g., after a JSON data array)."""
+        while True:
+            chunk = self.raw_file.read(READ_SIZE)
+            if not chunk:
+                return self.bytes_read
+            self.bytes_read += len(chunk)
+
+    def close(self):
+        """Close the file."""
+        self.raw_file.close()
+        super().close()
+        return
+
+
+def open_text(path):
+    """Open a plain or gzipped file for reading as text; its CountingReader is the "buffer.raw" attribute."""
+    return io.TextIOWrapper(io.BufferedReader(CountingReader(path)), newline='')
+
+
+def hash64(text):
+    """Return a stable 64-bit hash of a string."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class BucketSpiller(object):
+    """Accumulate (key hash, row hash) pairs in per-bucket arrays, spilling them to disk."""
+
+    def __init__(self, bucket_prefix, n_buckets):
+        """Create empty buckets for a file."""
+        self.bucket_prefix = bucket_prefix
+        self.n_buckets = n_buckets
+        self.buckets = [array('Q') for i in range(n_buckets)]
+
+    def add(self, key_hash, row_hash):
+        """Add a hash pair to its key's bucket."""
+        bucket_number = key_hash % self.n_buckets
+        bucket = self.buckets[bucket_number]
+        bucket.append(key_hash)
+        bucket.append(row_hash)
+        if len(bucket) >= 2 * SPILL_SIZE:
+            self.spill(bucket_number)
+        return
+
+    def spill(self, bucket_number):
+        """Append a bucket's pairs to its file and empty it."""
+        with open('{}.{}'.format(self.bucket_prefix, bucket_number), 'ab') as bucket_file:
+            self.buckets[bucket_number].tofile(bucket_file)
+        self.buckets[bucket_number] = array('Q')
+        return
+
+    def close(self):
+        """Spill everything that remains."""
+        for bucket_number in range(self.n_buckets):
+            self.spill(bucket_number)
+        return
+
+
+def scan_file(path, bucket_prefix, n_buckets, key_column):
+    """Stream one file, returning its stats and spilling its hashed rows to bucket files."""
+    start_time = time.perf_counter()
+    spiller = BucketSpiller(bucket_prefix, n_buckets)
+    # The uncompressed size is counted as the file is scanned, so gzipped files are only decompressed once.
+    with open_text(path) as input_file:
+        if '.json' in os.path.basename(path):
+            stats = scan_json_file(input_file, spiller)
+        else:
+            stats = scan_tsv_file(input_file, spiller, key_column)
+        stats['bytes'] = input_file.buffer.raw.size()
+    spiller.close()
+    stats['bucket_prefix'] = bucket_prefix
+    log.info('Scanned {} ({} rows) in {:.1f}s.'.format(path, stats['rows'], time.perf_counter() - start_time))
+    return stats
+
+
+def scan_tsv_file(input_file, spiller, key_column):
+    """Hash the rows of an open line-based file and count distinct IDs in its ID columns."""
+    headers = []
+    id_columns = None    # Column indices found to hold FlyBase IDs; decided after sampling.
+    sample = []
+    distinct_ids = {}
+    row_count = 0
+    for line in input_file:
+        line = line.rstrip('\r\n')
+        if line.startswith('#'):
+            if row_count == 0 and '\t' in line:
+                headers = line.lstrip('#').lstrip().split('\t')
+            continue
+        if not line:
+            continue
+        row_count += 1
+        fields = line.split('\t')
+        key = fields[key_column] if len(fields) > 1 and key_column < len(fields) else line
+        spiller.add(hash64(key), hash64(line))
+        if id_columns is None:
+            sample.append(fields)
+            if len(sample) < SAMPLE_ROWS:
+                continue
+            id_columns = find_id_columns(sample)
+            distinct_ids = {i: set() for i in id_columns}
+            for sample_fields in sample:
+                add_distinct_ids(distinct_ids, sample_fields)
+            sample = []
+        else:
+            add_distinct_ids(distinct_ids, fields)
+    if id_columns is None:
+        id_columns = find_id_columns(sample)
+        distinct_ids = {i: set() for i in id_columns}
+        for sample_fields in sample:
+            add_distinct_ids(distinct_ids, sample_fields)
+    id_counts = {}
+    for column, ids in distinct_ids.items():
+        column_name = headers[column] if column < len(headers) else 'column_{}'.format(column + 1)
+        id_counts[column_name] = len(ids)
+    return {'rows': row_count, 'distinct_ids': id_counts}
+
+
+def find_id_columns(sample):
+    """Return indices of sampled columns whose non-empty values are mostly FlyBase IDs."""
+    id_columns = []
+    n_columns = max((len(i) for i in sample), default=0)
+    for column in range(n_columns):
+        values = [i[column] for i in sample if column < len(i) and i[column]]
+        if values and sum(1 for i in values if FB_ID_REGEX.match(i)) >= ID_COLUMN_FRACTION * len(values):
+            id_columns.append(column)
+    return id_columns
+
+
+def add_distinct_ids(distinct_ids, fields):
+    """Record the ID values of a row (as 64-bit hashes, to save memory)."""
+    for column, ids in distinct_ids.items():
+        if column < len(fields) and fields[column]:
+            ids.add(hash64(fields[column]))
+    return
+
+
+def iter_json_records(input_file, data_key='data'):
+    """Yield the records of a top-level JSON array in an open file without loading the whole file."""
+    decoder = json.JSONDecoder()
+    data_regex = re.compile(r'"{}"\s*:\s*\['.format(re.escape(data_key)))
+    buffer = ''
+    match = None
+    while match is None:
+        chunk = input_file.read(READ_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+        match = data_regex.search(buffer)
+    position = match.end()
+    eof = False
+    while True:
+        # Skip whitespace and commas between records.
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = input_file.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield record
+        position = end
+        if position > READ_SIZE:
+            buffer = buffer[position:]
+            position = 0
+
+
+def json_record_key(record):
+    """Return the ID used as a JSON record's key, or None if none is found."""
+    candidates = [record] + [i for i in record.values() if isinstance(i, dict)]
+    for candidate in candidates:
+        for key_name in JSON_KEY_NAMES:
+            if key_name in candidate:
+                return str(candidate[key_name])
+    return None
+
+
+def scan_json_file(input_file, spiller):
+    """Hash the records of an open JSON report and count distinct record keys."""
+    row_count = 0
+    keys = set()
+    for record in iter_json_records(input_file):
+        row_count += 1
+        row_text = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        key = json_record_key(record)
+        row_hash = hash64(row_text)
+        key_hash = hash64(key) if key is not None else row_hash
+        spiller.add(key_hash, row_hash)
+        if key is not None:
+            keys.add(key_hash)
+    return {'rows': row_count, 'distinct_ids': {'record_key': len(keys)} if keys else {}}
+
+
+def load_bucket(bucket_prefix, bucket_number):
+    """Return a key hash-keyed dict of sorted row hash lists for one bucket file."""
+    pairs = array('Q')
+    bucket_filename = '{}.{}'.format(bucket_prefix, bucket_number)
+    if os.path.exists(bucket_filename):
+        with open(bucket_filename, 'rb') as bucket_file:
+            pairs.frombytes(bucket_file.read())
+    rows_by_key = {}
+    for i in range(0, len(pairs), 2):
+        rows_by_key.setdefault(pairs[i], []).append(pairs[i + 1])
+    for row_hashes in rows_by_key.values():
+        row_hashes.sort()
+    return rows_by_key
+
+
+def diff_buckets(current_prefix, previous_prefix, n_buckets):
+    """Diff two files bucket by bucket, returning added/removed row and changed key counts."""
+    rows_added = 0
+    rows_removed = 0
+    keys_changed = 0
+    for bucket_number in range(n_buckets):
+        current = load_bucket(current_prefix, bucket_number)
+        previous = load_bucket(previous_prefix, bucket_number)
+        for key_hash, row_hashes in current.items():
+            previous_row_hashes = previous.pop(key_hash, None)
+            if previous_row_hashes is None:
+                rows_added += len(row_hashes)
+            elif previous_row_hashes != row_hashes:
+                keys_changed += 1
+        for row_hashes in previous.values():
+            rows_removed += len(row_hashes)
+    return {'rows_added': rows_added, 'rows_removed': rows_removed, 'keys_changed': keys_changed}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run a report script's main() function with the opt-in run tools: profiling, run history and query cache.
+
+Usage:
+    from entry_point import run_main
+    ...
+    if __name__ == "__main__":
+        run_main(main, log)
+
+Example:
+    python report_scrna_seq_data.py -v -c /path/to/config.cfg --profile cpu
+    BULK_REPORT_HISTORY_DB=/data/build-reporting/bulk_report_history.sqlite python report_hdm.py -c /path/to/config.cfg
+
+Notes:
+    Each tool is set up by its own module, and is off unless asked for:
+    profiling by a "--profile cpu|mem|both" option (see profiling.py), the
+    run history by the BULK_REPORT_HISTORY_DB environment variable (see
+    run_history.py), and the query cache by the BULK_REPORT_QUERY_CACHE
+    environment variable (see query_cache.py). Without any of them, main()
+    runs as is.
+
+"""
+
+import sys
+from profiling import pop_profile_arg, run_profiled
+from query_cache import install_query_cache
+from run_history import start_run_recorder
+
+
+def run_main(main, log=None):
+    """Run main(), profiled, recorded and with cached queries as requested by the command line and environment.
+
+    Args:
+        arg1 (main): (function) The script's main function (called without arguments).
+        arg2 (log): (logging.Logger) The script's logger; profiling artifacts are written next to its log file.
+
+    Returns:
+        The return value of main().
+
+    """
+    mode, sys.argv[:] = pop_profile_arg(sys.argv)
+    recorder = start_run_recorder(main, mode)
+    install_query_cache(main.__globals__)
+    if not recorder:
+        return run_profiled(main, log, mode)
+    status = 'ok'
+    try:
+        return run_profiled(main, log, mode)
+    except SystemExit as exit_error:
+        if exit_error.code not in (None, 0):
+            status = 'exit {}'.format(exit_error.code)
+        raise
+    except BaseException as error:
+        status = 'error: {}'.format(type(error).__name__)
+        raise
+    finally:
+        recorder.finish(status)
@@ -16,11 +16,28 @@ Notes:
     If "-f" option is specified, it also generates FASTA files for each of the
     major chromosome scaffolds; ~10m/chr to generate FASTA files.
 
+    The number of SQL statements run by each query step is logged. Each step
+    should run a fixed number of statements, whatever the data volume: GO IDs
+    are selected as columns rather than loaded through the lazy
+    Cvterm.dbxref relationship, which would add a query per GO term.
+
+    The chromosome gene (.pf) files are rendered and written in parallel,
+    one forked writer process per chromosome scaffold (up to the CPU count),
+    each writing its file in one go.
+
+    Feature queries never load the large text columns of Feature (residues,
+    md5checksum; see defer_large_columns()), except for the chromosome
+    scaffold residues when FASTA files are requested.
+
 """
 
 import argparse
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import aliased, sessionmaker
+import logging
+import multiprocessing
+import os
+from array import array
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import aliased, defer, sessionmaker
 from textwrap import TextWrapper
 # from sqlalchemy.orm.exc import NoResultFound
 from harvdev_utils.production import (
@@ -29,32 +46,64 @@ from harvdev_utils.production import (
     Featureloc, Organism, Pub, PubDbxref, Synonym
 )
 from harvdev_utils.psycopg_functions import set_up_db_reading
+from evidence_codes import translate_go_evidence
+from entry_point import run_main
 
 # Important label for output files.
 report_label = 'flycyc'
 
-# Now proceed with generic setup.
-set_up_dict = set_up_db_reading(report_label)
-server = set_up_dict['server']
-database = set_up_dict['database']
-username = set_up_dict['username']
-password = set_up_dict['password']
-annotation_release = set_up_dict['annotation_release']
-database_release = set_up_dict['database_release']
-output_dir = set_up_dict['output_dir']
-log = set_up_dict['log']
-
-# Create SQL Alchemy engines from environmental variables.
-engine_var_rep = 'postgresql://' + username + ":" + password + '@' + server + '/' + database
-engine = create_engine(engine_var_rep)
-insp = inspect(engine)
-
-# Process additional input parameters not handled by the set_up_db_reading() function above.
-parser = argparse.ArgumentParser(description='inputs')
-parser.add_argument('-f', '--fasta', action='store_true', help='Write out fasta files.', required=False)
-args, extra_args = parser.parse_known_args()
-log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
-chr_fasta = args.fasta
+# Feature columns that can hold whole sequences (or their checksums); deferred unless needed.
+LARGE_FEATURE_COLUMNS = ['residues', 'md5checksum']
+
+# Global variables for the run, set by configure() (nothing is set up at import; see run_reports.py).
+set_up_dict = None
+annotation_release = None
+database_release = None
+output_dir = None
+engine = None
+chr_fasta = False
+log = logging.getLogger(__name__)
+
+
+def configure(report_set_up_dict, fasta=False):
+    """Set up the report from a set_up_db_reading()-style dict, creating an SQLAlchemy engine if none is given.
+
+    Args:
+        arg1 (report_set_up_dict): (dict) Config, log and (optionally) a shared "engine", as from set_up_db_reading().
+        arg2 (fasta): (bool) Also write out FASTA files for the chr scaffolds.
+
+    """
+    global set_up_dict, annotation_release, database_release, output_dir, engine, chr_fasta, log
+    set_up_dict = report_set_up_dict
+    annotation_release = set_up_dict['annotation_release']
+    database_release = set_up_dict['database_release']
+    output_dir = set_up_dict['output_dir']
+    log = set_up_dict['log']
+    chr_fasta = fasta
+    engine = set_up_dict.get('engine')
+    if engine is None:
+        engine_var_rep = 'postgresql://' + set_up_dict['username'] + ":" + set_up_dict['password'] + '@' + set_up_dict['server'] + '/' + set_up_dict['database']
+        engine = create_engine(engine_var_rep)
+    return
+
+
+def configure_from_command_line():
+    """Set up the report from the command line (-c and -v handled by set_up_db_reading())."""
+    report_set_up_dict = set_up_db_reading(report_label)
+    # Process additional input parameters not handled by the set_up_db_reading() function above.
+    parser = argparse.ArgumentParser(description='inputs')
+    parser.add_argument('-f', '--fasta', action='store_true', help='Write out fasta files.', required=False)
+    args, extra_args = parser.parse_known_args()
+    report_set_up_dict['log'].info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+    configure(report_set_up_dict, fasta=args.fasta)
+    return
+
+
+def run_report(report_set_up_dict, fasta=False):
+    """Run the report with configuration and connections passed in (see run_reports.py)."""
+    configure(report_set_up_dict, fasta=fasta)
+    main()
+    return
 
 
 # The main process.
@@ -81,14 +130,18 @@ class FlyCycGenerator(object):
         self.gene_product_type = {}     # Will be an FBgn-keyed dict of product type (e.g., "P", "TRNA", etc.)
         self.gene_gcrp_xrefs = {}       # Will be FBgn-keyed dict of UniProt/GCRP accessions (one-to-one).
         self.gene_gcrp_trpts = {}       # Will be FBgn-keyed dict of GCRP-matching FBtr transcripts IDs (one-to-one).
-        self.trpt_cds_locs = {}         # Will be FBtr-keyed dict of CDS segment location lists.
+        self.trpt_cds_locs = {}         # Will be FBtr-keyed dict of CDS segment location arrays (see format_cds_segments()).
         self.gene_xref_dict = {}        # Will be FBgn-keyed dict of dbxref lists for each gene.
         self.gene_fullname_dict = {}    # Will be FBgn-keyed dict of gene fullname.
         self.gene_synonym_dict = {}     # Will be FBgn-keyed dict of non-current synonym lists for each gene.
         self.gene_go_annos = {}         # Will be FBgn-keyed dict of simple GO annotations dicts.
-        self.gene_neg_go_annos = {}     # Will be FBgn-keyed dict of lists GO term IDs from negative GO annotations for each gene.
+        self.gene_neg_go_annos = {}     # Will be FBgn-keyed dict of sets of GO term IDs from negative GO annotations for each gene.
         self.go_ec_dict = {}            # Will be a GO ID-keyed dict of a list of related EC numbers (no "GO:" prefix).
         self.go_metacyc_dict = {}       # Will be a GO ID-keyed dict of a list of related METACYC xrefs (no "GO:" prefix).
+        self.gene_ec_dict = {}          # Will be FBgn-keyed dict of sets of EC numbers related to the gene's GO terms.
+        self.gene_metacyc_dict = {}     # Will be FBgn-keyed dict of sets of METACYC xrefs related to the gene's GO terms.
+        self.query_count = 0            # Will be the number of SQL statements run by query_chado().
+        self.step_query_counts = {}     # Will be a query step name-keyed dict of SQL statement counts from query_chado().
 
     # This list defines the "major" chr scaffolds for which reports are generated.
     chr_scaffolds_to_report = [
@@ -113,16 +166,18 @@ class FlyCycGenerator(object):
 
     def query_chr(self, session):
         """Get Dmel chr sequences."""
-        log.info('Retrieving chromosome scaffold sequences for FASTA output.')
+        log.info('Retrieving chromosome scaffolds.')
         filters = (
             Feature.is_obsolete.is_(False),
             Feature.uniquename.in_((self.chr_scaffolds_to_report)),
             Organism.abbreviation == 'Dmel',
             Cvterm.name == 'golden_path'
         )
+        # Sequences are loaded only for FASTA output.
         chr_results = session.query(Feature).\
             join(Cvterm, (Cvterm.cvterm_id == Feature.type_id)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
+            options(*defer_large_columns(Feature, keep=['residues'] if chr_fasta else [])).\
             filter(*filters).\
             distinct()
         for result in chr_results:
@@ -161,56 +216,29 @@ class FlyCycGenerator(object):
             FeatureCvterm.is_not.is_(True),
             Cv.name.in_((go_cv_list))
         )
-        neg_go_anno_results = session.query(Feature, Cvterm).\
+        neg_go_anno_results = session.query(Feature.uniquename, Dbxref.accession.label('go_id')).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
             join(FeatureCvterm, (FeatureCvterm.feature_id == Feature.feature_id)).\
             join(Cvterm, (Cvterm.cvterm_id == FeatureCvterm.cvterm_id)).\
             join(Cv, (Cv.cv_id == Cvterm.cv_id)).\
+            join(Dbxref, (Dbxref.dbxref_id == Cvterm.dbxref_id)).\
             filter(*filters).\
             distinct()
         for result in neg_go_anno_results:
             try:
-                self.gene_neg_go_annos[result.Feature.uniquename].append(result.Cvterm.dbxref.accession)
+                self.gene_neg_go_annos[result.uniquename].add(result.go_id)
             except KeyError:
-                self.gene_neg_go_annos[result.Feature.uniquename] = [result.Cvterm.dbxref.accession]
+                self.gene_neg_go_annos[result.uniquename] = {result.go_id}
         return
 
     def query_gene_go_annotations(self, session):
         """Get GO annotations for genes."""
         log.info('Getting GO annotations for genes.')
-        # Define the evidence_code key:
-        evidence_code_dict = {
-            'inferred from mutant phenotype': 'IMP',
-            'inferred from genetic interaction': 'IGI',
-            'inferred from physical interaction': 'IPI',
-            'inferred from sequence or structural similarity': 'ISS',
-            'inferred from sequence model': 'ISM',
-            'inferred from sequence alignment': 'ISA',
-            'inferred from sequence orthology': 'ISO',
-            'inferred from experiment': 'EXP',
-            'inferred from direct assay': 'IDA',
-            'inferred from electronic annotation': 'IEA',
-            'inferred from expression pattern': 'IEP',
-            'inferred from reviewed computational analysis': 'RCA',
-            'traceable author statement': 'TAS',
-            'non-traceable author statement': 'NAS',
-            'inferred by curator': 'IC',
-            'inferred from genomic context': 'IGC',
-            'no biological data available': 'ND',
-            'inferred from biological aspect of ancestor': 'IBA',
-            'inferred from biological aspect of descendant': 'IBD',
-            'inferred from key residues': 'IKR',
-            'inferred from rapid divergence': 'IRD',
-            'inferred from high throughput experiment': 'HTP',
-            'inferred from high throughput direct assay': 'HDA',
-            'inferred from high throughput expression pattern': 'HEP',
-            'inferred from high throughput genetic interaction': 'HGI',
-            'inferred from high throughput mutant phenotype': 'HMP'
-        }
-        # Now get the GO annotations.
+        # Get the GO annotations (evidence phrases are abbreviated by evidence_codes.translate_go_evidence()).
         go_cv_list = ['biological_process', 'cellular_component', 'molecular_function']
         cvterm = aliased(Cvterm, name='cvterm')
         qualifier_type = aliased(Cvterm, name='qualifier_type')
+        go_dbxref = aliased(Dbxref, name='go_dbxref')
         filters = (
             Feature.is_obsolete.is_(False),
             Feature.uniquename.op('~')(self.regex['gene']),
@@ -222,10 +250,12 @@ class FlyCycGenerator(object):
             Pub.is_obsolete.is_(False),
             Pub.uniquename != 'unattributed'
         )
-        go_anno_results = session.query(Feature, cvterm, Pub, FeatureCvtermprop).\
+        go_anno_results = session.query(Feature, cvterm, Pub, FeatureCvtermprop, go_dbxref.accession.label('go_id')).\
+            options(*defer_large_columns(Feature)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
             join(FeatureCvterm, (FeatureCvterm.feature_id == Feature.feature_id)).\
             join(cvterm, (cvterm.cvterm_id == FeatureCvterm.cvterm_id)).\
+            join(go_dbxref, (go_dbxref.dbxref_id == cvterm.dbxref_id)).\
             join(Cv, (Cv.cv_id == Cvterm.cv_id)).\
             join(FeatureCvtermprop, (FeatureCvtermprop.feature_cvterm_id == FeatureCvterm.feature_cvterm_id)).\
             join(qualifier_type, (qualifier_type.cvterm_id == FeatureCvtermprop.type_id)).\
@@ -235,19 +265,16 @@ class FlyCycGenerator(object):
         for result in go_anno_results:
             go_anno_dict = {
                 'name': result.cvterm.name,
-                'go_id': result.cvterm.dbxref.accession,
+                'go_id': result.go_id,
                 'pub': result.Pub.uniquename
             }
             # Filter out any gene-GO term annotation that has some negative annotations.
-            if result.Feature.uniquename in self.gene_neg_go_annos.keys():
-                if result.cvterm.dbxref.accession in self.gene_neg_go_annos[result.Feature.uniquename]:
-                    log.debug('For {} ({}): negative annotation to "{}" (GO:{}) will be filtered out.'.
-                              format(result.Feature.uniquename, result.Feature.name, result.cvterm.name, result.cvterm.dbxref.accession))
-                    continue
+            if result.go_id in self.gene_neg_go_annos.get(result.Feature.uniquename, ()):
+                log.debug('For {} ({}): negative annotation to "{}" (GO:{}) will be filtered out.'.
+                          format(result.Feature.uniquename, result.Feature.name, result.cvterm.name, result.go_id))
+                continue
             # Tease out the evidence.
-            evidence_code = result.FeatureCvtermprop.value
-            for evidence_type in evidence_code_dict.keys():
-                evidence_code = evidence_code.replace(evidence_type, evidence_code_dict[evidence_type])
+            evidence_code = translate_go_evidence(result.FeatureCvtermprop.value)
             go_anno_dict['evi_code'] = evidence_code.split(' ')[0]
             # Get the PMID, if available.
             try:
@@ -268,14 +295,17 @@ class FlyCycGenerator(object):
         go_cv_list = ['biological_process', 'cellular_component', 'molecular_function']
         cvterm = aliased(Cvterm, name='cvterm')
         proptype = aliased(Cvterm, name='proptype')
+        go_dbxref = aliased(Dbxref, name='go_dbxref')
         filters = (
             cvterm.is_obsolete == 0,
             Cv.name.in_((go_cv_list)),
             Db.name == 'EC',
             proptype.name == 'ec_description'
         )
-        go_ec_results = session.query(cvterm, Dbxref).\
+        go_ec_results = session.query(go_dbxref.accession.label('go_id'), Dbxref.accession).\
+            select_from(cvterm).\
             join(Cv, (Cv.cv_id == cvterm.cv_id)).\
+            join(go_dbxref, (go_dbxref.dbxref_id == cvterm.dbxref_id)).\
             join(CvtermDbxref, (CvtermDbxref.cvterm_id == cvterm.cvterm_id)).\
             join(Dbxref, (Dbxref.dbxref_id == CvtermDbxref.dbxref_id)).\
             join(Db, (Db.db_id == Dbxref.db_id)).\
@@ -285,21 +315,24 @@ class FlyCycGenerator(object):
             distinct()
         for result in go_ec_results:
             try:
-                self.go_ec_dict[result.cvterm.dbxref.accession].append(result.Dbxref.accession)
+                self.go_ec_dict[result.go_id].append(result.accession)
             except KeyError:
-                self.go_ec_dict[result.cvterm.dbxref.accession] = [result.Dbxref.accession]
+                self.go_ec_dict[result.go_id] = [result.accession]
         return
 
     def query_go_metacyc(self, session):
         """Get METACYC xrefs related to each GO term."""
         log.info('Getting GO-METACYC associations.')
+        go_dbxref = aliased(Dbxref, name='go_dbxref')
         filters = (
             Cvterm.is_obsolete == 0,
             Cv.name == 'molecular_function',
             Db.name == 'MetaCyc',
         )
-        go_metacyc_results = session.query(Cvterm, Dbxref).\
+        go_metacyc_results = session.query(go_dbxref.accession.label('go_id'), Dbxref.accession).\
+            select_from(Cvterm).\
             join(Cv, (Cv.cv_id == Cvterm.cv_id)).\
+            join(go_dbxref, (go_dbxref.dbxref_id == Cvterm.dbxref_id)).\
             join(CvtermDbxref, (CvtermDbxref.cvterm_id == Cvterm.cvterm_id)).\
             join(Dbxref, (Dbxref.dbxref_id == CvtermDbxref.dbxref_id)).\
             join(Db, (Db.db_id == Dbxref.db_id)).\
@@ -307,9 +340,9 @@ class FlyCycGenerator(object):
             distinct()
         for result in go_metacyc_results:
             try:
-                self.go_metacyc_dict[result.Cvterm.dbxref.accession].append(result.Dbxref.accession)
+                self.go_metacyc_dict[result.go_id].append(result.accession)
             except KeyError:
-                self.go_metacyc_dict[result.Cvterm.dbxref.accession] = [result.Dbxref.accession]
+                self.go_metacyc_dict[result.go_id] = [result.accession]
         return
 
     def query_gene_xrefs(self, session):
@@ -329,6 +362,7 @@ class FlyCycGenerator(object):
             Db.name.in_((dbxrefs_to_get.keys()))
         )
         dbxref_results = session.query(Feature, Db, Dbxref).\
+            options(*defer_large_columns(Feature)).\
             join(Cvterm, (Cvterm.cvterm_id == Feature.type_id)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
             join(FeatureDbxref, (FeatureDbxref.feature_id == Feature.feature_id)).\
@@ -378,6 +412,7 @@ class FlyCycGenerator(object):
         )
         uniprot_results = session.query(gene, transcript, polypeptide, Dbxref).\
             select_from(gene).\
+            options(*defer_large_columns(gene, transcript, polypeptide)).\
             join(Organism, (Organism.organism_id == gene.organism_id)).\
             join(fr_tg, (fr_tg.object_id == gene.feature_id)).\
             join(transcript, (transcript.feature_id == fr_tg.subject_id)).\
@@ -445,7 +480,7 @@ class FlyCycGenerator(object):
             part_type.name == 'CDS',
             chr_type.name == 'golden_path',
         )
-        cds_segment_locs = session.query(transcript, Featureloc).\
+        cds_segment_locs = session.query(transcript.uniquename, Featureloc.featureloc_id, Featureloc.fmin, Featureloc.fmax, Featureloc.strand).\
             select_from(transcript).\
             join(Organism, (Organism.organism_id == transcript.organism_id)).\
             join(FeatureRelationship, (FeatureRelationship.object_id == transcript.feature_id)).\
@@ -458,32 +493,24 @@ class FlyCycGenerator(object):
             filter(*filters).\
             distinct()
         counter = 0
+        trpt_cds_segments = {}    # FBtr-keyed dict of lists of (start, end, strand) tuples, as reported (1-based).
         for cds_segment_loc in cds_segment_locs:
-            if cds_segment_loc.Featureloc.strand == -1:
-                loc_string = f'{cds_segment_loc.Featureloc.fmax}-{cds_segment_loc.Featureloc.fmin + 1}'
+            if cds_segment_loc.strand == -1:
+                cds_segment = (cds_segment_loc.fmax, cds_segment_loc.fmin + 1, -1)
             else:
-                loc_string = f'{cds_segment_loc.Featureloc.fmin + 1}-{cds_segment_loc.Featureloc.fmax}'
-            # trpt_name = f'{cds_segment_loc.transcript.name} ({cds_segment_loc.transcript.uniquename})'
-            # log.debug(f'Found {trpt_name} CDS segment at {loc_string}')
+                cds_segment = (cds_segment_loc.fmin + 1, cds_segment_loc.fmax, cds_segment_loc.strand or 0)
             try:
-                self.trpt_cds_locs[cds_segment_loc.transcript.uniquename].append(loc_string)
+                trpt_cds_segments[cds_segment_loc.uniquename].append(cds_segment)
             except KeyError:
-                self.trpt_cds_locs[cds_segment_loc.transcript.uniquename] = [loc_string]
+                trpt_cds_segments[cds_segment_loc.uniquename] = [cds_segment]
             counter += 1
-        log.info(f'Found {counter} CDS segments for {len(self.trpt_cds_locs.keys())} current Dmel transcripts.')
-        # Sort the CDS segments.
-        START = 0
-        STOP = 1
-        for cds_segment_list in self.trpt_cds_locs.values():
-            sample_segment = cds_segment_list[0]
-            start = int(sample_segment.split('-')[START])
-            stop = int(sample_segment.split('-')[STOP])
-            # If the sample segment is on the plus strand, standard sorting.
-            if start < stop:
-                cds_segment_list.sort()
-            # Otherwise, the list of CDS segments are on the minus strant, so reverse sort.
-            else:
-                cds_segment_list.sort(reverse=True)
+        log.info(f'Found {counter} CDS segments for {len(trpt_cds_segments.keys())} current Dmel transcripts.')
+        # Sort the CDS segments numerically: ascending on the plus strand, descending on the minus strand.
+        # Then keep them as flat integer arrays of start, end, strand (formatted only at write time).
+        STRAND = 2
+        for transcript_uniquename, cds_segment_list in trpt_cds_segments.items():
+            cds_segment_list.sort(reverse=cds_segment_list[0][STRAND] == -1)
+            self.trpt_cds_locs[transcript_uniquename] = array('l', [i for cds_segment in cds_segment_list for i in cds_segment])
         return
 
     def query_gene_fullnames(self, session):
@@ -500,6 +527,7 @@ class FlyCycGenerator(object):
             synonym_type.name == 'fullname'
         )
         fullname_results = session.query(Feature, Synonym).\
+            options(*defer_large_columns(Feature)).\
             join(feature_type, (feature_type.cvterm_id == Feature.type_id)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
             join(FeatureSynonym, (FeatureSynonym.feature_id == Feature.feature_id)).\
@@ -522,6 +550,7 @@ class FlyCycGenerator(object):
             FeatureSynonym.is_current.is_(False)
         )
         synonym_results = session.query(Feature, Synonym).\
+            options(*defer_large_columns(Feature)).\
             join(Cvterm, (Cvterm.cvterm_id == Feature.type_id)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
             join(FeatureSynonym, (FeatureSynonym.feature_id == Feature.feature_id)).\
@@ -562,6 +591,7 @@ class FlyCycGenerator(object):
             Organism.abbreviation == 'Dmel'
         )
         gene_product_results = session.query(gene_feature, transcript_type).\
+            options(*defer_large_columns(gene_feature)).\
             join(gene_type, (gene_type.cvterm_id == gene_feature.type_id)).\
             join(Organism, (Organism.organism_id == gene_feature.organism_id)).\
             join(FeatureRelationship, (FeatureRelationship.object_id == gene_feature.feature_id)).\
@@ -574,9 +604,24 @@ class FlyCycGenerator(object):
             self.gene_product_type[result.gene_feature.uniquename] = product_type_key[result.transcript_type.name]
         return
 
+    def index_gene_go_xrefs(self):
+        """Index EC numbers and METACYC xrefs by gene, in one pass over the GO term IDs of its GO annotations."""
+        log.info('Indexing EC numbers and METACYC xrefs by gene.')
+        for gene_uniquename, go_annos in self.gene_go_annos.items():
+            go_ids = {i['go_id'] for i in go_annos}
+            ec_numbers = set()
+            metacyc_xrefs = set()
+            for go_id in go_ids:
+                ec_numbers.update(self.go_ec_dict.get(go_id, ()))
+                metacyc_xrefs.update(self.go_metacyc_dict.get(go_id, ()))
+            self.gene_ec_dict[gene_uniquename] = ec_numbers
+            self.gene_metacyc_dict[gene_uniquename] = metacyc_xrefs
+        return
+
     def query_genes(self, session):
         """Get Dmel genes and create a chr dict of gene lists."""
         log.info('Retrieving localized Dmel genes.')
+        self.index_gene_go_xrefs()
         # First create chr-keyed dict of genes.
         for chr_uniquename in self.chr_scaffolds_to_report:
             self.chr_gene_dict[chr_uniquename] = []
@@ -591,6 +636,7 @@ class FlyCycGenerator(object):
         #     I imagine it's taxing to pull in chr features with 30M bases for each gene result.
         #     Instead, to get chr info, I use self.chr_id_dict.
         gene_results = session.query(Feature, Featureloc).\
+            options(*defer_large_columns(Feature)).\
             join(Cvterm, (Cvterm.cvterm_id == Feature.type_id)).\
             join(Featureloc, (Featureloc.feature_id == Feature.feature_id)).\
             join(Organism, (Organism.organism_id == Feature.organism_id)).\
@@ -618,7 +664,7 @@ class FlyCycGenerator(object):
                     'FlyBase:{}'.format(result.Feature.uniquename),
                     'Alliance:FB:{}'.format(result.Feature.uniquename)
                 ],
-                'CODING-SEGMENT': [],
+                'CODING-SEGMENT': array('l'),
                 'SYNONYM': [],
                 'GO': [],
                 'EC': [],
@@ -640,7 +686,7 @@ class FlyCycGenerator(object):
             # Add CDS segments.
             if result.Feature.uniquename in self.gene_gcrp_trpts.keys():
                 gcrp_trpt_id = self.gene_gcrp_trpts[result.Feature.uniquename]
-                gene_dict['CODING-SEGMENT'].extend(self.trpt_cds_locs[gcrp_trpt_id])
+                gene_dict['CODING-SEGMENT'] = self.trpt_cds_locs[gcrp_trpt_id]
             elif gene_dict['PRODUCT-TYPE'] == 'P' and result.Feature.uniquename in self.gene_gcrp_xrefs.keys():
                 log.warning(f'Coding gene has GCRP xref but no GCRP-associated transcript: {result.Feature.name} ({result.Feature.uniquename})')
             # Add fullname.
@@ -658,27 +704,13 @@ class FlyCycGenerator(object):
                 gene_dict['SYNONYM'] = self.gene_synonym_dict[result.Feature.uniquename]
             except KeyError:
                 pass
-            # Add GO terms.
+            # Add GO terms, EC numbers and METACYC xrefs.
             try:
                 gene_dict['GO'] = [i['string'] for i in self.gene_go_annos[result.Feature.uniquename]]
+                gene_dict['EC'] = self.gene_ec_dict[result.Feature.uniquename]
+                gene_dict['METACYC'] = self.gene_metacyc_dict[result.Feature.uniquename]
             except KeyError:
                 pass
-            # Add EC numbers.
-            if result.Feature.uniquename in self.gene_go_annos.keys():
-                for go_id in [i['go_id'] for i in self.gene_go_annos[result.Feature.uniquename]]:
-                    try:
-                        gene_dict['EC'].extend(self.go_ec_dict[go_id])
-                    except KeyError:
-                        pass
-                gene_dict['EC'] = set(gene_dict['EC'])
-            # Add METACYC xrefs.
-            if result.Feature.uniquename in self.gene_go_annos.keys():
-                for go_id in [i['go_id'] for i in self.gene_go_annos[result.Feature.uniquename]]:
-                    try:
-                        gene_dict['METACYC'].extend(self.go_metacyc_dict[go_id])
-                    except KeyError:
-                        pass
-                gene_dict['METACYC'] = set(gene_dict['METACYC'])
             # Append gene info to the appropriate chr.
             self.chr_gene_dict[chr_uniquename].append(gene_dict)
         return
@@ -686,23 +718,43 @@ class FlyCycGenerator(object):
     def query_chado(self, session):
         """Wrapper query method."""
         # There are some dependencies on the order of these methods.
-        self.query_chr(session)
-        self.generate_fbrf_pubmed_dict(session)
-        self.query_gene_negative_go_annotations(session)
-        # The query_gene_go_annotations() method should be run after:
-        # 1. generate_fbrf_pubmed_dict()
-        # 2. query_gene_negative_go_annotations()
-        self.query_gene_go_annotations(session)
-        self.query_go_ec_numbers(session)
-        self.query_go_metacyc(session)
-        self.query_gene_xrefs(session)
-        self.query_gene_gcrp_transcripts(session)
-        self.query_transcript_cds_locations(session)
-        self.query_gene_fullnames(session)
-        self.query_gene_synonyms(session)
-        self.query_gene_products(session)
-        # The query_genes() method should be run last (needs info from methods above).
-        self.query_genes(session)
+        query_steps = [
+            self.query_chr,
+            self.generate_fbrf_pubmed_dict,
+            self.query_gene_negative_go_annotations,
+            # The query_gene_go_annotations() method should be run after:
+            # 1. generate_fbrf_pubmed_dict()
+            # 2. query_gene_negative_go_annotations()
+            self.query_gene_go_annotations,
+            self.query_go_ec_numbers,
+            self.query_go_metacyc,
+            self.query_gene_xrefs,
+            self.query_gene_gcrp_transcripts,
+            self.query_transcript_cds_locations,
+            self.query_gene_fullnames,
+            self.query_gene_synonyms,
+            self.query_gene_products,
+            # The query_genes() method should be run last (needs info from methods above, indexed by gene first).
+            self.query_genes
+        ]
+        # Count the SQL statements of each step: lazy relationship loads would show up as counts that grow with the data.
+        bind = session.get_bind()
+        count_query = self.count_query
+        event.listen(bind, 'before_cursor_execute', count_query)
+        try:
+            for query_step in query_steps:
+                start_count = self.query_count
+                query_step(session)
+                self.step_query_counts[query_step.__name__] = self.query_count - start_count
+                log.info('{}() ran {} SQL statement(s).'.format(query_step.__name__, self.query_count - start_count))
+        finally:
+            event.remove(bind, 'before_cursor_execute', count_query)
+        log.info('Ran {} SQL statements for all query steps.'.format(self.query_count))
+        return
+
+    def count_query(self, conn, cursor, statement, parameters, context, executemany):
+        """Count an SQL statement (an SQLAlchemy "before_cursor_execute" event listener)."""
+        self.query_count += 1
         return
 
     def print_chr_files(self):
@@ -724,38 +776,50 @@ class FlyCycGenerator(object):
         log.info('Done printing FASTA files.')
         return
 
+    # The fields of each gene record in the FlyCyc gene files, in order.
+    gene_field_list = [
+        'ID',
+        'NAME',
+        'FUNCTION',
+        'SYNONYM',
+        'PRODUCT-TYPE',
+        'STARTBASE',
+        'ENDBASE',
+        'CODING-SEGMENT',
+        'GO',
+        'EC',
+        'METACYC',
+        'DBLINK'
+    ]
+
+    def render_chr_gene_file(self, chr_uniquename):
+        """Return the text of the FlyCyc gene file for one chromosome scaffold."""
+        lines = [';;\n;; Pathologic format annotation file for D. melanogaster Release {}/FB{} chromosome {}\n;;\n;;\n'.
+                 format(annotation_release.replace('R', ''), database_release, chr_uniquename)]
+        for gene in self.chr_gene_dict[chr_uniquename]:
+            for field in self.gene_field_list:
+                if field == 'CODING-SEGMENT':
+                    lines.extend('{}\t{}\n'.format(field, element) for element in format_cds_segments(gene[field]))
+                elif type(gene[field]) in [set, list]:
+                    lines.extend('{}\t{}\n'.format(field, element) for element in gene[field])
+                else:
+                    lines.append('{}\t{}\n'.format(field, gene[field]))
+            lines.append('//\n\n')
+        return ''.join(lines)
+
     def print_gene_files(self):
-        """Print out FlyCyc gene files for each chromosome."""
+        """Print out FlyCyc gene files for each chromosome, one writer process per chromosome (up to the CPU count)."""
+        global gene_file_generator
         log.info('Printing FlyCyc gene files.')
-        for chr_uniquename in self.chr_scaffolds_to_report:
-            log.info('Printing report for genes on chr scaffold {}'.format(chr_uniquename))
-            output_filename = '{}chr_{}.pf'.format(output_dir, chr_uniquename)
-            output_file = open(output_filename, 'w')
-            header = ';;\n;; Pathologic format annotation file for D. melanogaster Release {}/FB{} chromosome {}\n;;\n;;\n'.\
-                format(annotation_release.replace('R', ''), database_release, chr_uniquename)
-            output_file.write(header)
-            field_list = [
-                'ID',
-                'NAME',
-                'FUNCTION',
-                'SYNONYM',
-                'PRODUCT-TYPE',
-                'STARTBASE',
-                'ENDBASE',
-                'CODING-SEGMENT',
-                'GO',
-                'EC',
-                'METACYC',
-                'DBLINK'
-            ]
-            for gene in self.chr_gene_dict[chr_uniquename]:
-                for field in field_list:
-                    if type(gene[field]) in [set, list]:
-                        for element in gene[field]:
-                            output_file.write('{}\t{}\n'.format(field, element))
-                    else:
-                        output_file.write('{}\t{}\n'.format(field, gene[field]))
-                output_file.write('//\n\n')
+        # Forked writers inherit this generator, so its gene data is not pickled.
+        gene_file_generator = self
+        processes = max(1, min(len(self.chr_scaffolds_to_report), os.cpu_count() or 1))
+        try:
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                for output_filename, gene_count in pool.imap(write_chr_gene_file, self.chr_scaffolds_to_report):
+                    log.info('Printed {} genes to {}'.format(gene_count, output_filename))
+        finally:
+            gene_file_generator = None
         return
 
     def print_files(self):
@@ -765,6 +829,37 @@ class FlyCycGenerator(object):
         return
 
 
+# The FlyCycGenerator whose gene files are being printed, for the forked writer processes of print_gene_files().
+gene_file_generator = None
+
+
+def write_chr_gene_file(chr_uniquename):
+    """Write the FlyCyc gene file for one chromosome scaffold (in a writer process); return its filename and gene count."""
+    output_filename = '{}chr_{}.pf'.format(output_dir, chr_uniquename)
+    with open(output_filename, 'w') as output_file:
+        output_file.write(gene_file_generator.render_chr_gene_file(chr_uniquename))
+    return output_filename, len(gene_file_generator.chr_gene_dict[chr_uniquename])
+
+
+def defer_large_columns(*entities, keep=()):
+    """Return query options that defer the large text columns of Feature entities (loaded only if accessed).
+
+    Args:
+        arg1 (entities): (Feature or aliased Feature) The Feature entities of a query.
+        arg2 (keep): (list) Large columns to load anyway (e.g., ['residues']).
+
+    Returns:
+        A list of SQLAlchemy loader options, for query.options().
+
+    """
+    return [defer(getattr(entity, column)) for entity in entities for column in LARGE_FEATURE_COLUMNS if column not in keep]
+
+
+def format_cds_segments(cds_segments):
+    """Return the "start-end" strings of CDS segments held as a flat integer array of start, end, strand triples."""
+    return ['{}-{}'.format(cds_segments[i], cds_segments[i + 1]) for i in range(0, len(cds_segments), 3)]
+
+
 def db_query_transaction(object_to_execute):
     """Query the chado database given an object that has a "query_chado()" method.
 
@@ -793,4 +888,5 @@ def db_query_transaction(object_to_execute):
 
 
 if __name__ == "__main__":
-    main()
+    configure_from_command_line()
+    run_main(main, log)
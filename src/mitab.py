@@ -1,22 +1,85 @@
 #!/usr/bin/env python3
 # Execute the script with the appropriate arguments for server, database, username, password, release.
 # For example: `python3 mitab.py -s flysql13 -d fb_2018_03_reporting_01 -u myname -p 1234 -r fb_2018_03`
+# If a run is interrupted, rerun it with the same arguments plus `--resume` to continue from its last checkpoint.
+# Add `--shards N` to split the interactions across N worker processes (each with its own connection, all on one snapshot: see snapshot_group.py).
+# Add `--lookup-connections N` to run participant lookups concurrently over N extra connections (per shard, on the same snapshot).
+# Other parameterized lookups run as prepared statements, parsed and planned once per connection (see prepared_statements.py).
 
 import psycopg2
 import argparse
 import csv
 import re
+from functools import partial
+from checkpoint import Checkpoint
+from sharding import run_shards, merge_parts
+from snapshot_group import SnapshotGroup
+from async_queries import AsyncQueryExecutor
+from prepared_statements import run_prepared, log_plan_stats
+from entry_point import run_main
+
+# Lookups run for each interaction and its participants. Given a connection string, write_int_rows() gathers them
+# concurrently for each batch of interactions (see async_queries.py), and connect() serves them from "prefetched".
+PREFETCH_BATCH = 500
+GET_PARTS_QUERY = ('SELECT DISTINCT g.uniquename, g.name, x.uniquename, x.name '
+                   'FROM feature g, feature_relationship fr, feature x, feature_interaction fi, '
+                   'feature_interactionprop fip, interaction i, cvterm cvt '
+                   'WHERE i.interaction_id = fi.interaction_id AND fi.feature_interaction_id = fip.feature_interaction_id '
+                   'AND fip.type_id = cvt.cvterm_id AND fi.feature_id = x.feature_id '
+                   'AND x.feature_id = fr.subject_id AND fr.object_id = g.feature_id AND fr.type_id = 59983 '
+                   'AND cvt.name = \'participating feature\' AND g.is_obsolete = \'f\' AND x.is_obsolete = \'f\' '
+                   'AND g.uniquename LIKE \'FBgn%%\' AND i.uniquename = %s ORDER BY g.uniquename')
+GET_CG_ID_QUERY = ('SELECT DISTINCT dx.accession '
+                   'FROM feature f, feature_dbxref fd, db, dbxref dx '
+                   'WHERE f.feature_id = fd.feature_id AND fd.dbxref_id = dx.dbxref_id '
+                   'AND dx.db_id = db.db_id AND db.name = \'FlyBase Annotation IDs\' AND '
+                   'dx.accession NOT LIKE \'%%-%%\' AND fd.is_current = \'t\' AND f.uniquename = %s')
+GET_ENTREZ_ID_QUERY = ('SELECT DISTINCT dx.accession '
+                       'FROM feature f, feature_dbxref fd, db, dbxref dx '
+                       'WHERE f.feature_id = fd.feature_id AND fd.dbxref_id = dx.dbxref_id '
+                       'AND dx.db_id = db.db_id AND db.name = \'EntrezGene\' AND '
+                       'fd.is_current = \'t\' AND f.uniquename = %s')
+GET_TAXID_QUERY = ('SELECT DISTINCT dx.accession, o.genus, o.species '
+                   'FROM feature x, organism o, organism_dbxref od, dbxref dx, db '
+                   'WHERE x.organism_id = o.organism_id AND o.organism_id = od.organism_id '
+                   'AND od.dbxref_id =dx.dbxref_id AND dx.db_id = db.db_id AND db.name = \'NCBITaxon\' '
+                   'AND x.uniquename = %s')
+GET_ROLE_QUERY = ('SELECT DISTINCT dx.accession, cvt.name, cvt.cvterm_id '
+                  'FROM interaction i, feature_interaction fi, feature f, cvterm cvt, dbxref dx '
+                  'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
+                  'AND fi.role_id = cvt.cvterm_id AND cvt.dbxref_id = dx.dbxref_id '
+                  'AND f.uniquename = %s AND i.uniquename = %s')
+GET_ISOFORMS_QUERY = ('SELECT DISTINCT f.name '
+                      'FROM interaction i, feature_interaction fi, feature_interactionprop fip, '
+                      'feature f, cvterm cvt, cvterm cvt2, feature_relationship fr, feature f2 '
+                      'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
+                      'AND fi.feature_interaction_id = fip.feature_interaction_id '
+                      'AND fi.role_id = cvt.cvterm_id '
+                      'AND fip.type_id = cvt2.cvterm_id AND '
+                      'cvt2.name = \'interacting isoform\' AND f.feature_id = fr.subject_id '
+                      'AND f2.feature_id = fr.object_id AND f.is_obsolete = \'f\' AND '
+                      'f2.uniquename = %s AND i.uniquename = %s')
+GET_TAG_INFO_QUERY = ('SELECT DISTINCT fip2.value '
+                      'FROM interaction i, feature_interaction fi, feature_interactionprop fip, '
+                      'feature f, cvterm cvt, feature_interactionprop fip2, cvterm cvt2 '
+                      'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
+                      'AND fi.feature_interaction_id = fip.feature_interaction_id '
+                      'AND fip.type_id = cvt.cvterm_id AND cvt.name = \'participating feature\' '
+                      'AND fi.feature_interaction_id = fip2.feature_interaction_id AND fip2.type_id = cvt2.cvterm_id '
+                      'AND cvt2.name = \'comment\' AND f.uniquename = %s AND i.uniquename = %s')
+prefetched = {}
 
 
 def connect(sql, query, conn):
+    if (sql, query) in prefetched:  # Serve lookups already gathered for this batch of interactions.
+        return prefetched[(sql, query)]
+    if query != 'no_query':  # Run repeated lookups (e.g. per interaction) as prepared statements.
+        return run_prepared(sql, query, conn)
     cursor = conn.cursor() # Return the cursor and use it to perform queries.
 
-    # Execute the query.
-    if query == 'no_query': # If we're just running an SQL query without a variable, only execute the sql
-        cursor.execute(sql)
-    else:
-        cursor.execute(sql, query) # If we have a variable (e.g. an FBgn) be sure to include it in the execute command.
-    
+    # Execute the query. Without a variable (e.g. an FBgn), we're just running an SQL query, so only execute the sql.
+    cursor.execute(sql)
+
     records = cursor.fetchall() # Grab the results.
     cursor.close() # Close the cursor.
     return records # Return a list of tuples.
@@ -41,24 +104,14 @@ def get_pubmed(pub_query,conn):
 def get_CG_id(gid, conn):
     # Returns CG ID for input FBgn
 
-    get_CG = ('SELECT DISTINCT dx.accession '
-                'FROM feature f, feature_dbxref fd, db, dbxref dx '
-                'WHERE f.feature_id = fd.feature_id AND fd.dbxref_id = dx.dbxref_id '
-                'AND dx.db_id = db.db_id AND db.name = \'FlyBase Annotation IDs\' AND '
-                'dx.accession NOT LIKE \'%%-%%\' AND fd.is_current = \'t\' AND f.uniquename = %s')
-    CG_id = connect(get_CG,gid,conn)
+    CG_id = connect(GET_CG_ID_QUERY, gid, conn)
     return(CG_id)
 
 
 def get_Entrez_id(gid,conn):
     # Returns Entrez ID for input FBgn
 
-    get_Entrez = ('SELECT DISTINCT dx.accession '
-                    'FROM feature f, feature_dbxref fd, db, dbxref dx '
-                    'WHERE f.feature_id = fd.feature_id AND fd.dbxref_id = dx.dbxref_id '
-                    'AND dx.db_id = db.db_id AND db.name = \'EntrezGene\' AND '
-                    'fd.is_current = \'t\' AND f.uniquename = %s')
-    Entrez_id = connect(get_Entrez,gid,conn)
+    Entrez_id = connect(GET_ENTREZ_ID_QUERY, gid, conn)
     if Entrez_id:
         id = Entrez_id[0][0]
     else:
@@ -69,12 +122,7 @@ def get_Entrez_id(gid,conn):
 def get_taxid(xid,conn):
     # Returns NCBI taxid, genus, species for input feature ID
 
-    taxid = ('SELECT DISTINCT dx.accession, o.genus, o.species '
-            'FROM feature x, organism o, organism_dbxref od, dbxref dx, db '
-            'WHERE x.organism_id = o.organism_id AND o.organism_id = od.organism_id '
-            'AND od.dbxref_id =dx.dbxref_id AND dx.db_id = db.db_id AND db.name = \'NCBITaxon\' '
-            'AND x.uniquename = %s')
-    tid = connect(taxid,xid,conn)
+    tid = connect(GET_TAXID_QUERY, xid, conn)
     if len(tid) > 0:
         return(tid[0][0],tid[0][1],tid[0][2])
     else:
@@ -84,12 +132,7 @@ def get_taxid(xid,conn):
 def get_role(xint,conn):
     # Returns participant role for input interaction and participant
 
-    role = ('SELECT DISTINCT dx.accession, cvt.name, cvt.cvterm_id '
-                    'FROM interaction i, feature_interaction fi, feature f, cvterm cvt, dbxref dx '
-                    'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
-                    'AND fi.role_id = cvt.cvterm_id AND cvt.dbxref_id = dx.dbxref_id '
-                    'AND f.uniquename = %s AND i.uniquename = %s')
-    part_role = connect(role,xint,conn)
+    part_role = connect(GET_ROLE_QUERY, xint, conn)
     return(part_role)
 
 
@@ -113,32 +156,14 @@ def get_subregions(xint,conn):
 def get_isoforms(xint,conn):
     # Returns isoform associated with an interaction and participant
 
-    isoforms = ('SELECT DISTINCT f.name '
-                    'FROM interaction i, feature_interaction fi, feature_interactionprop fip, ' 
-                    'feature f, cvterm cvt, cvterm cvt2, feature_relationship fr, feature f2 '
-                    'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
-                    'AND fi.feature_interaction_id = fip.feature_interaction_id '
-                    'AND fi.role_id = cvt.cvterm_id '
-                    'AND fip.type_id = cvt2.cvterm_id AND '
-                    'cvt2.name = \'interacting isoform\' AND f.feature_id = fr.subject_id '
-                    'AND f2.feature_id = fr.object_id AND f.is_obsolete = \'f\' AND '
-                    'f2.uniquename = %s AND i.uniquename = %s')
-    isos = connect(isoforms,xint,conn)
+    isos = connect(GET_ISOFORMS_QUERY, xint, conn)
     return(isos)
 
 
 def get_tag_info(xint,conn): 
     # Returns tag/experimental feature/notes field associated with an interaction and participant
 
-    get_tags = ('SELECT DISTINCT fip2.value '
-            'FROM interaction i, feature_interaction fi, feature_interactionprop fip, '
-            'feature f, cvterm cvt, feature_interactionprop fip2, cvterm cvt2 '
-            'WHERE f.feature_id = fi.feature_id AND fi.interaction_id = i.interaction_id '
-            'AND fi.feature_interaction_id = fip.feature_interaction_id '
-            'AND fip.type_id = cvt.cvterm_id AND cvt.name = \'participating feature\' '
-            'AND fi.feature_interaction_id = fip2.feature_interaction_id AND fip2.type_id = cvt2.cvterm_id '
-            'AND cvt2.name = \'comment\' AND f.uniquename = %s AND i.uniquename = %s')
-    tags = connect(get_tags,xint,conn)
+    tags = connect(GET_TAG_INFO_QUERY, xint, conn)
     return(tags)
 
 
@@ -181,32 +206,23 @@ def whittle(xlist,extra_terms):
     return(xlist)
 
 
-def query_for_ints(filename, conn): 
+def query_for_ints(filename, conn, database, resume=False, shards=1, conn_string=None, lookup_connections=0):
     # Main function- gets all interactions and info
+    # Progress is checkpointed (see checkpoint.py) so that an interrupted run can be resumed.
+    # With shards > 1, interactions are split across worker processes instead (see sharding.py).
+    # Shard workers and lookup connections all read the snapshot of the main connection (see snapshot_group.py).
+    group = None
+    if shards > 1 or lookup_connections:
+        group = SnapshotGroup(conn, conn_string)
 
     # Query db and return a list of all interactions in form of tuples. [(int, FBig), (int, FBig), etc.]
     get_ints = ('SELECT DISTINCT i.uniquename, ig.uniquename '
                         'FROM interaction i, feature_interaction fi, interaction_group_feature_interaction igfi, interaction_group ig  '
                         'WHERE i.is_obsolete=\'f\' AND ig.is_obsolete = \'f\' AND i.interaction_id = fi.interaction_id '
                         'AND fi.feature_interaction_id = igfi.feature_interaction_id AND igfi.interaction_group_id = ig.interaction_group_id '
-                        'ORDER BY ig.uniquename')
+                        'ORDER BY ig.uniquename, i.uniquename')
     int_tuples = connect(get_ints, 'no_query', conn)
 
-    # Print column headers
-    with open(filename, 'w') as csvfile:
-        csv_writer = csv.writer(csvfile, delimiter = '\t')
-        csv_writer.writerow(['#ID(s) Interactor A', 'ID(s) Interactor B','Alt ID(s) Interactor A', 'Alt ID(s) Interactor B',
-            'Alias(es) Interactor A', 'Alias(es) Interactor B', 'Interaction Detection Method(s)',
-            'Publication 1st Author(s)', 'Publication ID(s)', 'Taxid Interactor A', 'Taxid Interactor B',
-            'Interaction Type(s)', 'Source Database(s)', 'Interaction Identifier(s)', 'Confidence Value(s)',
-            'Expansion Method(s)', 'Biological Role(s) Interactor A', 'Biological Role(s) Interactor B',
-            'Experimental Role(s) Interactor A', 'Experimental Role(s) Interactor B', 'Type(s) Interactor A',
-            'Type(s) Interactor B', 'Xref(s) Interactor A', 'Xref(s) Interactor B', 'Interaction Xref(s)',
-            'Annotation(s) Interactor A', 'Annotation(s) Interactor B', 'Interaction Annotation(s)', 'Host Organism(s)',
-            'Interaction Parameters', 'Creation Date', 'Update Date', 'Checksum Interactor A', 'Checksum Interactor B',
-            'Interaction Checksum', 'Negative', 'Feature(s) Interactor A', 'Feature(s) Interactor B', 'Stoichiometry Interactor A',
-            'Stoichiometry Interactor B', 'Identification Method(s) Participant A', 'Identification Method(s) Participant B'])
-    
     # Get a list of detection method ids that are children of 'interaction detection method'
     # to distinguish from participant detection methods since we curate both types into same field
     method_tuple = (103168,)
@@ -217,8 +233,67 @@ def query_for_ints(filename, conn):
     role_tuple = (103631,)
     role_list = get_child_ids(role_tuple,conn)
 
+    if shards > 1:
+        shard_worker = partial(write_int_rows, int_method_list=int_method_list, role_list=role_list,
+                               conn_string=conn_string, lookup_connections=lookup_connections, snapshot=group.snapshot)
+        part_filenames = run_shards(shard_worker, int_tuples, [i[1] for i in int_tuples], shards, group, filename)
+        group.close()
+        with open(filename, 'w', newline='') as csvfile:
+            write_column_headers(csvfile)
+            merge_parts(part_filenames, csvfile)
+        return
+
+    checkpoint = Checkpoint(filename, database, ['{}|{}'.format(i[0], i[1]) for i in int_tuples], resume=resume)
+    csvfile = checkpoint.open_output(filename)
+    if not checkpoint.resuming:
+        write_column_headers(csvfile)
+    write_int_rows(conn, int_tuples[checkpoint.start_index:], csvfile, int_method_list, role_list, checkpoint,
+                   conn_string=conn_string, lookup_connections=lookup_connections, snapshot=group.snapshot if group else None)
+    if group:
+        group.close()
+    checkpoint.finish()
+
+
+def write_column_headers(csvfile):
+    # Print column headers
+    csv_writer = csv.writer(csvfile, delimiter = '\t')
+    csv_writer.writerow(['#ID(s) Interactor A', 'ID(s) Interactor B','Alt ID(s) Interactor A', 'Alt ID(s) Interactor B',
+        'Alias(es) Interactor A', 'Alias(es) Interactor B', 'Interaction Detection Method(s)',
+        'Publication 1st Author(s)', 'Publication ID(s)', 'Taxid Interactor A', 'Taxid Interactor B',
+        'Interaction Type(s)', 'Source Database(s)', 'Interaction Identifier(s)', 'Confidence Value(s)',
+        'Expansion Method(s)', 'Biological Role(s) Interactor A', 'Biological Role(s) Interactor B',
+        'Experimental Role(s) Interactor A', 'Experimental Role(s) Interactor B', 'Type(s) Interactor A',
+        'Type(s) Interactor B', 'Xref(s) Interactor A', 'Xref(s) Interactor B', 'Interaction Xref(s)',
+        'Annotation(s) Interactor A', 'Annotation(s) Interactor B', 'Interaction Annotation(s)', 'Host Organism(s)',
+        'Interaction Parameters', 'Creation Date', 'Update Date', 'Checksum Interactor A', 'Checksum Interactor B',
+        'Interaction Checksum', 'Negative', 'Feature(s) Interactor A', 'Feature(s) Interactor B', 'Stoichiometry Interactor A',
+        'Stoichiometry Interactor B', 'Identification Method(s) Participant A', 'Identification Method(s) Participant B'])
+
+
+def prefetch_lookups(executor, int_tuples):
+    # Gather the participant lookups for a batch of interactions concurrently, replacing the last batch's
+    prefetched.clear()
+    executor.prefetch(GET_PARTS_QUERY, [(int[0],) for int in int_tuples], prefetched)
+    parts = [(part, int[0]) for int in int_tuples for part in prefetched[(GET_PARTS_QUERY, (int[0],))]]
+    executor.prefetch(GET_CG_ID_QUERY, [(part[0],) for part, int_id in parts], prefetched)
+    executor.prefetch(GET_ENTREZ_ID_QUERY, [(part[0],) for part, int_id in parts], prefetched)
+    executor.prefetch(GET_TAXID_QUERY, [(part[2],) for part, int_id in parts], prefetched)
+    for part_query in (GET_ROLE_QUERY, GET_ISOFORMS_QUERY, GET_TAG_INFO_QUERY):
+        executor.prefetch(part_query, [(part[2], int_id) for part, int_id in parts], prefetched)
+
+
+def write_int_rows(conn, int_tuples, csvfile, int_method_list, role_list, checkpoint=None, conn_string=None, lookup_connections=0, snapshot=None):
+    # Write a line for each interaction (also the shard worker for sharded runs, see sharding.py)
+    # With lookup_connections, participant lookups are gathered ahead of time, PREFETCH_BATCH interactions at a time.
+    row_writer = csv.writer(csvfile, quotechar = '', quoting=csv.QUOTE_NONE, delimiter = '\t')
+    executor = None
+    if lookup_connections:
+        executor = AsyncQueryExecutor(conn_string, connections=lookup_connections, snapshot=snapshot)
+
     # For each interaction, get data
-    for int in int_tuples:
+    for index, int in enumerate(int_tuples):
+        if executor and index % PREFETCH_BATCH == 0:
+            prefetch_lookups(executor, int_tuples[index:index + PREFETCH_BATCH])
 
         # Place interaction ID in variable for column 14
         int_id14 = 'flybase:' + int[0]
@@ -430,15 +505,7 @@ def query_for_ints(filename, conn):
             assays7 = '-'
 
         # Get interaction participants
-        get_parts = ('SELECT DISTINCT g.uniquename, g.name, x.uniquename, x.name '
-                    'FROM feature g, feature_relationship fr, feature x, feature_interaction fi, '
-                    'feature_interactionprop fip, interaction i, cvterm cvt '
-                    'WHERE i.interaction_id = fi.interaction_id AND fi.feature_interaction_id = fip.feature_interaction_id '
-                    'AND fip.type_id = cvt.cvterm_id AND fi.feature_id = x.feature_id '
-                    'AND x.feature_id = fr.subject_id AND fr.object_id = g.feature_id AND fr.type_id = 59983 '
-                    'AND cvt.name = \'participating feature\' AND g.is_obsolete = \'f\' AND x.is_obsolete = \'f\' '
-                    'AND g.uniquename LIKE \'FBgn%%\' AND i.uniquename = %s ORDER BY g.uniquename')
-        parts = connect(get_parts,qint,conn)
+        parts = connect(GET_PARTS_QUERY, qint, conn)
 
         # Construct dictionary to associate FBgns of generic genes to Entrez ID
         gene_map = {}
@@ -694,15 +761,20 @@ def query_for_ints(filename, conn):
             B_annot27 = A_annot26
                 
         # Print line for each interaction
-        with open(filename, 'a') as csvfile:
-            csv_writer = csv.writer(csvfile, quotechar = '', quoting=csv.QUOTE_NONE, delimiter = '\t')
-            csv_writer.writerow([A_id1, B_id2, A_altids3, B_altids4,
-                A_name5, B_name6, assays7, ref8, pubid9, A_tax10, B_tax11,
-                intype12, 'psi-mi:"MI:0478"(flybase)', int_id14, '-',
-                '-', A_role17, B_role18, A_role19, B_role20, A_type21,
-                B_type22, '-', '-', int_xref25, A_annot26, B_annot27, annots28, '-',
-                '-', '-', '-', '-', '-', '-', 'FALSE', '-', '-', '-',
-                '-', '-', '-'])
+        row_writer.writerow([A_id1, B_id2, A_altids3, B_altids4,
+            A_name5, B_name6, assays7, ref8, pubid9, A_tax10, B_tax11,
+            intype12, 'psi-mi:"MI:0478"(flybase)', int_id14, '-',
+            '-', A_role17, B_role18, A_role19, B_role20, A_type21,
+            B_type22, '-', '-', int_xref25, A_annot26, B_annot27, annots28, '-',
+            '-', '-', '-', '-', '-', '-', 'FALSE', '-', '-', '-',
+            '-', '-', '-'])
+        if checkpoint:
+            checkpoint.completed()
+
+    if executor:
+        executor.close()
+        prefetched.clear()
+    log_plan_stats(conn)
 
 
 def main():
@@ -713,8 +785,13 @@ def main():
     parser.add_argument('-p', '--password', help='Postgres password', required=True)
     parser.add_argument('-r', '--release', help='FlyBase release used', required=True)
     parser.add_argument('-g', '--gocd', action='store_true', help='Run script in gocd docker container.', required=False)
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an interrupted run.', required=False)
+    parser.add_argument('--shards', type=int, default=1, help='Number of worker processes to split the interactions across.', required=False)
+    parser.add_argument('--lookup-connections', type=int, default=0, help='Connections (per shard) for concurrent lookups; off (0) by default.', required=False)
 
     args = parser.parse_args() 
+    if args.resume and args.shards > 1:
+        parser.error('--resume cannot be combined with --shards.')
     server = args.pgserver
     database = args.database
     username = args.username
@@ -731,10 +808,11 @@ def main():
 
     # Attempt to get a connection
     conn = psycopg2.connect(conn_string)
-    query_for_ints(filename,conn)
+    query_for_ints(filename, conn, database, resume=args.resume, shards=args.shards, conn_string=conn_string,
+                   lookup_connections=args.lookup_connections)
 
     # Close the connection
     conn.close()
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
@@ -0,0 +1,183 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run repeated parameterized lookups as server-side prepared statements.
+
+Usage:
+    from prepared_statements import run_prepared, log_plan_stats
+
+Example:
+    records = run_prepared(get_cg_query, (gene_uniquename, ), conn)    # Instead of connect(get_cg_query, ...).
+    ...
+    log_plan_stats(conn)    # Before closing the connection(s).
+
+Notes:
+    Per-row lookups (e.g., in mitab.py and report_rnacentral_json.py) run
+    the same few statements many thousands of times. Sent as plain SQL,
+    each one is parsed and planned again on every call. The registry gives
+    each distinct statement a name ("bulk_stmt_N"), runs "PREPARE name AS
+    ..." the first time the statement is used on a connection, and
+    "EXECUTE name (...)" from then on. Statements are written as for
+    psycopg2 ("%s" placeholders, "%%" for a literal "%"); parameter types
+    are inferred by the server. Prepared statements belong to the session,
+    so each connection (e.g., a shard worker's) prepares its own.
+
+    After the first few executions, the server may switch a prepared
+    statement to a generic (cached) plan. log_plan_stats() reads the
+    generic/custom plan counts from pg_prepared_statements (PostgreSQL 14+;
+    earlier servers give execution counts only), logs them with the
+    preparation and execution counts and times, and adds them to the run
+    history record (see run_history.py).
+
+    When the query cache is on (see query_cache.py), lookups run as plain
+    SELECT statements, so that they can still be served from the cache.
+
+"""
+
+import logging
+import re
+import threading
+import time
+import weakref
+import psycopg2.extensions
+import query_cache
+from run_history import prepared_stats
+
+log = logging.getLogger(__name__)
+
+NAME_PREFIX = 'bulk_stmt_'
+PLACEHOLDER_REGEX = re.compile(r'%(%|s)')
+
+
+def to_numbered_placeholders(statement):
+    """Convert a psycopg2-style statement ("%s", "%%") to server style ("$1", "%")."""
+    if '%(' in statement:
+        raise ValueError('Named placeholders are not supported: {}'.format(statement))
+    count = [0]
+
+    def replace(match):
+        if match.group(1) == '%':
+            return '%'
+        count[0] += 1
+        return '${}'.format(count[0])
+
+    return PLACEHOLDER_REGEX.sub(replace, statement)
+
+
+class StatementRegistry(object):
+    """Names for distinct statements, and the set of statements prepared on each connection."""
+
+    def __init__(self):
+        """Start with no statements."""
+        self.lock = threading.Lock()
+        self.names = {}                                 # Statement-keyed dict of (name, parameter count).
+        self.prepared = weakref.WeakKeyDictionary()     # Connection-keyed dict of sets of prepared names.
+
+    def name(self, statement):
+        """Return the (name, parameter count) of a statement, naming it if it is new."""
+        named = self.names.get(statement)
+        if named is None:
+            with self.lock:
+                named = self.names.get(statement)
+                if named is None:
+                    named = ('{}{}'.format(NAME_PREFIX, len(self.names) + 1), PLACEHOLDER_REGEX.findall(statement).count('s'))
+                    self.names[statement] = named
+                    prepared_stats[named[0]] = {'statement': ' '.join(statement.split()), 'prepares': 0,
+                                                'executions': 0, 'seconds': 0.0}
+        return named
+
+    def execute(self, statement, params, conn):
+        """Run a statement on a connection (preparing it there first, if needed); return the list of result tuples.
+
+        Args:
+            arg1 (statement): (str) The psycopg2-style statement.
+            arg2 (params): (tuple) The parameters.
+            arg3 (conn): (psycopg2 connection) The connection; only one thread may use it at a time.
+
+        Returns:
+            A list of tuples.
+
+        """
+        cursor = conn.cursor()
+        if query_cache.query_cache is not None:
+            cursor.execute(statement, params)
+            records = cursor.fetchall()
+            cursor.close()
+            return records
+        name, param_count = self.name(statement)
+        stats = prepared_stats[name]
+        start_time = time.perf_counter()
+        with self.lock:
+            prepared = self.prepared.setdefault(conn, set())
+        if name not in prepared:
+            cursor.execute('PREPARE {} AS {}'.format(name, to_numbered_placeholders(statement).strip().rstrip(';')))
+            prepared.add(name)
+            with self.lock:
+                stats['prepares'] += 1
+        if param_count:
+            cursor.execute('EXECUTE {} ({})'.format(name, ', '.join(['%s'] * param_count)), params)
+        else:
+            cursor.execute('EXECUTE {}'.format(name))
+        records = cursor.fetchall()
+        cursor.close()
+        with self.lock:
+            stats['executions'] += 1
+            stats['seconds'] += time.perf_counter() - start_time
+        return records
+
+    def plan_stats(self, conn):
+        """Return a name-keyed dict of the server's statistics for the statements prepared on a connection."""
+        prepared = self.prepared.get(conn)
+        if not prepared:
+            return {}
+        # A plain cursor: these statistics must never come from the query cache.
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        cursor.execute('SELECT * FROM pg_prepared_statements WHERE name = ANY(%s)', (sorted(prepared), ))
+        columns = [i[0] for i in cursor.description]
+        server_stats = {}
+        for row in cursor.fetchall():
+            row_dict = dict(zip(columns, row))
+            server_stats[row_dict['name']] = {i: row_dict[i] for i in ('generic_plans', 'custom_plans') if i in row_dict}
+        cursor.close()
+        return server_stats
+
+
+# The registry used by run_prepared().
+registry = StatementRegistry()
+
+
+def run_prepared(statement, params, conn):
+    """Run a psycopg2-style statement as a prepared statement; return the list of result tuples.
+
+    Args:
+        arg1 (statement): (str) The statement, with "%s" placeholders.
+        arg2 (params): (tuple) The parameters.
+        arg3 (conn): (psycopg2 connection) The connection.
+
+    Returns:
+        A list of tuples.
+
+    """
+    return registry.execute(statement, params, conn)
+
+
+def log_plan_stats(*connections):
+    """Log the statistics of the statements prepared on some connections, and add their plan counts to the run history.
+
+    Args:
+        arg1 (connections): (psycopg2 connection) The connections, still open.
+
+    """
+    total_plan_counts = {}
+    for conn in connections:
+        for name, plan_counts in registry.plan_stats(conn).items():
+            for key, value in plan_counts.items():
+                total_plan_counts.setdefault(name, {})[key] = total_plan_counts.get(name, {}).get(key, 0) + value
+    for name, plan_counts in sorted(total_plan_counts.items()):
+        stats = prepared_stats[name]
+        with registry.lock:
+            for key, value in plan_counts.items():
+                stats[key] = stats.get(key, 0) + value
+        log.info('{}: {} generic and {} custom plans; {} preparations and {} executions so far, {:.1f}s: {:.80}'.format(
+            name, plan_counts.get('generic_plans', 'n/a'), plan_counts.get('custom_plans', 'n/a'),
+            stats['prepares'], stats['executions'], stats['seconds'], stats['statement']))
+    return
@@ -0,0 +1,247 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run a report's main() function with optional CPU and/or memory profiling.
+
+Usage:
+    from profiling import add_profile_arg, profile_main
+    ...
+    add_profile_arg(parser)    # Only for scripts that run parser.parse_args() at import time.
+    args = parser.parse_args()
+    ...
+    if __name__ == "__main__":
+        profile_main(main, log)    # Report scripts use entry_point.run_main(), which calls the profiler.
+
+Example:
+    python report_scrna_seq_data.py -v -c /path/to/config.cfg --profile cpu
+    python mitab.py -s server -d database -u user -p password -r 2024_01 --profile both
+
+Notes:
+    The "--profile cpu|mem|both" option is taken out of sys.argv by
+    profile_main() (or entry_point.run_main()), before main() runs, so args parsed in main() (or with
+    parse_known_args()) never see it. Scripts that run a strict
+    parser.parse_args() at import time, before the option is taken out,
+    must declare the option on their parser with add_profile_arg().
+    Without the option, main() runs as is. Artifacts are written next to
+    the report log (the directory and name of the first file handler of the
+    given logger, or of the root logger), else to the current directory.
+
+    cpu: main() runs under cProfile, giving "<log>.cpu.pstats" (for pstats,
+    snakeviz, etc.). A sampling thread also records the main thread's stack
+    every SAMPLE_INTERVAL seconds, giving "<log>.cpu.collapsed.txt" in the
+    collapsed-stack format read by flamegraph.pl and speedscope.
+
+    mem: main() runs under tracemalloc, and a sampling thread records RSS
+    every RSS_INTERVAL seconds, giving "<log>.mem.rss.tsv" (elapsed seconds,
+    RSS, peak RSS, traced memory). The sampler also re-snapshots tracemalloc
+    whenever traced memory grows by PEAK_SNAPSHOT_GROWTH, so that
+    "<log>.mem.top.txt" lists top allocation sites (by line) and tracebacks
+    both near the peak and at the end of main().
+
+"""
+
+import argparse
+import cProfile
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+SAMPLE_INTERVAL = 0.01      # Seconds between stack samples (cpu).
+RSS_INTERVAL = 1.0          # Seconds between RSS samples (mem).
+TRACEMALLOC_FRAMES = 10     # Frames kept per traced allocation (mem).
+TOP_SITES = 50              # Allocation sites listed (mem).
+TOP_TRACEBACKS = 10         # Allocation tracebacks listed (mem).
+PEAK_SNAPSHOT_GROWTH = 1.1  # Traced memory growth that triggers a new "near peak" snapshot (mem).
+
+
+def add_profile_arg(parser):
+    """Declare the --profile option on a script's own parser, so that a strict parse_args() at import time accepts it."""
+    parser.add_argument('--profile', choices=['cpu', 'mem', 'both'], help='Profile the run (see profiling.py).', required=False)
+    return
+
+
+def pop_profile_arg(argv):
+    """Remove the --profile option from an argv list, returning its value (or None) and the new list."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--profile', choices=['cpu', 'mem', 'both'], required=False)
+    args, other_args = parser.parse_known_args(argv[1:])
+    return args.profile, argv[:1] + other_args
+
+
+def artifact_prefix(log):
+    """Return the path prefix for profiling artifacts, based on the log file if there is one."""
+    for logger in (log, logging.getLogger()):
+        for handler in getattr(logger, 'handlers', []):
+            if isinstance(handler, logging.FileHandler):
+                return os.path.splitext(handler.baseFilename)[0]
+    return os.path.join(os.getcwd(), os.path.splitext(os.path.basename(sys.argv[0]))[0])
+
+
+def current_rss_kb():
+    """Return the current resident set size in KB (Linux /proc), or the peak if unavailable."""
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StackSampler(threading.Thread):
+    """Sample the stack of a thread at an interval, counting collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        """Prepare to sample a thread."""
+        super(StackSampler, self).__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+
+    def run(self):
+        """Take samples until stopped."""
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append('{}:{}:{}'.format(os.path.basename(code.co_filename), code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+        return
+
+    def write(self, filename):
+        """Write stacks in collapsed format ("frame;frame;frame count")."""
+        with open(filename, 'w') as output_file:
+            for stack, count in self.stacks.most_common():
+                output_file.write('{} {}\n'.format(stack, count))
+        return
+
+
+class RSSSampler(threading.Thread):
+    """Record RSS (and traced memory) at an interval."""
+
+    def __init__(self, interval):
+        """Prepare to sample memory use."""
+        super(RSSSampler, self).__init__(daemon=True)
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self.samples = []
+        self.peak_snapshot = None
+        self.peak_snapshot_size = 0
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        """Record one sample, taking a new tracemalloc snapshot if traced memory is well past the last one."""
+        traced_current, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        if traced_current > PEAK_SNAPSHOT_GROWTH * self.peak_snapshot_size:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peak_snapshot_size = traced_current
+        self.samples.append((round(time.perf_counter() - self.start_time, 2), current_rss_kb(),
+                             resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, traced_current // 1024, traced_peak // 1024))
+        return
+
+    def run(self):
+        """Take samples until stopped."""
+        self.sample()
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+        return
+
+    def write(self, filename):
+        """Write the samples as TSV."""
+        with open(filename, 'w') as output_file:
+            output_file.write('elapsed_seconds\trss_kb\tpeak_rss_kb\ttraced_kb\ttraced_peak_kb\n')
+            for sample in self.samples:
+                output_file.write('\t'.join(str(i) for i in sample) + '\n')
+        return
+
+
+def write_tracemalloc_top(snapshots, filename):
+    """Write the top allocation sites (by line) and tracebacks of labeled tracemalloc snapshots."""
+    trace_filters = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    )
+    with open(filename, 'w') as output_file:
+        for label, snapshot in snapshots:
+            if snapshot is None:
+                continue
+            snapshot = snapshot.filter_traces(trace_filters)
+            output_file.write('# Top {} allocation sites by line ({}).\n'.format(TOP_SITES, label))
+            for stat in snapshot.statistics('lineno')[:TOP_SITES]:
+                output_file.write('{}\n'.format(stat))
+            output_file.write('\n# Top {} allocation tracebacks ({}).\n'.format(TOP_TRACEBACKS, label))
+            for stat in snapshot.statistics('traceback')[:TOP_TRACEBACKS]:
+                output_file.write('\n{} blocks, {:.1f} KiB\n'.format(stat.count, stat.size / 1024))
+                for line in stat.traceback.format():
+                    output_file.write('{}\n'.format(line))
+            output_file.write('\n')
+    return
+
+
+def profile_main(main, log=None):
+    """Run main(), profiled as requested by a --profile option on the command line.
+
+    Args:
+        arg1 (main): (function) The script's main function (called without arguments).
+        arg2 (log): (logging.Logger) The script's logger; artifacts are written next to its log file.
+
+    Returns:
+        The return value of main().
+
+    """
+    mode, sys.argv[:] = pop_profile_arg(sys.argv)
+    return run_profiled(main, log, mode)
+
+
+def run_profiled(main, log, mode):
+    """Run main() under the profilers for a --profile mode (cpu, mem, both or None)."""
+    if not mode:
+        return main()
+    log = log or logging.getLogger()
+    prefix = artifact_prefix(log)
+    profiler = None
+    stack_sampler = None
+    rss_sampler = None
+    if mode in ('mem', 'both'):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        rss_sampler = RSSSampler(RSS_INTERVAL)
+        rss_sampler.start()
+    if mode in ('cpu', 'both'):
+        stack_sampler = StackSampler(threading.get_ident(), SAMPLE_INTERVAL)
+        stack_sampler.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    log.info('Profiling main() ({}); artifacts will be written to {}.*'.format(mode, prefix))
+    try:
+        return main()
+    finally:
+        if profiler:
+            profiler.disable()
+            stack_sampler.stop_event.set()
+            stack_sampler.join()
+            profiler.dump_stats('{}.cpu.pstats'.format(prefix))
+            stack_sampler.write('{}.cpu.collapsed.txt'.format(prefix))
+            log.info('Wrote {0}.cpu.pstats and {0}.cpu.collapsed.txt.'.format(prefix))
+        if rss_sampler:
+            rss_sampler.stop_event.set()
+            rss_sampler.join()
+            rss_sampler.sample()
+            snapshots = [
+                ('near peak traced memory: {:.1f} MiB'.format(rss_sampler.peak_snapshot_size / 1048576), rss_sampler.peak_snapshot),
+                ('still allocated at the end of main()', tracemalloc.take_snapshot()),
+            ]
+            write_tracemalloc_top(snapshots, '{}.mem.top.txt'.format(prefix))
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rss_sampler.write('{}.mem.rss.tsv'.format(prefix))
+            log.info('Peak traced memory {:.1f} MiB, peak RSS {:.1f} MiB; wrote {}.mem.top.txt and {}.mem.rss.tsv.'.format(
+                traced_peak / 1048576, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, prefix, prefix))
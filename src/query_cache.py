@@ -0,0 +1,318 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Cache query results on disk, so that reruns against the same frozen database skip repeated queries.
+
+Usage:
+    from query_cache import install_query_cache
+    install_query_cache(namespace)
+
+Example:
+    BULK_REPORT_QUERY_CACHE=/data/qa/query_cache.sqlite python report_hdm.py -c /path/to/config.cfg
+
+Notes:
+    Opt-in: nothing is cached unless the BULK_REPORT_QUERY_CACHE
+    environment variable names a cache file (SQLite). Report scripts get
+    the cache through entry_point.run_main() (and run_reports.py), which
+    installs a caching psycopg2 cursor under the query helpers: on the
+    script's module-level connections, and on connections opened later by
+    psycopg2.connect() (including those of SQLAlchemy engines).
+
+    Only SELECT/WITH statements run on ordinary (not server-side) cursors
+    are cached. The key is a hash of the database identity (server, name
+    and OID, so a dropped and reloaded database of the same name does not
+    match) and the statement with its parameters bound, after whitespace is
+    collapsed. Entries hold the column description, rowcount and rows,
+    pickled and zlib-compressed; results over MAX_ENTRY_BYTES compressed are
+    not cached. When the cache grows past BULK_REPORT_QUERY_CACHE_MB
+    (default: DEFAULT_CACHE_MB), the least recently used entries are evicted
+    down to EVICT_TO_FRACTION of the limit.
+
+    The cache assumes the database does not change between runs (e.g., a
+    finished fb_YYYY_NN_reporting database). Delete the cache file to
+    clear it.
+
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import zlib
+try:
+    import psycopg2
+    import psycopg2.extensions
+    from run_history import TimingCursor
+except ImportError:
+    psycopg2 = None
+
+log = logging.getLogger(__name__)
+
+CACHE_FILE_ENV = 'BULK_REPORT_QUERY_CACHE'
+CACHE_MB_ENV = 'BULK_REPORT_QUERY_CACHE_MB'
+DEFAULT_CACHE_MB = 20480
+MAX_ENTRY_BYTES = 1 << 29       # Largest compressed result that is cached.
+EVICT_TO_FRACTION = 0.9         # Eviction frees space down to this fraction of the size limit.
+COMMIT_INTERVAL = 5             # Seconds between commits of new entries and last-used times.
+COMPRESS_LEVEL = 1
+CACHEABLE_REGEX = re.compile(r'^\s*(\(\s*)*(SELECT|WITH)\b', re.IGNORECASE)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_result (
+    cache_key TEXT PRIMARY KEY,
+    database TEXT,
+    size INTEGER,
+    last_used REAL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS query_result_last_used ON query_result (last_used);
+"""
+
+
+class QueryCache(object):
+    """A size-bounded, LRU-evicted store of compressed query results in a SQLite file."""
+
+    def __init__(self, cache_filename, max_bytes):
+        """Open (creating if needed) the cache file.
+
+        Args:
+            arg1 (cache_filename): (str) Path to the SQLite cache file.
+            arg2 (max_bytes): (int) The size limit for all cached results, in bytes.
+
+        """
+        self.cache_filename = cache_filename
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_filename, timeout=60, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM query_result').fetchone()[0]
+        self.touched = {}       # cache_key-keyed dict of last-used times not yet written.
+        self.last_commit = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.identities = {}    # Connection DSN-keyed dict of database identity strings.
+        log.info('Using query cache {} ({:.1f} of {:.1f} MiB used).'.format(cache_filename, self.total_bytes / 1048576, max_bytes / 1048576))
+
+    def database_identity(self, connection):
+        """Return a string identifying a connection's database: server, name and OID."""
+        identity = self.identities.get(connection.dsn)
+        if identity is None:
+            cursor = connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cursor.execute('SELECT inet_server_addr(), inet_server_port(), current_database(), '
+                           'oid FROM pg_database WHERE datname = current_database()')
+            identity = '{}:{}/{}#{}'.format(*cursor.fetchone())
+            cursor.close()
+            self.identities[connection.dsn] = identity
+        return identity
+
+    def cache_key(self, database, statement):
+        """Return the key for a bound statement (bytes) run against a database identity."""
+        key_hash = hashlib.sha256(database.encode('utf-8'))
+        key_hash.update(b'\0')
+        key_hash.update(b' '.join(statement.split()))
+        return key_hash.hexdigest()
+
+    def get(self, cache_key):
+        """Return a cached (description, rowcount, rows) result, or None."""
+        with self.lock:
+            row = self.connection.execute('SELECT result FROM query_result WHERE cache_key = ?', (cache_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched[cache_key] = time.time()
+            self._commit_if_due()
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, cache_key, database, result):
+        """Store a (description, rowcount, rows) result, evicting old entries if over the size limit."""
+        blob = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+        if len(blob) > MAX_ENTRY_BYTES:
+            log.debug('Not caching a {:.1f} MiB result.'.format(len(blob) / 1048576))
+            return
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO query_result VALUES (?, ?, ?, ?, ?)',
+                                    (cache_key, database, len(blob), time.time(), blob))
+            self.total_bytes += len(blob)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._commit_if_due()
+        return
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is under EVICT_TO_FRACTION of its limit."""
+        self._write_touched()
+        # Other processes may share the cache file, so recount before evicting.
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM query_result').fetchone()[0]
+        target_bytes = self.max_bytes * EVICT_TO_FRACTION
+        evicted = 0
+        query = 'SELECT cache_key, size FROM query_result ORDER BY last_used'
+        for cache_key, size in self.connection.execute(query).fetchall():
+            if self.total_bytes <= target_bytes:
+                break
+            self.connection.execute('DELETE FROM query_result WHERE cache_key = ?', (cache_key,))
+            self.total_bytes -= size
+            evicted += 1
+        log.info('Evicted {} query cache entries; {:.1f} MiB used.'.format(evicted, self.total_bytes / 1048576))
+        return
+
+    def _write_touched(self):
+        """Write pending last-used times."""
+        if self.touched:
+            self.connection.executemany('UPDATE query_result SET last_used = ? WHERE cache_key = ?',
+                                        [(used, key) for key, used in self.touched.items()])
+            self.touched = {}
+        return
+
+    def _commit_if_due(self):
+        """Commit if COMMIT_INTERVAL has passed since the last commit."""
+        if time.monotonic() - self.last_commit >= COMMIT_INTERVAL:
+            self._write_touched()
+            self.connection.commit()
+            self.last_commit = time.monotonic()
+        return
+
+    def close(self):
+        """Commit everything and close the cache file."""
+        with self.lock:
+            if self.connection is None:
+                return
+            self._write_touched()
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+        log.info('Query cache: {} hits, {} misses.'.format(self.hits, self.misses))
+        return
+
+
+# The cache used by CachingCursor, set by install_query_cache().
+query_cache = None
+# Caches opened before a fork, kept referenced (never closed) in forked worker processes.
+inherited_caches = []
+
+
+if psycopg2:
+    class CachingCursor(TimingCursor):
+        """A (timing) psycopg2 cursor that serves repeated SELECT statements from the query cache."""
+
+        def execute(self, query, vars=None):
+            """Execute a statement, or load its result from the cache."""
+            self._cached = None
+            if query_cache is None or self.name is not None or not CACHEABLE_REGEX.match(query):
+                return super(CachingCursor, self).execute(query, vars)
+            database = query_cache.database_identity(self.connection)
+            cache_key = query_cache.cache_key(database, self.mogrify(query, vars))
+            result = query_cache.get(cache_key)
+            if result is None:
+                super(CachingCursor, self).execute(query, vars)
+                if psycopg2.extensions.cursor.description.__get__(self) is None:
+                    return None
+                description = tuple(tuple(i) for i in psycopg2.extensions.cursor.description.__get__(self))
+                result = (description, psycopg2.extensions.cursor.rowcount.__get__(self),
+                          super(CachingCursor, self).fetchall())
+                query_cache.put(cache_key, database, result)
+            self._cached = result
+            self._position = 0
+            return None
+
+        @property
+        def description(self):
+            """Return the column description of the current result."""
+            if getattr(self, '_cached', None) is not None:
+                return self._cached[0]
+            return psycopg2.extensions.cursor.description.__get__(self)
+
+        @property
+        def rowcount(self):
+            """Return the row count of the current result."""
+            if getattr(self, '_cached', None) is not None:
+                return self._cached[1]
+            return psycopg2.extensions.cursor.rowcount.__get__(self)
+
+        def fetchone(self):
+            """Fetch the next row."""
+            if getattr(self, '_cached', None) is None:
+                return super(CachingCursor, self).fetchone()
+            rows = self._cached[2]
+            if self._position >= len(rows):
+                return None
+            self._position += 1
+            return rows[self._position - 1]
+
+        def fetchmany(self, size=None):
+            """Fetch the next rows."""
+            if getattr(self, '_cached', None) is None:
+                return super(CachingCursor, self).fetchmany(size)
+            if size is None:
+                size = self.arraysize
+            rows = self._cached[2][self._position:self._position + size]
+            self._position += len(rows)
+            return rows
+
+        def fetchall(self):
+            """Fetch the remaining rows."""
+            if getattr(self, '_cached', None) is None:
+                return super(CachingCursor, self).fetchall()
+            rows = self._cached[2][self._position:]
+            self._position = len(self._cached[2])
+            return rows
+
+        def __iter__(self):
+            """Iterate over the remaining rows."""
+            if getattr(self, '_cached', None) is None:
+                return super(CachingCursor, self).__iter__()
+            return iter(self.fetchall())
+
+
+def install_query_cache(namespace):
+    """Turn on the query cache if BULK_REPORT_QUERY_CACHE is set, for new connections and those in a namespace.
+
+    Args:
+        arg1 (namespace): (dict) A script's module globals (or a set_up_dict) holding its open psycopg2 connections.
+
+    Returns:
+        True if the cache is on.
+
+    """
+    global query_cache
+    cache_filename = os.environ.get(CACHE_FILE_ENV)
+    if not cache_filename or not psycopg2:
+        return False
+    if query_cache is None:
+        max_bytes = int(float(os.environ.get(CACHE_MB_ENV, DEFAULT_CACHE_MB)) * 1048576)
+        query_cache = QueryCache(cache_filename, max_bytes)
+        atexit.register(query_cache.close)
+        original_connect = psycopg2.connect
+
+        def caching_connect(*args, **kwargs):
+            if kwargs.get('cursor_factory') in (None, TimingCursor):
+                kwargs['cursor_factory'] = CachingCursor
+            return original_connect(*args, **kwargs)
+
+        psycopg2.connect = caching_connect
+    candidates = list(namespace.values())
+    candidates += [j for i in candidates if isinstance(i, dict) for j in i.values()]
+    for candidate in candidates:
+        if isinstance(candidate, psycopg2.extensions.connection) and candidate.cursor_factory in (None, TimingCursor):
+            candidate.cursor_factory = CachingCursor
+    return True
+
+
+def reopen_query_cache():
+    """Give a forked worker process its own handle on the query cache file, if the cache is on.
+
+    Returns:
+        The worker's QueryCache (to be closed by the worker, as atexit handlers do not run in pool workers), or None.
+
+    """
+    global query_cache
+    if query_cache is None:
+        return None
+    inherited_caches.append(query_cache)
+    query_cache = QueryCache(query_cache.cache_filename, query_cache.max_bytes)
+    return query_cache
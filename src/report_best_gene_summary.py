@@ -25,6 +25,7 @@ from harvdev_utils.psycopg_functions import set_up_db_reading
 from harvdev_utils.reporting import (
     Cvterm, Db, Dbxref, Dbxrefprop, Feature, FeatureDbxref, Featureprop, Organism
 )
+from entry_point import run_main
 
 
 # Important label for output files.
@@ -337,4 +338,4 @@ def db_query_transaction(object_to_execute):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -25,6 +25,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'chemicals'
@@ -362,4 +363,4 @@ def run_chem_queries(db_connection):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
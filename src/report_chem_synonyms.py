@@ -20,6 +20,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 REPORT_LABEL = 'chem_synonyms'
@@ -95,4 +96,4 @@ def get_chem_synonym_info():
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -22,6 +22,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'dmel_classical_and_insertion_allele_descriptions'
@@ -540,4 +541,4 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
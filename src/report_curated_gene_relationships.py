@@ -29,6 +29,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect    # other useful functions: add_unique_info, add_list_info, add_unique_dict_info
 )
+from entry_point import run_main
 # from harvdev_utils.psycopg_functions.sql_queries import (
 #     current_feat_symbol_sgmls, current_feat_fullname_sgmls, feat_symbol_synonyms, feat_fullname_synonyms,
 #     feat_secondary_fbids, orgid_abbr, orgid_genus, indirect_rel_features, rel_features, rel_dmel_features,
@@ -154,4 +155,4 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -13,11 +13,14 @@ import os
 import psycopg2
 import re
 import sys
+from profiling import add_profile_arg
+from entry_point import run_main
 
 report_name = 'disease_model_annotations'
 
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 # For running script within GoCD pipeline.
@@ -311,4 +314,4 @@ def connect(sql, query, conn):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -20,6 +20,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'entity_publication'
@@ -358,4 +359,4 @@ def process_db_results(db_results):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -19,6 +19,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect    # other useful functions: add_unique_info, add_list_info, add_unique_dict_info
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'Dmel_enzyme_data'
@@ -421,4 +422,4 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
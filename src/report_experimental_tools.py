@@ -21,6 +21,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'experimental_tool_data'
@@ -266,4 +267,4 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
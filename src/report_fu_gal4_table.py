@@ -2,18 +2,24 @@
 
 # report_fu_gal4_table.py
 # author: David Emmert, modified by Gil dos Santos
-# usage: report_tsv_template.py [-h] [-v VERBOSE]
+# usage: report_tsv_template.py [-h] [-v VERBOSE] [--shards SHARDS]
 # notes: gets info on frequently used GAL4 drivers and writes JSON for tabular output at IU
+#        with --shards N, drivers are split across N worker processes sharing one database snapshot (see sharding.py)
 ################################################################################
 
 import argparse
+import json
 import logging
 import strict_rfc3339
 import psycopg2
 import re
-import json
 import sys
 import os
+from functools import partial
+from sharding import run_shards, iter_json_parts
+from snapshot_group import SnapshotGroup
+from streaming_output import StreamingJSONWriter
+from entry_point import run_main
 
 
 # Function for db queries.
@@ -210,7 +216,7 @@ def fb_repchar(input_string, input_format, output_format):
 
 
 # The core function. Get data, write into a JSON and dump it.
-def get_fu_gal4_json(database_host, database, username, password, annotation_release, database_release, report_name, output_filename):
+def get_fu_gal4_json(database_host, database, username, password, annotation_release, database_release, report_name, output_filename, shards=1):
 
     # Set this as the "official" time the file was generated.
     the_time = strict_rfc3339.now_to_rfc3339_localoffset()
@@ -232,21 +238,45 @@ def get_fu_gal4_json(database_host, database, username, password, annotation_rel
     fug4_json['metaData']['dateProduced'] = the_time
     fug4_json['metaData']['databaseRelease'] =  database_release
     fug4_json['metaData']['annotationRelease'] =  annotation_release
-    fug4_json['data'] = []
 
     ## This gets table column A (GAL4 Driver) & drives subsequent queries
     ## Query for gene features linked to tx features where tx feature_pub = FBrf0237128
     get_fu_gal4_genes = ('SELECT g.feature_id, g.uniquename, g.name, t.feature_id, t.uniquename, t.name '
-                        'FROM feature g, feature t, feature_relationship fr, cvterm cvt, feature_pub fp, pub p '
-                        'WHERE p.uniquename = \'FBrf0237128\' '
-                        'AND p.pub_id = fp.pub_id '
-                        'AND fp.feature_id = t.feature_id '
-                        'AND t.is_obsolete = \'f\' '
-                        'AND t.feature_id = fr.subject_id '
-                        'AND fr.type_id = cvt.cvterm_id and cvt.name = \'associated_with\' '
-                        'AND fr.object_id = g.feature_id '
-                        'AND g.is_obsolete = \'f\'')
+                         'FROM feature g, feature t, feature_relationship fr, cvterm cvt, feature_pub fp, pub p '
+                         'WHERE p.uniquename = \'FBrf0237128\' '
+                         'AND p.pub_id = fp.pub_id '
+                         'AND fp.feature_id = t.feature_id '
+                         'AND t.is_obsolete = \'f\' '
+                         'AND t.feature_id = fr.subject_id '
+                         'AND fr.type_id = cvt.cvterm_id and cvt.name = \'associated_with\' '
+                         'AND fr.object_id = g.feature_id '
+                         'AND g.is_obsolete = \'f\' '
+                         'ORDER BY g.uniquename, t.uniquename')
+    # With shards, the driver query and all workers read one snapshot (see snapshot_group.py).
+    if shards > 1:
+        group = SnapshotGroup(conn, conn_string)
     fu_genes = connect(get_fu_gal4_genes, 'no_query', conn)
+
+    # Records are written out one driver at a time.
+    with StreamingJSONWriter(output_filename, fug4_json, indent=2, separators=(',', ': '), ensure_ascii=False) as json_writer:
+        if shards > 1:
+            part_filenames = run_shards(partial(write_driver_part, image_dict=image_dict), fu_genes, [i[1] for i in fu_genes], shards, group, output_filename)
+            group.close()
+            json_writer.write_records(iter_json_parts(part_filenames))
+        else:
+            json_writer.write_records(get_driver_records(fu_genes, conn, image_dict))
+
+    conn.close()
+
+
+# Shard worker: write the records for a range of driver rows as JSON lines (see sharding.py).
+def write_driver_part(conn, fu_genes, part_file, image_dict):
+    for record_dict in get_driver_records(fu_genes, conn, image_dict):
+        part_file.write(json.dumps(record_dict, ensure_ascii=False) + '\n')
+
+
+# Build and yield the JSON record for each driver.
+def get_driver_records(fu_genes, conn, image_dict):
     allele_ids_already_handled = []
     for gene in fu_genes:
         logging.debug('\nProcessing gene: %s\t%s\t%s\t%s\t%s\t%s' % (gene))
@@ -508,14 +538,7 @@ def get_fu_gal4_json(database_host, database, username, password, annotation_rel
                 logging.debug('\tStock (stock_dict):\t%s\t%s' % (fstock,stock_dict[fstock]))
                 record_dict['driver']['stocks'][stock_dict[fstock]]  = fstock
 
-        fug4_json['data'].append(record_dict)
-
-    with open(output_filename,'w') as outfile:
-        json.dump(fug4_json, outfile, indent=2, separators=(',', ': '), ensure_ascii=False)
-
-        outfile.close()
-
-    conn.close()
+        yield record_dict
 
 
 def main():
@@ -524,6 +547,7 @@ def main():
 
     parser = argparse.ArgumentParser(description='inputs')
     parser.add_argument('-v', '--verbose', action='store_true', help='Provide verbose "DEBUG"-level logging.', required=False)
+    parser.add_argument('--shards', type=int, default=1, help='Number of worker processes to split the drivers across.', required=False)
     args = parser.parse_args()
 
     database_host = os.environ['SERVER']
@@ -545,9 +569,9 @@ def main():
     sys.stderr = open(log_filename, 'a')
     
     logging.info('Started main function. Time: %s' % (strict_rfc3339.now_to_rfc3339_localoffset()))
-    get_fu_gal4_json(database_host, database, username, password, annotation_release, database_release, report_name, output_filename)
+    get_fu_gal4_json(database_host, database, username, password, annotation_release, database_release, report_name, output_filename, shards=args.shards)
     logging.info('Ended main function. Time: %s' % (strict_rfc3339.now_to_rfc3339_localoffset()))
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
@@ -21,6 +21,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 REPORT_LABEL = 'gene_model_annotation_comments'
@@ -144,4 +145,4 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -24,6 +24,7 @@ from harvdev_utils.production import (
     Cvterm, Db, Dbxref, Feature, FeatureGenotype, Genotype, Phenotype, PhenotypeCvterm, Phenstatement, Pub
 )
 from harvdev_utils.psycopg_functions import set_up_db_reading
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'genotype_phenotype_data'
@@ -478,4 +479,4 @@ def db_query_transaction(object_to_execute):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
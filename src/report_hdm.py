@@ -14,6 +14,7 @@ Example:
 """
 
 import argparse
+import logging
 import re
 from harvdev_utils.char_conversions import clean_free_text
 from harvdev_utils.general_functions import (
@@ -22,6 +23,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 REPORT_LABEL = 'human_disease_models'
@@ -59,18 +61,45 @@ HEADER_LIST = [
     'BDSC_link',
 ]
 
-# Proceed with generic setup.
-set_up_dict = set_up_db_reading(REPORT_LABEL)
-DATABASE = set_up_dict['database']
-OUTPUT_FILENAME = set_up_dict['output_filename']
-log = set_up_dict['log']
-CONN = set_up_dict['conn']
+# Global variables for the run, set by configure() (nothing is set up at import; see run_reports.py).
+set_up_dict = None
+DATABASE = None
+OUTPUT_FILENAME = None
+CONN = None
+log = logging.getLogger(__name__)
+
+
+def configure(report_set_up_dict):
+    """Set up the report from a set_up_db_reading()-style dict, including its open "conn" connection."""
+    global set_up_dict, DATABASE, OUTPUT_FILENAME, CONN, log
+    set_up_dict = report_set_up_dict
+    DATABASE = set_up_dict['database']
+    OUTPUT_FILENAME = set_up_dict['output_filename']
+    log = set_up_dict['log']
+    CONN = set_up_dict['conn']
+    return
+
+
+def configure_from_command_line():
+    """Set up the report from the command line (-c and -v handled by set_up_db_reading())."""
+    configure(set_up_db_reading(REPORT_LABEL))
+    # Process more input parameters (-c and -v handled by set_up_db_reading() function above).
+    parser = argparse.ArgumentParser(description='inputs')
+    # Use parse_known_args(), not parse_args(), to handle args specific to this script (outside of set_up_db_reading()).
+    args, extra_args = parser.parse_known_args()
+    log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+    return
 
-# Process more input parameters (-c and -v handled by set_up_db_reading() function above).
-parser = argparse.ArgumentParser(description='inputs')
-# Use parse_known_args(), not parse_args(), to handle args specific to this script (outside of set_up_db_reading()).
-args, extra_args = parser.parse_known_args()
-log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+
+def run_report(report_set_up_dict):
+    """Run the report with configuration and connections passed in (see run_reports.py).
+
+    The connection is left open for the caller to reuse or close.
+
+    """
+    configure(report_set_up_dict)
+    main()
+    return
 
 
 # Basic process of the script.
@@ -97,7 +126,6 @@ def main():
     data_to_export_as_tsv = generic_FB_tsv_dict(REPORT_TITLE, DATABASE)
     data_to_export_as_tsv['data'] = process_database_info(hdm_dict)
     tsv_report_dump(data_to_export_as_tsv, OUTPUT_FILENAME, headers=HEADER_LIST)
-    CONN.close()
     log.info('Ended main function.')
 
 
@@ -803,4 +831,6 @@ def process_database_info(input_data):
 
 
 if __name__ == "__main__":
-    main()
+    configure_from_command_line()
+    run_main(main, log)
+    CONN.close()
@@ -6,7 +6,7 @@ Author(s):
     Gil dos Santos dossantos@morgan.harvard.edu
 
 Usage:
-    report_ht_gene_xprn_data.py [-h] [-c CONFIG] [-v VERBOSE]
+    report_ht_gene_xprn_data.py [-h] [-c CONFIG] [-v VERBOSE] [--connections CONNECTIONS]
 
 Example:
     python report_ht_gene_xprn_data.py -v -c /foo/bar/config.cfg
@@ -17,9 +17,16 @@ Notes:
     limited to cases where there is a single value type per sample, which
     excludes scRNA-seq (for which we have a separate file).
 
+    Each dataset (and individual sample) is queried on its own session, on
+    a bounded pool of connections (--connections, default 4) that all read
+    one snapshot of the database (see snapshot_group.py). The sorted data
+    of each is then merged in xprn_section_order, so the output is the same
+    as for one dataset after another.
+
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import aliased, sessionmaker
 # from harvdev_utils.chado_functions import get_or_create
@@ -30,6 +37,8 @@ from harvdev_utils.production import (
     Cvterm, Feature, Library, LibraryFeature, LibraryFeatureprop, LibraryRelationship
 )
 from harvdev_utils.psycopg_functions import set_up_db_reading
+from snapshot_group import snapshot_group
+from entry_point import run_main
 
 
 # Global variables for the output file. Header order will match list order below.
@@ -64,6 +73,12 @@ insp = inspect(engine)
 
 # Process additional input parameters not handled by the set_up_db_reading() function above.
 parser = argparse.ArgumentParser(description='inputs')
+parser.add_argument('--connections', type=int, default=4, help='Connections for querying datasets concurrently.', required=False)
+# Use parse_known_args(), not parse_args(), to handle args specific to this script (outside of set_up_db_reading()).
+args, extra_args = parser.parse_known_args()
+log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+if args.connections < 1:
+    parser.error('--connections must be at least 1.')
 
 
 # The main process.
@@ -140,150 +155,168 @@ class HTXprnReporter(object):
         'testis_specificity_index_score',
     ]
 
-    def get_ht_project_data(self, session):
-        """Get high-throughput data for datasets having many samples."""
-        log.info('Get high-throughput data for datasets having many samples.')
+    def get_ht_project_data(self, session, dataset_name, xprn_section):
+        """Get high-throughput data for a dataset having many samples.
+
+        Args:
+            arg1 (session): (Session) The session to query with.
+            arg2 (dataset_name): (str) The name of the parental dataset.
+            arg3 (xprn_section): (str) The expression section of the dataset.
+
+        Returns:
+            A list of data dicts for export, sorted by expression section, sample and gene.
+
+        """
         dataset = aliased(Library, name='dataset')
         sample = aliased(Library, name='sample')
         gene = aliased(Feature, name='gene')
         value = aliased(LibraryFeatureprop, name='value')
         unit = aliased(Cvterm, name='unit')
         lib_rel_type = aliased(Cvterm, name='lib_rel_type')
-        counter = 0
-        for dataset_name, xprn_section in self.datasets_to_report.items():
-            log.info(f'Get expression data for {dataset_name}.')
-            xprn_section_rank = self.xprn_section_order[xprn_section]
-            # Get the data.
-            filters = (
-                gene.is_obsolete.is_(False),
-                gene.uniquename.op('~')(self.gene_regex),
-                sample.is_obsolete.is_(False),
-                sample.uniquename.op('~')(self.lib_regex),
-                dataset.is_obsolete.is_(False),
-                dataset.uniquename.op('~')(self.lib_regex),
-                dataset.name == dataset_name,
-                unit.name.in_((self.xprn_types_to_report)),
-                lib_rel_type.name == 'belongs_to'
-            )
-            results = session.query(dataset, sample, gene, unit, value).\
-                select_from(gene).\
-                join(LibraryFeature, (LibraryFeature.feature_id == gene.feature_id)).\
-                join(sample, (sample.library_id == LibraryFeature.library_id)).\
-                join(value, (value.library_feature_id == LibraryFeature.library_feature_id)).\
-                join(unit, (unit.cvterm_id == value.type_id)).\
-                join(LibraryRelationship, (LibraryRelationship.subject_id == sample.library_id)).\
-                join(lib_rel_type, (lib_rel_type.cvterm_id == LibraryRelationship.type_id)).\
-                join(dataset, (dataset.library_id == LibraryRelationship.object_id)).\
-                filter(*filters).\
-                distinct()
-            # Process the data into data dicts for export.
-            this_counter = 0
-            this_data_dict = {}
-            for result in results:
-                # Make an adjustment for FlyAtlas2 bar graphs.
-                if dataset_name == 'FlyAtlas2' and result.sample.name.startswith('microRNA'):
-                    xprn_section_to_use = 'FlyAtlas2 Anatomy miRNA RNA-Seq'
-                    xprn_section_rank_to_use = self.xprn_section_order['FlyAtlas2 Anatomy miRNA RNA-Seq']
-                else:
-                    xprn_section_to_use = xprn_section
-                    xprn_section_rank_to_use = xprn_section_rank
-                # Make an adjustment for FlyAtlas2 FPKM data (temporarily in chado as RPKM so as to not break web).
-                if dataset_name == 'FlyAtlas2' and result.unit.name == 'RPKM':
-                    unit_to_use = 'FPKM'
-                else:
-                    unit_to_use = result.unit.name
-                # Record the xprn_section, sample id and gene id as the data dict key for sorting.
-                data_dict_key = (xprn_section_rank_to_use, result.sample.uniquename, result.gene.uniquename)
-                # Build the dict itself.
-                data_dict = {
-                    'High_Throughput_Expression_Section': xprn_section_to_use,
-                    'Dataset_ID': result.dataset.uniquename,
-                    'Dataset_Name': result.dataset.name,
-                    'Sample_ID': result.sample.uniquename,
-                    'Sample_Name': result.sample.name,
-                    'Gene_ID': result.gene.uniquename,
-                    'Gene_Symbol': result.gene.name,
-                    'Expression_Unit': unit_to_use,
-                    'Expression_Value': result.value.value
-                }
-                this_data_dict[data_dict_key] = data_dict
-                this_counter += 1
-            # Sort all data before sending it to the export list.
-            data_keys = list(this_data_dict.keys())
-            data_keys.sort()
-            for i in data_keys:
-                self.data_to_export.append(this_data_dict[i])
-            counter += this_counter
-            log.info(f'Found {this_counter} expression values for {dataset_name}.')
-        log.info(f'Found {counter} expression values for dataset projects overall.')
-        return
+        log.info(f'Get expression data for {dataset_name}.')
+        xprn_section_rank = self.xprn_section_order[xprn_section]
+        # Get the data.
+        filters = (
+            gene.is_obsolete.is_(False),
+            gene.uniquename.op('~')(self.gene_regex),
+            sample.is_obsolete.is_(False),
+            sample.uniquename.op('~')(self.lib_regex),
+            dataset.is_obsolete.is_(False),
+            dataset.uniquename.op('~')(self.lib_regex),
+            dataset.name == dataset_name,
+            unit.name.in_((self.xprn_types_to_report)),
+            lib_rel_type.name == 'belongs_to'
+        )
+        results = session.query(dataset, sample, gene, unit, value).\
+            select_from(gene).\
+            join(LibraryFeature, (LibraryFeature.feature_id == gene.feature_id)).\
+            join(sample, (sample.library_id == LibraryFeature.library_id)).\
+            join(value, (value.library_feature_id == LibraryFeature.library_feature_id)).\
+            join(unit, (unit.cvterm_id == value.type_id)).\
+            join(LibraryRelationship, (LibraryRelationship.subject_id == sample.library_id)).\
+            join(lib_rel_type, (lib_rel_type.cvterm_id == LibraryRelationship.type_id)).\
+            join(dataset, (dataset.library_id == LibraryRelationship.object_id)).\
+            filter(*filters).\
+            distinct()
+        # Process the data into data dicts for export.
+        this_data_dict = {}
+        for result in results:
+            # Make an adjustment for FlyAtlas2 bar graphs.
+            if dataset_name == 'FlyAtlas2' and result.sample.name.startswith('microRNA'):
+                xprn_section_to_use = 'FlyAtlas2 Anatomy miRNA RNA-Seq'
+                xprn_section_rank_to_use = self.xprn_section_order['FlyAtlas2 Anatomy miRNA RNA-Seq']
+            else:
+                xprn_section_to_use = xprn_section
+                xprn_section_rank_to_use = xprn_section_rank
+            # Make an adjustment for FlyAtlas2 FPKM data (temporarily in chado as RPKM so as to not break web).
+            if dataset_name == 'FlyAtlas2' and result.unit.name == 'RPKM':
+                unit_to_use = 'FPKM'
+            else:
+                unit_to_use = result.unit.name
+            # Record the xprn_section, sample id and gene id as the data dict key for sorting.
+            data_dict_key = (xprn_section_rank_to_use, result.sample.uniquename, result.gene.uniquename)
+            # Build the dict itself.
+            data_dict = {
+                'High_Throughput_Expression_Section': xprn_section_to_use,
+                'Dataset_ID': result.dataset.uniquename,
+                'Dataset_Name': result.dataset.name,
+                'Sample_ID': result.sample.uniquename,
+                'Sample_Name': result.sample.name,
+                'Gene_ID': result.gene.uniquename,
+                'Gene_Symbol': result.gene.name,
+                'Expression_Unit': unit_to_use,
+                'Expression_Value': result.value.value
+            }
+            this_data_dict[data_dict_key] = data_dict
+        log.info(f'Found {len(this_data_dict)} expression values for {dataset_name}.')
+        # Sort all data before sending it to the export list.
+        return [this_data_dict[i] for i in sorted(this_data_dict.keys())]
+
+    def get_ht_sample_data(self, session, sample_name, xprn_section):
+        """Get high-throughput data for an individual sample/analysis.
 
-    def get_ht_sample_data(self, session):
-        """Get high-throughput data for individual samples/analyses."""
-        log.info('Get high-throughput data for individual samples/analyses.')
+        Args:
+            arg1 (session): (Session) The session to query with.
+            arg2 (sample_name): (str) The name of the sample.
+            arg3 (xprn_section): (str) The expression section of the sample.
+
+        Returns:
+            A list of data dicts for export, sorted by expression section, sample and gene.
+
+        """
         sample = aliased(Library, name='sample')
         gene = aliased(Feature, name='gene')
         value = aliased(LibraryFeatureprop, name='value')
         unit = aliased(Cvterm, name='unit')
-        counter = 0
-        for sample_name, xprn_section in self.samples_to_report.items():
-            log.info(f'Get expression data for {sample_name}.')
-            xprn_section_rank = self.xprn_section_order[xprn_section]
-            # Get the data.
-            filters = (
-                gene.is_obsolete.is_(False),
-                gene.uniquename.op('~')(self.gene_regex),
-                sample.is_obsolete.is_(False),
-                sample.uniquename.op('~')(self.lib_regex),
-                sample.name == sample_name,
-                unit.name.in_((self.xprn_types_to_report)),
-            )
-            results = session.query(sample, gene, unit, value).\
-                select_from(gene).\
-                join(LibraryFeature, (LibraryFeature.feature_id == gene.feature_id)).\
-                join(sample, (sample.library_id == LibraryFeature.library_id)).\
-                join(value, (value.library_feature_id == LibraryFeature.library_feature_id)).\
-                join(unit, (unit.cvterm_id == value.type_id)).\
-                filter(*filters).\
-                distinct()
-            # Process the data into data dicts for export.
-            this_counter = 0
-            this_data_dict = {}
-            for result in results:
-                xprn_section_to_use = xprn_section
-                xprn_section_rank_to_use = xprn_section_rank
-                unit_to_use = result.unit.name
-                # Record the xprn_section, sample id and gene id as the data dict key for sorting.
-                data_dict_key = (xprn_section_rank_to_use, result.sample.uniquename, result.gene.uniquename)
-                # Build the dict itself.
-                data_dict = {
-                    'High_Throughput_Expression_Section': xprn_section_to_use,
-                    'Dataset_ID': None,
-                    'Dataset_Name': None,
-                    'Sample_ID': result.sample.uniquename,
-                    'Sample_Name': result.sample.name,
-                    'Gene_ID': result.gene.uniquename,
-                    'Gene_Symbol': result.gene.name,
-                    'Expression_Unit': unit_to_use,
-                    'Expression_Value': result.value.value
-                }
-                this_data_dict[data_dict_key] = data_dict
-                this_counter += 1
-            # Sort all data before sending it to the export list.
-            data_keys = list(this_data_dict.keys())
-            data_keys.sort()
-            for i in data_keys:
-                self.data_to_export.append(this_data_dict[i])
-            counter += this_counter
-            log.info(f'Found {this_counter} expression values for {sample_name}.')
-        log.info(f'Found {counter} expression values for individual datasets overall.')
-        return
+        log.info(f'Get expression data for {sample_name}.')
+        xprn_section_rank = self.xprn_section_order[xprn_section]
+        # Get the data.
+        filters = (
+            gene.is_obsolete.is_(False),
+            gene.uniquename.op('~')(self.gene_regex),
+            sample.is_obsolete.is_(False),
+            sample.uniquename.op('~')(self.lib_regex),
+            sample.name == sample_name,
+            unit.name.in_((self.xprn_types_to_report)),
+        )
+        results = session.query(sample, gene, unit, value).\
+            select_from(gene).\
+            join(LibraryFeature, (LibraryFeature.feature_id == gene.feature_id)).\
+            join(sample, (sample.library_id == LibraryFeature.library_id)).\
+            join(value, (value.library_feature_id == LibraryFeature.library_feature_id)).\
+            join(unit, (unit.cvterm_id == value.type_id)).\
+            filter(*filters).\
+            distinct()
+        # Process the data into data dicts for export.
+        this_data_dict = {}
+        for result in results:
+            # Record the xprn_section, sample id and gene id as the data dict key for sorting.
+            data_dict_key = (xprn_section_rank, result.sample.uniquename, result.gene.uniquename)
+            # Build the dict itself.
+            data_dict = {
+                'High_Throughput_Expression_Section': xprn_section,
+                'Dataset_ID': None,
+                'Dataset_Name': None,
+                'Sample_ID': result.sample.uniquename,
+                'Sample_Name': result.sample.name,
+                'Gene_ID': result.gene.uniquename,
+                'Gene_Symbol': result.gene.name,
+                'Expression_Unit': result.unit.name,
+                'Expression_Value': result.value.value
+            }
+            this_data_dict[data_dict_key] = data_dict
+        log.info(f'Found {len(this_data_dict)} expression values for {sample_name}.')
+        # Sort all data before sending it to the export list.
+        return [this_data_dict[i] for i in sorted(this_data_dict.keys())]
 
     def query_chado(self, session):
-        """Run query methods."""
+        """Run query methods: one per dataset or sample, concurrently, then merge their data in xprn_section_order."""
         log.info('Starting "query_chado" method.')
-        self.get_ht_project_data(session)
-        self.get_ht_sample_data(session)
+        queries = [(self.get_ht_project_data, dataset_name, xprn_section)
+                   for dataset_name, xprn_section in self.datasets_to_report.items()]
+        queries.extend((self.get_ht_sample_data, sample_name, xprn_section)
+                       for sample_name, xprn_section in self.samples_to_report.items())
+        workers = min(args.connections, len(queries))
+        log.info(f'Get high-throughput data for {len(queries)} datasets and samples over {workers} connections.')
+        # Each query gets its own session and pooled connection, all on the snapshot of the group (see snapshot_group.py).
+        with snapshot_group(set_up_dict) as group:
+            Session = sessionmaker(bind=group.create_engine(pool_size=workers, max_overflow=0))
+
+            def run_query(query):
+                query_method, name, xprn_section = query
+                query_session = Session()
+                try:
+                    return query_method(query_session, name, xprn_section)
+                finally:
+                    query_session.close()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                query_data = list(executor.map(run_query, queries))
+        # A dataset's data spans its own section (and, for FlyAtlas2, the section right after it).
+        section_data = sorted(zip([i[2] for i in queries], query_data), key=lambda i: self.xprn_section_order[i[0]])
+        for xprn_section, data in section_data:
+            self.data_to_export.extend(data)
+        log.info(f'Found {len(self.data_to_export)} expression values overall.')
         log.info('Method "query_chado" is done.')
         return
 
@@ -313,4 +346,4 @@ def db_query_transaction(object_to_execute):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -6,17 +6,20 @@
 ################################################################################
 
 import argparse
-import csv
 import datetime
 import logging
 import os
 import psycopg2
 import sys
+from streaming_output import StreamingTSVWriter
+from profiling import add_profile_arg
+from entry_point import run_main
 
 report_name = 'fbgn_fbtr_fbpp_expanded'
 
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 # For running script within GoCD pipeline.
@@ -239,14 +242,6 @@ def main():
     # Generate the output file.
     log.info('TIME: {}. Writing data to output file.'.format(now()))
 
-    output_file = open(output_filename, 'w')
-
-    # Write the headers.
-    output_file.write('## {}\n'.format(to_export_as_tsv['metaData']['title']))
-    output_file.write('## Generated: {}\n'.format(to_export_as_tsv['metaData']['dateProduced']))
-    output_file.write('## Using datasource: {}\n'.format(to_export_as_tsv['metaData']['database']))
-    output_file.write('##\n## ')
-
     headers = [
         'organism',
         'gene_type',
@@ -261,14 +256,12 @@ def main():
         'polypeptide_symbol'
         ]
 
-    csv_writer = csv.DictWriter(output_file, fieldnames=headers, delimiter='\t', extrasaction='ignore')
-    csv_writer.writeheader()
-
-    # Write out the data.
-    for data_item in to_export_as_tsv['data']:
-        csv_writer.writerow(data_item)
+    # Keep the csv module's default "\r\n" line ending used by this report.
+    tsv_writer = StreamingTSVWriter(output_filename, to_export_as_tsv['metaData']['title'], to_export_as_tsv['metaData']['database'],
+                                    headers, date_produced=to_export_as_tsv['metaData']['dateProduced'], lineterminator='\r\n')
+    with tsv_writer:
+        tsv_writer.write_rows(to_export_as_tsv['data'])
 
-    output_file.write('## Finished {}.'.format(to_export_as_tsv['metaData']['title']))
     log.info('TIME: {}. Done writing data to output file.'.format(now()))
 
     # Log end of main function.
@@ -299,4 +292,4 @@ def connect(sql, query, conn):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
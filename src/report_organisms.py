@@ -29,6 +29,7 @@ from harvdev_utils.general_functions import (
 from harvdev_utils.psycopg_functions import (
     add_unique_info, connect, set_up_db_reading    # other useful functions: add_list_info, add_unique_dict_info
 )
+from entry_point import run_main
 # from harvdev_utils.psycopg_functions.sql_queries import (
 #     current_feat_symbol_sgmls, current_feat_fullname_sgmls, feat_symbol_synonyms, feat_fullname_synonyms,
 #     feat_secondary_fbids, orgid_abbr, orgid_genus, indirect_rel_features, rel_features, rel_dmel_features,
@@ -176,4 +177,4 @@ def get_drosophilid_info(organism_dict, db_connection):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -24,6 +24,10 @@ import sys
 from harvdev_utils.psycopg_functions import (
     connect
 )
+from async_queries import AsyncQueryExecutor
+from snapshot_group import SnapshotGroup
+from profiling import add_profile_arg
+from entry_point import run_main
 
 report_name = 'dmel_orthologs_in_drosophila_species'
 report_title = 'FlyBase OrthoDB Drosophila ortholog report'
@@ -31,6 +35,7 @@ report_title = 'FlyBase OrthoDB Drosophila ortholog report'
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
 parser.add_argument('-l', '--local', action='store_true', help='Use local credentials.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 local = args.local
@@ -74,9 +79,11 @@ log.info('Successful connection to database {} on host {}.'.format(database, dat
 def main():
     """Retrieve and print out Drosophila OrthoDB orthologs for Dmel genes."""
     log.info('TIME: {}. Started main function.'.format(now()))
-    orthodb_info = get_orthodb_info()
-    to_export_as_tsv = create_tsv_data_structure()
-    to_export_as_tsv['data'] = process_orthodb_info(orthodb_info)
+    # The lookup connections read the snapshot of the main query (see snapshot_group.py).
+    with SnapshotGroup(conn, conn_string) as group:
+        orthodb_info = get_orthodb_info()
+        to_export_as_tsv = create_tsv_data_structure()
+        to_export_as_tsv['data'] = process_orthodb_info(orthodb_info, snapshot=group.snapshot)
     tsv_dump(to_export_as_tsv, output_filename)
     conn.close()
     log.info('TIME: {}. Ended main function.'.format(now()))
@@ -125,14 +132,17 @@ def get_orthodb_info():
     return ret_orthodb_info
 
 
-def get_featureloc_info(feature_id):
-    """Return scaffold uniquename, fmin, fmax and strand for a given feature_id.
+def get_featureloc_info(feature_ids, snapshot=None):
+    """Return scaffold uniquename, fmin, fmax and strand for each of a list of feature_ids.
+
+    The lookups run concurrently over a few connections (see async_queries.py).
 
     Args:
-        arg1 (integer): the Dmel gene feature_id.
+        arg1 (list): the ortholog gene feature_ids.
+        arg2 (snapshot): (str) An exported snapshot ID for the lookup connections to read from, or None.
 
     Returns:
-        The featureloc for the gene.
+        A feature_id-keyed dict of the featurelocs for the genes.
     """
     fb_featureloc_query = """
         SELECT DISTINCT src.uniquename, fl.fmin, fl.fmax, fl.strand
@@ -140,15 +150,19 @@ def get_featureloc_info(feature_id):
         JOIN feature src ON src.feature_id = fl.srcfeature_id
         WHERE src.is_obsolete = false and src.type_id in (204, 553)
           and fl.feature_id = %s;"""
-    ret_featureloc_query = connect(fb_featureloc_query, (feature_id,), conn)
-    return ret_featureloc_query
+    feature_ids = list(dict.fromkeys(feature_ids))
+    log.info('TIME: {}. Looking up featurelocs for {} ortholog genes.'.format(now(), len(feature_ids)))
+    with AsyncQueryExecutor(conn_string, snapshot=snapshot) as executor:
+        ret_featureloc_query = executor.gather(fb_featureloc_query, [(i, ) for i in feature_ids])
+    return dict(zip(feature_ids, ret_featureloc_query))
 
 
-def process_orthodb_info(input_data):
+def process_orthodb_info(input_data, snapshot=None):
     """Take SQL results and return a list of dictionaries for tsv output.
 
     Args:
         arg1 (list): a list of tuples representing chado query results for orthologs.
+        arg2 (snapshot): (str) An exported snapshot ID for the featureloc lookups, or None.
 
     Returns:
         A list of dictionaries representing OrthoDB ortholog info.
@@ -164,6 +178,7 @@ def process_orthodb_info(input_data):
     ORTHO_GENE_SYMBOL = 6
     ORTHO_FEAT_ID = 7
     ORTHODB_GROUP_ID = 8
+    featureloc_dict = get_featureloc_info([i[ORTHO_FEAT_ID] for i in input_data], snapshot=snapshot)
     for i in input_data:
         orthodb_item = {
             'FBgn_ID': i[FBGN_ID],
@@ -176,7 +191,7 @@ def process_orthodb_info(input_data):
             'Ortholog_feature_id': i[ORTHO_FEAT_ID],
             'OrthoDB_Group_ID': i[ORTHODB_GROUP_ID]
         }
-        ortholog_featureloc_info = get_featureloc_info(orthodb_item['Ortholog_feature_id'])
+        ortholog_featureloc_info = featureloc_dict[orthodb_item['Ortholog_feature_id']]
         if ortholog_featureloc_info:
             orthodb_item['Ortholog_Arm/Scaffold'] = ortholog_featureloc_info[0][0]
             fmin = ortholog_featureloc_info[0][1] + 1
@@ -245,4 +260,4 @@ def tsv_dump(data_object, output_filename):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -15,6 +15,8 @@ import os
 import psycopg2
 # import re
 import sys
+from profiling import add_profile_arg
+from entry_point import run_main
 # from harvdev_utils.char_conversions import *
 
 # Global variables for the output file. Header order will match list order below.
@@ -38,6 +40,7 @@ header_list = [
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
 parser.add_argument('-l', '--local', action='store_true', help='Use local credentials.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 # Environment and output filenames/locations.
@@ -246,4 +249,4 @@ def tsv_dump(data_object, **kwargs):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
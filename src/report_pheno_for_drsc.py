@@ -17,6 +17,8 @@ import psycopg2
 import re
 import sys
 from harvdev_utils.char_conversions import sgml_to_plain_text
+from profiling import add_profile_arg
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_name = 'pheno_data_for_drsc'
@@ -39,6 +41,7 @@ header_list = [
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
 parser.add_argument('-l', '--local', action='store_true', help='Use local credentials.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 # Environment and output filenames/locations.
@@ -514,4 +517,4 @@ def tsv_dump(data_object, **kwargs):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -9,25 +9,129 @@ Author(s):
     Gil dos Santos dossantos@morgan.harvard.edu
 
 Usage:
-    report_rnacentral_json.py [-h] [-v VERBOSE] [-c CONFIG]
+    report_rnacentral_json.py [-h] [-v VERBOSE] [-c CONFIG] [--resume] [--shards SHARDS] [--lookup-connections LOOKUP_CONNECTIONS]
 
 Example:
     python report_rnacentral_json.py -v -c /foo/bar/config.cfg
 
+Notes:
+    If a run is interrupted, rerun it with "--resume" to continue from its
+    last checkpoint (against the same database).
+
+    With "--shards N", the ncRNA genes are split across N worker processes,
+    each with its own connection to one consistent snapshot of the
+    database, and their output is merged in the usual order (see
+    sharding.py).
+
+    With "--lookup-connections N", the per-record lookups of each batch of
+    ncRNA genes are gathered ahead of time over N extra connections (per
+    shard, on the same snapshot), see async_queries.py. Other per-record
+    lookups run as prepared statements, parsed and planned once per
+    connection (see prepared_statements.py).
+
 """
 
+import argparse
 import calendar
+import json
+from functools import partial
 from datetime import datetime, timezone
 from harvdev_utils.psycopg_functions import (
     connect, set_up_db_reading
 )
-import json
 import re
 import time
+from checkpoint import Checkpoint
+from sharding import run_shards, iter_json_parts
+from snapshot_group import conn_string_from_set_up, snapshot_group
+from streaming_output import StreamingJSONWriter
+from async_queries import AsyncQueryExecutor
+from prepared_statements import run_prepared, log_plan_stats
+from entry_point import run_main
 
 # Important label for output files.
 report_label = 'ncRNA_genes'
 
+# Columns of the main ncRNA gene driver query used outside of pop_json_record().
+GENE_UNAME = 1
+GENE_NAME = 2
+TX_TYPE = 5
+TX_FEAT_ID = 6
+TX_UNAME = 7
+TX_NAME = 8
+
+# Per-record lookups. Given --lookup-connections, they are gathered concurrently for each batch of
+# PREFETCH_BATCH driver rows (see async_queries.py) and served by lookup() from "prefetched".
+PREFETCH_BATCH = 500
+GET_SYNONYM_QUERY = ('SELECT distinct(s.name) '
+                     'FROM feature_synonym fs, synonym s, cvterm cvt '
+                     'WHERE fs.feature_id = %s '
+                     'AND fs.is_internal = \'f\' '
+                     'AND fs.is_current = \'f\' '
+                     'AND fs.synonym_id = s.synonym_id '
+                     'AND s.type_id = cvt.cvterm_id '
+                     'AND cvt.name = \'symbol\' ')
+GET_FULLNAME_QUERY = ('SELECT distinct(s.name) '
+                      'FROM feature_synonym fs, synonym s, cvterm cvt '
+                      'WHERE fs.feature_id = %s '
+                      'AND fs.is_internal = \'f\' '
+                      'AND fs.is_current = \'t\' '
+                      'AND fs.synonym_id = s.synonym_id '
+                      'AND s.type_id = cvt.cvterm_id '
+                      'AND cvt.name = \'fullname\' ')
+GET_TAXONID_QUERY = ('SELECT accession '
+                     'FROM organism_dbxref od, dbxref dx, db '
+                     'WHERE od.organism_id = %s '
+                     'AND od.dbxref_id = dx.dbxref_id '
+                     'AND dx.db_id = db.db_id '
+                     'AND db.name = \'NCBITaxon\' ')
+GET_XREFS_QUERY = ('SELECT db.name, accession, version '
+                   'FROM feature_dbxref fd, dbxref dx, db '
+                   'WHERE fd.feature_id = %s '
+                   'AND fd.dbxref_id = dx.dbxref_id '
+                   'AND fd.is_current = \'t\' '
+                   'AND dx.db_id = db.db_id '
+                   'AND db.name in (\'REFSEQ\', \'MIR\')')
+GET_REP_PUBS_QUERY = """
+    SELECT DISTINCT dbx.accession
+    FROM feature f
+    JOIN feature_pub fp ON fp.feature_id = f.feature_id
+    JOIN feature_pubprop fpp ON fpp.feature_pub_id = fp.feature_pub_id
+    JOIN cvterm cvt ON cvt.cvterm_id = fpp.type_id
+    JOIN pub_dbxref pdbx ON pdbx.pub_id = fp.pub_id
+    JOIN dbxref dbx ON dbx.dbxref_id = pdbx.dbxref_id
+    JOIN db ON db.db_id = dbx.db_id
+    WHERE db.name = 'pubmed'
+      AND cvt.name = 'computed_gene_pub_score'
+      AND f.uniquename = %s;
+"""
+GET_ANNOID_QUERY = ('SELECT db.name, accession, is_current '
+                    'FROM feature_dbxref fd, dbxref dx, db '
+                    'WHERE fd.is_current = \'t\' '
+                    'AND fd.dbxref_id = dx.dbxref_id '
+                    'AND dx.db_id = db.db_id '
+                    'AND db.name = \'FlyBase Annotation IDs\' '
+                    'AND fd.feature_id = %s')
+GET_EXONS_QUERY = ('SELECT f.feature_id, f.uniquename, f.name, fmin, fmax, '
+                   '       strand, srcfeature_id, s.name, accession, version '
+                   'FROM feature f, feature_relationship fr, feature s, featureloc fl, '
+                   '     feature_dbxref fd, dbxref dx, db, cvterm cvt, cvterm cvt2 '
+                   'WHERE fr.object_id = %s '
+                   'AND fr.subject_id = f.feature_id '
+                   'AND f.is_obsolete = \'f\' '
+                   'AND f.type_id = cvt2.cvterm_id '
+                   'AND cvt2.name = \'exon\' '
+                   'AND fr.type_id = cvt.cvterm_id '
+                   'AND cvt.name = \'partof\' '
+                   'AND f.feature_id = fl.feature_id '
+                   'AND fl.srcfeature_id = s.feature_id '
+                   'AND s.feature_id = fd.feature_id '
+                   'AND fd.is_current = \'t\' '
+                   'AND fd.dbxref_id = dx.dbxref_id '
+                   'AND dx.db_id = db.db_id '
+                   'AND db.name = \'GB\' ')
+prefetched = {}
+
 # Now proceed with generic setup.
 set_up_dict = set_up_db_reading(report_label)
 database_host = set_up_dict['server']
@@ -41,6 +145,17 @@ output_filename = '{}{}_{}.json'.format(output_dir, report_label, database)
 log = set_up_dict['log']
 conn = set_up_dict['conn']
 
+# Process more input parameters (-c and -v handled by set_up_db_reading() function above).
+parser = argparse.ArgumentParser(description='inputs')
+parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an interrupted run.', required=False)
+parser.add_argument('--shards', type=int, default=1, help='Number of worker processes to split the ncRNA genes across.', required=False)
+parser.add_argument('--lookup-connections', type=int, default=0, help='Connections (per shard) for concurrent lookups; off (0) by default.', required=False)
+# Use parse_known_args(), not parse_args(), to handle args specific to this script (outside of set_up_db_reading()).
+args, extra_args = parser.parse_known_args()
+log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+if args.resume and args.shards > 1:
+    parser.error('--resume cannot be combined with --shards.')
+
 
 def main():
     """Retrieve ncRNA info and export as RNAcentral-compliant JSON file."""
@@ -58,11 +173,9 @@ def main():
     iso_time = datetime.fromtimestamp(calendar.timegm(time.gmtime()), tz=timezone.utc).isoformat()
     ncrna_dict['metaData']['dateProduced'] = iso_time
 
-    # Instantiate data list and fill it up.
-    ncrna_dict['data'] = []
-    get_ncrna_json(database, ncrna_dict)
-    with open(output_filename, 'w') as outfile:
-        json.dump(ncrna_dict, outfile, indent=5, separators=(', ', ': '), ensure_ascii=False)
+    # Write out each record of the data list as it is built.
+    with StreamingJSONWriter(output_filename, ncrna_dict, indent=5, separators=(', ', ': '), ensure_ascii=False) as json_writer:
+        json_writer.write_records(get_ncrna_records(database))
 
     log.info('Done writing data to JSON output file.')
     log.info('Ended main function.\n')
@@ -120,31 +233,52 @@ def pop_assembly_dict(assembly_dict):
     assembly_dict['Dyak']['gbacc'] = 'GCA_000005975.1'
 
 
+def lookup(sql, query):
+    """Return the results of a lookup, prefetched for the current batch of driver rows or run now as a prepared statement."""
+    if (sql, query) in prefetched:
+        return prefetched[(sql, query)]
+    return run_prepared(sql, query, conn)
+
+
+def prefetch_lookups(executor, ncgenes):
+    """Gather the per-record lookups for a batch of ncRNA gene driver rows concurrently, replacing the last batch's."""
+    GENE_FEAT_ID = 0
+    TX_ORG = 9
+    prefetched.clear()
+    tx_ids = [(i[TX_FEAT_ID], ) for i in ncgenes]
+    gene_ids = [(i[GENE_FEAT_ID], ) for i in ncgenes]
+    executor.prefetch(GET_SYNONYM_QUERY, tx_ids + gene_ids, prefetched)
+    executor.prefetch(GET_FULLNAME_QUERY, gene_ids, prefetched)
+    executor.prefetch(GET_TAXONID_QUERY, [(i[TX_ORG], ) for i in ncgenes], prefetched)
+    executor.prefetch(GET_XREFS_QUERY, tx_ids, prefetched)
+    executor.prefetch(GET_EXONS_QUERY, tx_ids, prefetched)
+    executor.prefetch(GET_ANNOID_QUERY, gene_ids, prefetched)
+    executor.prefetch(GET_REP_PUBS_QUERY, [(i[GENE_UNAME], ) for i in ncgenes], prefetched)
+    return
+
+
+def get_ncgene_batches(ncgenes, snapshot=None):
+    """Yield the driver rows, prefetching the lookups for each batch first (if --lookup-connections is set)."""
+    if not args.lookup_connections:
+        yield from ncgenes
+        return
+    with AsyncQueryExecutor(conn_string_from_set_up(set_up_dict), connections=args.lookup_connections, snapshot=snapshot) as executor:
+        for start in range(0, len(ncgenes), PREFETCH_BATCH):
+            prefetch_lookups(executor, ncgenes[start:start + PREFETCH_BATCH])
+            yield from ncgenes[start:start + PREFETCH_BATCH]
+    prefetched.clear()
+    return
+
+
 def get_synonyms(fid, stype):
     """Get various types of synonym for a given feature_id."""
     snout = list()
 
     if (stype == 'synonym'):
-        get_synonym = ('SELECT distinct(s.name) '
-                       'FROM feature_synonym fs, synonym s, cvterm cvt '
-                       'WHERE fs.feature_id = %s '
-                       'AND fs.is_internal = \'f\' '
-                       'AND fs.is_current = \'f\' '
-                       'AND fs.synonym_id = s.synonym_id '
-                       'AND s.type_id = cvt.cvterm_id '
-                       'AND cvt.name = \'symbol\' ')
-
+        get_synonym = GET_SYNONYM_QUERY
     elif (stype == 'fullname'):
-        get_synonym = ('SELECT distinct(s.name) '
-                       'FROM feature_synonym fs, synonym s, cvterm cvt '
-                       'WHERE fs.feature_id = %s '
-                       'AND fs.is_internal = \'f\' '
-                       'AND fs.is_current = \'t\' '
-                       'AND fs.synonym_id = s.synonym_id '
-                       'AND s.type_id = cvt.cvterm_id '
-                       'AND cvt.name = \'fullname\' ')
-
-    synonyms = connect(get_synonym, fid, conn)
+        get_synonym = GET_FULLNAME_QUERY
+    synonyms = lookup(get_synonym, fid)
     for syn in synonyms:
         log.debug('Synonym ({}): {}'.format(stype, syn[0]))
         snout.extend((syn[0], ))
@@ -155,13 +289,7 @@ def get_synonyms(fid, stype):
 
 def get_taxonid(oid):
     # Get NCBI TaxonID for an organism, given organism_id
-    get_txid = ('SELECT accession '
-                'FROM organism_dbxref od, dbxref dx, db '
-                'WHERE od.organism_id = %s '
-                'AND od.dbxref_id = dx.dbxref_id '
-                'AND dx.db_id = db.db_id '
-                'AND db.name = \'NCBITaxon\' ')
-    txids = connect(get_txid, oid, conn)
+    txids = lookup(GET_TAXONID_QUERY, oid)
     for txid in txids:
         log.debug('taxonID: {}'.format(txid[0]))
         return txid[0]
@@ -205,7 +333,7 @@ def get_soid(cvid, fbtr, sofix_dict, tsymb):
                'JOIN db ON db.db_id = dbx.db_id '
                'WHERE cvt.cvterm_id = %s and '
                'db.name = \'SO\' ')
-    sids = connect(get_sid, cvid, conn)
+    sids = lookup(get_sid, cvid)
     if sids:
         if sids[0][0] == 'SO:0000655':
             # Handle SRP_RNA_gene, lncRNA and antisense_lncRNA cases (See JIRA DB-479 for explanation)
@@ -221,7 +349,7 @@ def get_soid(cvid, fbtr, sofix_dict, tsymb):
                        'AND f.feature_id = fc.feature_id '
                        'AND fc.cvterm_id = cvt.cvterm_id '
                        'AND cvt.name in (\'antisense_lncRNA_gene\', \'SRP_RNA_gene\', \'lncRNA_gene\') ')
-            alrs = connect(get_alr, fbtr, conn)
+            alrs = lookup(get_alr, fbtr)
             if alrs:
                 for alr in alrs:
                     if alr[0] == 'lncRNA_gene':
@@ -255,14 +383,7 @@ def get_xrefs(tid):
     # Get REFSEQ & MIR dbxrefs given a feature_id
     xout = []
 
-    get_dbxrefs = ('SELECT db.name, accession, version '
-                   'FROM feature_dbxref fd, dbxref dx, db '
-                   'WHERE fd.feature_id = %s '
-                   'AND fd.dbxref_id = dx.dbxref_id '
-                   'AND fd.is_current = \'t\' '
-                   'AND dx.db_id = db.db_id '
-                   'AND db.name in (\'REFSEQ\', \'MIR\')')
-    dxrefs = connect(get_dbxrefs, tid, conn)
+    dxrefs = lookup(GET_XREFS_QUERY, tid)
     for dxref in dxrefs:
         log.debug('\t\t\tcrossReferenceIDs: {}:{}.{}'.format(dxref[0], dxref[1], dxref[2]))
 
@@ -294,7 +415,7 @@ def get_relseqs(tid):
                     'AND f.is_obsolete = \'f\' '
                     'AND f.type_id = ft.cvterm_id '
                     'AND fr.subject_id = %s')
-    prseqs = connect(get_precseqs, tid, conn)
+    prseqs = lookup(get_precseqs, tid)
     for prseq in prseqs:
         rrec = {}
         log.debug('\t\t\trelated sequence (precursor):\t{}\t{}\t{}'.format(prseq[0], prseq[1], prseq[2]))
@@ -311,7 +432,7 @@ def get_relseqs(tid):
                     'AND f.is_obsolete = \'f\' '
                     'AND f.type_id = ft.cvterm_id '
                     'AND fr.object_id = %s')
-    prdseqs = connect(get_prodseqs, tid, conn)
+    prdseqs = lookup(get_prodseqs, tid)
     for prdseq in prdseqs:
         rrec = {}
         log.debug('\t\t\trelated sequence (matureProduct):\t{}\t{}\t{}'.format(prdseq[0], prdseq[1], prdseq[2]))
@@ -325,20 +446,7 @@ def get_relseqs(tid):
 def get_rep_pubs(gene_uniquename):
     """Get representative publications for a transcript's parent gene."""
     log.debug('Get represenative pubs for gene {}'.format(gene_uniquename))
-    rep_pub_query = """
-        SELECT DISTINCT dbx.accession
-        FROM feature f
-        JOIN feature_pub fp ON fp.feature_id = f.feature_id
-        JOIN feature_pubprop fpp ON fpp.feature_pub_id = fp.feature_pub_id
-        JOIN cvterm cvt ON cvt.cvterm_id = fpp.type_id
-        JOIN pub_dbxref pdbx ON pdbx.pub_id = fp.pub_id
-        JOIN dbxref dbx ON dbx.dbxref_id = pdbx.dbxref_id
-        JOIN db ON db.db_id = dbx.db_id
-        WHERE db.name = 'pubmed'
-          AND cvt.name = 'computed_gene_pub_score'
-          AND f.uniquename = %s;
-    """
-    rep_pub_results = connect(rep_pub_query, (gene_uniquename, ), conn)
+    rep_pub_results = lookup(GET_REP_PUBS_QUERY, (gene_uniquename, ))
     if rep_pub_results:
         rep_pubs = ['PMID:{}'.format(i[0]) for i in rep_pub_results]
         log.debug('Found {} represenative pubs for gene {}'.format(len(rep_pubs), gene_uniquename))
@@ -350,14 +458,7 @@ def get_rep_pubs(gene_uniquename):
 
 def get_annoid(gid):
     # Get annotation ID for a gene, given feature_id
-    get_annid = ('SELECT db.name, accession, is_current '
-                 'FROM feature_dbxref fd, dbxref dx, db '
-                 'WHERE fd.is_current = \'t\' '
-                 'AND fd.dbxref_id = dx.dbxref_id '
-                 'AND dx.db_id = db.db_id '
-                 'AND db.name = \'FlyBase Annotation IDs\' '
-                 'AND fd.feature_id = %s')
-    annids = connect(get_annid, gid, conn)
+    annids = lookup(GET_ANNOID_QUERY, gid)
     for annid in annids:
         log.debug('\t\t\tannotation ID: {}'.format(annid[1]))
         return annid[1]
@@ -376,7 +477,7 @@ def get_mirnatx(tid):
                     'AND cvt.name = \'miRNA\' '
                     'AND cvt.cv_id = cv.cv_id '
                     'AND cv.name = \'SO\'')
-    mitxs = connect(get_mitxdata, tid, conn)
+    mitxs = lookup(get_mitxdata, tid)
     for mitx in mitxs:
         log.debug('\t\tmiRNA:\t{}\t{}\t{}\t{}\t{}\t{}\t{}'.
                   format(mitx[0], mitx[1], mitx[2], mitx[3], mitx[4], mitx[5], mitx[6]))
@@ -392,24 +493,6 @@ def get_glocinfo(tid):
 
     str_dict = {1: '+', -1: '-'}
 
-    get_glocex = ('SELECT f.feature_id, f.uniquename, f.name, fmin, fmax, '
-                  '       strand, srcfeature_id, s.name, accession, version '
-                  'FROM feature f, feature_relationship fr, feature s, featureloc fl, '
-                  '     feature_dbxref fd, dbxref dx, db, cvterm cvt, cvterm cvt2 '
-                  'WHERE fr.object_id = %s '
-                  'AND fr.subject_id = f.feature_id '
-                  'AND f.is_obsolete = \'f\' '
-                  'AND f.type_id = cvt2.cvterm_id '
-                  'AND cvt2.name = \'exon\' '
-                  'AND fr.type_id = cvt.cvterm_id '
-                  'AND cvt.name = \'partof\' '
-                  'AND f.feature_id = fl.feature_id '
-                  'AND fl.srcfeature_id = s.feature_id '
-                  'AND s.feature_id = fd.feature_id '
-                  'AND fd.is_current = \'t\' '
-                  'AND fd.dbxref_id = dx.dbxref_id '
-                  'AND dx.db_id = db.db_id '
-                  'AND db.name = \'GB\' ')
     UNAME = 1
     NAME = 2
     FMIN = 3
@@ -418,7 +501,7 @@ def get_glocinfo(tid):
     SRC_NAME = 7
     SRC_ACC = 8
     VERSION = 9
-    exes = connect(get_glocex, tid, conn)
+    exes = lookup(GET_EXONS_QUERY, tid)
     if exes:    # The case for all except miRNAs
         for ex in exes:
             log.debug('\t\t\texon:\t{}\t{}\tARM:\t{}\t{}:{}..{} ({})'.
@@ -444,7 +527,7 @@ def get_glocinfo(tid):
                      'AND fd.dbxref_id = dx.dbxref_id '
                      'AND dx.db_id = db.db_id '
                      'AND db.name = \'GB\' ')
-        mixes = connect(get_mirex, tid, conn)
+        mixes = lookup(get_mirex, tid)
         for ex in mixes:
             log.debug('\t\t\texon:\t{}\t{}\tARM:\t{}\t{}:{}..{} ({})'.
                       format(ex[NAME], ex[UNAME], ex[SRC_ACC], ex[SRC_NAME], ex[FMIN], ex[FMAX], ex[STRAND]))
@@ -460,8 +543,8 @@ def get_glocinfo(tid):
     return ex_list
 
 
-def get_ncrna_json(database, ncrna_dict):
-    # Build JSON records for each ncRNA to be reported
+def get_ncrna_records(database):
+    # Build and yield JSON records for each ncRNA to be reported
     # Instantiate assembly_dict, containing GB acc# and release# for species genome assemblies (not in chado)
     assembly_dict = {}
     pop_assembly_dict(assembly_dict)
@@ -470,6 +553,11 @@ def get_ncrna_json(database, ncrna_dict):
     sofix_dict = {}
     pop_sofix_dict(sofix_dict)
 
+    # With shards or lookup connections, the driver query and all workers read one snapshot (see snapshot_group.py).
+    group = None
+    if args.shards > 1 or args.lookup_connections:
+        group = snapshot_group(set_up_dict)
+
     # Main driver query for ncRNA genes
     get_ncgenes = """
         SELECT DISTINCT g.feature_id,
@@ -496,52 +584,86 @@ def get_ncrna_json(database, ncrna_dict):
           AND t.is_obsolete IS FALSE
           AND t.uniquename ~ '^FBtr[0-9]{7}$'
           AND g.is_obsolete IS FALSE
-          AND g.uniquename ~ '^FBgn[0-9]{7}$';
+          AND g.uniquename ~ '^FBgn[0-9]{7}$'
+        ORDER BY g.uniquename, t.uniquename, srcfeature_id;
     """
     ncgenes = connect(get_ncgenes, 'no_query', conn)
     log.info('Found {} ncRNA genes.'.format(len(ncgenes)))
-    GENE_UNAME = 1
-    GENE_NAME = 2
-    TX_TYPE = 5
-    TX_FEAT_ID = 6
-    TX_UNAME = 7
-    TX_NAME = 8
-    for ncgene in ncgenes:
-        log.debug('PROCESSING: GENE: {} ({})\tTX_TYPE: {}\tTX: {} ({})'.
-                  format(ncgene[GENE_NAME], ncgene[GENE_UNAME], ncgene[TX_TYPE], ncgene[TX_NAME], ncgene[TX_UNAME]))
+    if args.shards > 1:
+        part_filenames = run_shards(partial(write_ncgene_part, snapshot=group.snapshot), ncgenes, [i[GENE_UNAME] for i in ncgenes], args.shards, group, output_filename)
+        group.close()
+        yield from iter_json_parts(part_filenames)
+        return
+
+    # Records are journaled as JSON lines, so that an interrupted run can be resumed (see checkpoint.py).
+    checkpoint = Checkpoint(output_filename, database, ['{}|{}'.format(i[GENE_UNAME], i[TX_UNAME]) for i in ncgenes], resume=args.resume)
+    journal_filename = '{}.partial.jsonl'.format(output_filename)
+    journal = checkpoint.open_output(journal_filename, journal=True)
+    for line in checkpoint.replay_lines(journal_filename):
+        yield json.loads(line)
+    for ncgene in get_ncgene_batches(ncgenes[checkpoint.start_index:], snapshot=group.snapshot if group else None):
+        for record_dict in get_ncgene_records(database, ncgene, assembly_dict, sofix_dict):
+            journal.write(json.dumps(record_dict, ensure_ascii=False) + '\n')
+            yield record_dict
+        checkpoint.completed()
+    checkpoint.finish()
+    log_plan_stats(conn)
+    if group:
+        group.close()
+
+
+def write_ncgene_part(shard_conn, ncgenes, part_file, snapshot=None):
+    # Shard worker: write the JSON records for a range of ncRNA gene driver rows as JSON lines (see sharding.py)
+    # The helper functions query the module-level conn; the parent's connection stays referenced in set_up_dict.
+    global conn
+    conn = shard_conn
+    assembly_dict = {}
+    pop_assembly_dict(assembly_dict)
+    sofix_dict = {}
+    pop_sofix_dict(sofix_dict)
+    for ncgene in get_ncgene_batches(ncgenes, snapshot=snapshot):
+        for record_dict in get_ncgene_records(database, ncgene, assembly_dict, sofix_dict):
+            part_file.write(json.dumps(record_dict, ensure_ascii=False) + '\n')
+    log_plan_stats(conn)
+
+
+def get_ncgene_records(database, ncgene, assembly_dict, sofix_dict):
+    # Build and yield the JSON record(s) for one row of the ncRNA gene driver query
+    log.debug('PROCESSING: GENE: {} ({})\tTX_TYPE: {}\tTX: {} ({})'.
+              format(ncgene[GENE_NAME], ncgene[GENE_UNAME], ncgene[TX_TYPE], ncgene[TX_NAME], ncgene[TX_UNAME]))
+    record_dict = {}
+    ncrg = []
+
+    # If we got an -RM transcript, this is a possibly a pre_miRNA.
+    # We look for an associated transcript which is the one we want for the report.
+    if ncgene[TX_NAME].endswith('-RM'):
+        mixl = []
+        log.debug('STEP1. Before line 520 query.')
+        mixl = get_mirnatx((ncgene[TX_FEAT_ID], ))
+        log.debug('STEP2. After line 520 query.')
+        # Produce report for the mature miRNAs
+        if mixl:
+            for mid in mixl:
+                ncrg = []
+                record_dict = {}
+                for i in range(5):
+                    ncrg.append(ncgene[i])
+                ncrg.extend(mid)
+                log.debug('Calling pop_json_record: {}'.format(ncrg[TX_UNAME]))
+                pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
+                log.debug('STEP3. After pop_json_record call.')
+                yield record_dict
+        # Produce report for the precursor miRNA
+        ncrg = ncgene
         record_dict = {}
-        ncrg = []
-
-        # If we got an -RM transcript, this is a possibly a pre_miRNA.
-        # We look for an associated transcript which is the one we want for the report.
-        if ncgene[TX_NAME].endswith('-RM'):
-            mixl = []
-            log.debug('STEP1. Before line 520 query.')
-            mixl = get_mirnatx((ncgene[TX_FEAT_ID], ))
-            log.debug('STEP2. After line 520 query.')
-            # Produce report for the mature miRNAs
-            if mixl:
-                for mid in mixl:
-                    ncrg = []
-                    record_dict = {}
-                    for i in range(5):
-                        ncrg.append(ncgene[i])
-                    ncrg.extend(mid)
-                    log.debug('Calling pop_json_record: {}'.format(ncrg[TX_UNAME]))
-                    pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
-                    log.debug('STEP3. After pop_json_record call.')
-                    ncrna_dict['data'].append(record_dict)
-            # Produce report for the precursor miRNA
-            ncrg = ncgene
-            record_dict = {}
-            log.debug('Calling pop_json_record (RM): {}'.format(ncrg[TX_UNAME]))
-            pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
-            ncrna_dict['data'].append(record_dict)
-        else:
-            ncrg = ncgene
-            log.debug('Calling pop_json_record: {}'.format(ncrg[TX_UNAME]))
-            pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
-            ncrna_dict['data'].append(record_dict)
+        log.debug('Calling pop_json_record (RM): {}'.format(ncrg[TX_UNAME]))
+        pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
+        yield record_dict
+    else:
+        ncrg = ncgene
+        log.debug('Calling pop_json_record: {}'.format(ncrg[TX_UNAME]))
+        pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict)
+        yield record_dict
 
 
 def pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict):
@@ -631,4 +753,4 @@ def pop_json_record(database, record_dict, ncrg, assembly_dict, sofix_dict):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
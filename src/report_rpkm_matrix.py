@@ -23,6 +23,7 @@ from harvdev_utils.psycopg_functions import (
 from harvdev_utils.psycopg_functions.sql_queries import (
     current_feat_symbol_sgmls, current_feat_fullname_sgmls, orgid_abbr
 )
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'gene_rpkm_matrix'
@@ -230,4 +231,4 @@ def process_database_info(feat_dict):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
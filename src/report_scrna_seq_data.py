@@ -14,21 +14,33 @@ Example:
 Notes:
     This script reports mean expression and spread for scRNA-Seq clusters.
 
+    All queries run on one snapshot of the database (see
+    snapshot_group.py). The cluster metadata (clustering analyses and
+    clusters, papers, source tissue terms and cluster cell types) comes
+    from a few column-only queries, run concurrently, into slotted
+    ClusteringAnalysis/Cluster records; the mean_expr and spread values
+    are then queried per cluster on the same snapshot.
+    The eleven fields that are constant per cluster are encoded once per
+    cluster as a line prefix; each output line is that prefix plus the
+    encoded gene fields, streamed to file (see streaming_output.py).
+
 """
 
-import argparse
-from sqlalchemy import create_engine, inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
 from sqlalchemy.orm import aliased, sessionmaker
 # from harvdev_utils.chado_functions import get_or_create
-from harvdev_utils.general_functions import (
-    generic_FB_tsv_dict, tsv_report_dump
-)
+from harvdev_utils.general_functions import generic_FB_tsv_dict
 from harvdev_utils.production import (
     Cvterm, Db, Dbxref, ExpressionCvterm, Feature, Library, LibraryCvterm,
     LibraryCvtermprop, LibraryExpression, LibraryFeature, LibraryFeatureprop,
     LibraryPub, LibraryRelationship, Pub
 )
 from harvdev_utils.psycopg_functions import set_up_db_reading
+from snapshot_group import snapshot_group
+from streaming_output import encode_tsv_fields, tsv_report_stream
+from entry_point import run_main
 
 
 # Global variables for the output file. Header order will match list order below.
@@ -52,23 +64,33 @@ header_list = [
     'Spread'
 ]
 
-# Now proceed with generic setup.
-set_up_dict = set_up_db_reading(report_label)
-server = set_up_dict['server']
-database = set_up_dict['database']
-username = set_up_dict['username']
-password = set_up_dict['password']
-output_dir = set_up_dict['output_dir']
-output_filename = set_up_dict['output_filename']
-log = set_up_dict['log']
+# Global variables for the run, set by configure() (nothing is set up at import; see run_reports.py).
+set_up_dict = None
+database = None
+output_filename = None
+engine = None
+log = logging.getLogger(__name__)
+
+
+def configure(report_set_up_dict):
+    """Set up the report from a set_up_db_reading()-style dict, creating an SQLAlchemy engine if none is given."""
+    global set_up_dict, database, output_filename, engine, log
+    set_up_dict = report_set_up_dict
+    database = set_up_dict['database']
+    output_filename = set_up_dict['output_filename']
+    log = set_up_dict['log']
+    engine = set_up_dict.get('engine')
+    if engine is None:
+        engine_var_rep = 'postgresql://' + set_up_dict['username'] + ":" + set_up_dict['password'] + '@' + set_up_dict['server'] + '/' + database
+        engine = create_engine(engine_var_rep)
+    return
 
-# Create SQL Alchemy engines from environmental variables.
-engine_var_rep = 'postgresql://' + username + ":" + password + '@' + server + '/' + database
-engine = create_engine(engine_var_rep)
-insp = inspect(engine)
 
-# Process additional input parameters not handled by the set_up_db_reading() function above.
-parser = argparse.ArgumentParser(description='inputs')
+def run_report(report_set_up_dict):
+    """Run the report with configuration and connections passed in (see run_reports.py)."""
+    configure(report_set_up_dict)
+    main()
+    return
 
 
 # The main process.
@@ -86,8 +108,8 @@ def main():
     notes.append('Spread is the proportion of cells in the cluster in which the gene is detected.')
     notes.append('In "Source_Tissue_*" columns, "mixed" is shown when there are many applicable terms - please see the dataset report for details.')
     data_to_export_as_tsv['metaData']['note'] = notes
-    data_to_export_as_tsv['data'] = data_reporter.data_to_export
-    tsv_report_dump(data_to_export_as_tsv, output_filename, headers=header_list)
+    data_to_export_as_tsv['data'] = data_reporter.process_database_info()
+    tsv_report_stream(data_to_export_as_tsv, output_filename, headers=header_list, encoded=True, lineterminator='\r\n')
 
     # Close
     log.info('Ended main function.\n')
@@ -96,21 +118,27 @@ def main():
 class ClusteringAnalysis(object):
     """A clustering analysis along with its child clusters."""
 
-    def __init__(self, library):
-        """Create a ClusteringAnalysis object from a Library object.
+    __slots__ = ('library_id', 'id', 'name', 'child_clusters', 'papers', 'source_tissue_stage', 'source_tissue_sex',
+                 'source_tissue_anatomy', 'source_tissue_stage_str', 'source_tissue_sex_str', 'source_tissue_anatomy_str')
+
+    def __init__(self, library_id, uniquename, name):
+        """Create a ClusteringAnalysis object from library columns.
 
         Args:
-            feature: (Library) An SQLAlchemy object for the library.
+            arg1 (library_id): (int) The library_id.
+            arg2 (uniquename): (str) The FB ID.
+            arg3 (name): (str) The library name.
 
         Returns:
             An object of the ClusteringAnalysis class.
 
         """
         # Data from chado.
-        self.library = library                 # The Library object.
-        self.id = library.uniquename           # The FB ID.
-        self.child_clusters = []               # Will be list of child Library objects.
-        self.papers = []                       # Will be a list of Pub objects for the clustering analysis.
+        self.library_id = library_id
+        self.id = uniquename                   # The FB ID.
+        self.name = name
+        self.child_clusters = []               # Will be list of child Cluster objects.
+        self.papers = []                       # Will be a list of (uniquename, miniref) tuples for the clustering analysis.
         self.source_tissue_stage = []          # Will be source tissue stage terms.
         self.source_tissue_sex = []            # Will be source tissue sex terms.
         self.source_tissue_anatomy = []        # Will be source tissue anatomy terms.
@@ -118,13 +146,25 @@ class ClusteringAnalysis(object):
         self.source_tissue_sex_str = ''        # Will be source tissue sex terms.
         self.source_tissue_anatomy_str = ''    # Will be source tissue anatomy terms.
 
-        # Bins for note, warning, error and action messages.
-        self.warnings = []                    # Issues that may complicate analysis of the seqfeat.
-        self.notes = []                       # Other notes about the seqfeat.
+    def __str__(self):
+        """Informative string for this clustering analysis."""
+        return f'{self.name} ({self.id})'
+
+
+class Cluster(object):
+    """A transcriptional cell cluster of a clustering analysis."""
+
+    __slots__ = ('library_id', 'id', 'name')
+
+    def __init__(self, library_id, uniquename, name):
+        """Create a Cluster object from library columns."""
+        self.library_id = library_id
+        self.id = uniquename                   # The FB ID.
+        self.name = name
 
     def __str__(self):
-        """Informative string for this sequence targeting reagent."""
-        return f'{self.library.name} ({self.library.uniquename})'
+        """Informative string for this cluster."""
+        return f'{self.name} ({self.id})'
 
 
 class SingleCellRNASeqReporter(object):
@@ -132,19 +172,18 @@ class SingleCellRNASeqReporter(object):
 
     def __init__(self):
         """Create the SingleCellRNASeqReporter object."""
+        # Data dicts used for data processing.
+        self.cluster_dict = {}              # library_id-keyed dict of ClusteringAnalysis objects.
+        self.cluster_cell_type_dict = {}    # library_id-keyed dict of cluster cell type (FBbt ID, name) tuples.
+        self.mean_expr_spread_dict = {}     # library_id-keyed dict of list of (gene ID, symbol, mean_expr, spread) str tuples.
 
-    # Data dicts used for data processing.
-    cluster_dict = {}              # library_id-keyed dict of ClusteringAnalysis objects.
-    cluster_cell_type_dict = {}    # library_id-keyed dict of cluster cell type (Cvterm object).
-    mean_expr_spread_dict = {}     # library_id-keyed dict of list of (Feature, mean_expr, spread) tuples.
-    data_to_export = []
     # Uniquename regexes.
     lib_regex = r'^FBlc[0-9]{7}$'
     gene_regex = r'^FBgn[0-9]{7}$'
     pub_regex = r'^FBrf[0-9]{7}$'
 
-    def get_clustering_analyses(self, session):
-        """Get datasets for clusters and parent clustering analyses."""
+    def query_clustering_analyses(self, session):
+        """Query datasets for clusters and parent clustering analyses."""
         log.info('Get datasets for clusters and parent clustering analyses.')
         analysis = aliased(Library, name='analysis')
         cluster = aliased(Library, name='cluster')
@@ -168,7 +207,10 @@ class SingleCellRNASeqReporter(object):
             cluster_type.name == 'transcriptional cell cluster',
             lib_rel_type.name == 'belongs_to'
         )
-        results = session.query(analysis, cluster).\
+        results = session.query(analysis.library_id.label('analysis_id'), analysis.uniquename.label('analysis_uniquename'),
+                                analysis.name.label('analysis_name'), cluster.library_id.label('cluster_id'),
+                                cluster.uniquename.label('cluster_uniquename'), cluster.name.label('cluster_name')).\
+            select_from(analysis).\
             join(lib_type, (lib_type.cvterm_id == analysis.type_id)).\
             join(lcvt1, (lcvt1.library_id == analysis.library_id)).\
             join(analysis_type, (analysis_type.cvterm_id == lcvt1.cvterm_id)).\
@@ -179,22 +221,10 @@ class SingleCellRNASeqReporter(object):
             join(cluster_type, (cluster_type.cvterm_id == lcvt2.cvterm_id)).\
             filter(*filters).\
             distinct()
-        parent_counter = 0
-        cluster_counter = 0
-        for result in results:
-            try:
-                self.cluster_dict[result.analysis.library_id].child_clusters.append(result.cluster)
-                cluster_counter += 1
-            except KeyError:
-                self.cluster_dict[result.analysis.library_id] = ClusteringAnalysis(result.analysis)
-                self.cluster_dict[result.analysis.library_id].child_clusters.append(result.cluster)
-                parent_counter += 1
-                cluster_counter += 1
-        log.info(f'Found {parent_counter} groups of {cluster_counter} clusters.')
-        return
+        return results.all()
 
-    def get_cluster_pubs(self, session):
-        """Get publication for scRNA-Seq clustering analysis."""
+    def query_cluster_pubs(self, session):
+        """Query publications for scRNA-Seq clustering analyses."""
         log.info('Get publication for scRNA-Seq clustering analysis.')
         filters = (
             Library.is_obsolete.is_(False),
@@ -203,24 +233,16 @@ class SingleCellRNASeqReporter(object):
             Pub.uniquename.op('~')(self.pub_regex),
             Cvterm.name == 'paper'
         )
-        results = session.query(Library, Pub).\
+        results = session.query(Library.library_id, Pub.pub_id, Pub.uniquename, Pub.miniref).\
             join(LibraryPub, (LibraryPub.library_id == Library.library_id)).\
             join(Pub, (Pub.pub_id == LibraryPub.pub_id)).\
             join(Cvterm, (Cvterm.cvterm_id == Pub.type_id)).\
             filter(*filters).\
             distinct()
-        counter = 0
-        for result in results:
-            try:
-                self.cluster_dict[result.Library.library_id].papers.append(result.Pub)
-                counter += 1
-            except KeyError:
-                pass
-        log.info(f'Found {counter} papers for clustering analyses.')
-        return
+        return results.all()
 
-    def get_source_tissue_stage(self, session):
-        """Get source tissue stage for clustering analyses."""
+    def query_source_tissue_stage(self, session):
+        """Query source tissue stage for clustering analyses."""
         log.info('Get source tissue stage for clustering analyses.')
         lcvt1 = aliased(LibraryCvterm, name='lcvt1')
         lcvt2 = aliased(LibraryCvterm, name='lcvt2')
@@ -234,7 +256,7 @@ class SingleCellRNASeqReporter(object):
             term_association_type.name == 'derived_stage',
             Db.name == 'FBdv'
         )
-        results = session.query(Library, stage_term).\
+        results = session.query(Library.library_id, stage_term.cvterm_id, stage_term.name).\
             join(lcvt1, (lcvt1.library_id == Library.library_id)).\
             join(lib_type, (lib_type.cvterm_id == lcvt1.cvterm_id)).\
             join(lcvt2, (lcvt2.library_id == Library.library_id)).\
@@ -245,18 +267,10 @@ class SingleCellRNASeqReporter(object):
             join(Db, (Db.db_id == Dbxref.db_id)).\
             filter(*filters).\
             distinct()
-        stage_counter = 0
-        for result in results:
-            try:
-                self.cluster_dict[result.Library.library_id].source_tissue_stage.append(result.stage_term.name)
-                stage_counter += 1
-            except KeyError:
-                pass
-        log.info(f'Found source tissue stage info for {stage_counter} clustering analyses.')
-        return
+        return results.all()
 
-    def get_source_tissue_sex_and_anatomy(self, session):
-        """Get source tissue sex and anatomy terms for clustering analyses."""
+    def query_source_tissue_sex_and_anatomy(self, session):
+        """Query source tissue sex and anatomy terms for clustering analyses."""
         log.info('Get source tissue sex and anatomy terms for clustering analyses.')
         lib_type = aliased(Cvterm, name='lib_type')
         ec_type = aliased(Cvterm, name='ec_type')
@@ -270,7 +284,8 @@ class SingleCellRNASeqReporter(object):
             ec_type.name.in_((ec_types)),
             Db.name.in_((db_names))
         )
-        results = session.query(Library, Db, ec_type, cvterm).\
+        results = session.query(Library.library_id, Db.db_id, Db.name.label('db_name'), ec_type.cvterm_id.label('ec_type_id'),
+                                ec_type.name.label('ec_type_name'), cvterm.cvterm_id, cvterm.name.label('term_name')).\
             join(LibraryCvterm, (LibraryCvterm.library_id == Library.library_id)).\
             join(lib_type, (lib_type.cvterm_id == LibraryCvterm.cvterm_id)).\
             join(LibraryExpression, (LibraryExpression.library_id == Library.library_id)).\
@@ -281,18 +296,122 @@ class SingleCellRNASeqReporter(object):
             join(Db, (Db.db_id == Dbxref.db_id)).\
             filter(*filters).\
             distinct()
+        return results.all()
+
+    def query_cluster_cell_types(self, session):
+        """Query cell types for expression clusters."""
+        log.info('Get cell types for expression clusters.')
+        cvterm_type = aliased(Cvterm, name='cvterm_type')
+        cell_type = aliased(Cvterm, name='cell_type')
+        lib_type = aliased(Cvterm, name='lib_type')
+        filters = (
+            Library.is_obsolete.is_(False),
+            Library.uniquename.op('~')(self.lib_regex),
+            lib_type.name == 'transcriptional cell cluster',
+            cvterm_type.name == 'anatomy',
+            Db.name == 'FBbt'
+        )
+        results = session.query(Library.library_id, cell_type.cvterm_id, cell_type.name, Dbxref.accession).\
+            join(LibraryCvterm, (LibraryCvterm.library_id == Library.library_id)).\
+            join(lib_type, (lib_type.cvterm_id == LibraryCvterm.cvterm_id)).\
+            join(LibraryExpression, (LibraryExpression.library_id == Library.library_id)).\
+            join(ExpressionCvterm, (ExpressionCvterm.expression_id == LibraryExpression.expression_id)).\
+            join(cvterm_type, (cvterm_type.cvterm_id == ExpressionCvterm.cvterm_type_id)).\
+            join(cell_type, (cell_type.cvterm_id == ExpressionCvterm.cvterm_id)).\
+            join(Dbxref, (Dbxref.dbxref_id == cell_type.dbxref_id)).\
+            join(Db, (Db.db_id == Dbxref.db_id)).\
+            filter(*filters).\
+            distinct()
+        return results.all()
+
+    def get_cluster_metadata(self, Session):
+        """Run the cluster metadata queries concurrently, each on its own session, then assemble the records.
+
+        Args:
+            arg1 (Session): (sessionmaker) Makes the sessions, e.g., bound to the engine of a snapshot group.
+
+        """
+        metadata_queries = [
+            self.query_clustering_analyses,
+            self.query_cluster_pubs,
+            self.query_source_tissue_stage,
+            self.query_source_tissue_sex_and_anatomy,
+            self.query_cluster_cell_types
+        ]
+
+        def run_query(query_method):
+            session = Session()
+            try:
+                return query_method(session)
+            finally:
+                session.close()
+
+        with ThreadPoolExecutor(max_workers=len(metadata_queries)) as executor:
+            analysis_results, pub_results, stage_results, sex_anatomy_results, cell_type_results = \
+                executor.map(run_query, metadata_queries)
+        self.process_clustering_analyses(analysis_results)
+        self.process_cluster_pubs(pub_results)
+        self.process_source_tissue_stage(stage_results)
+        self.process_source_tissue_sex_and_anatomy(sex_anatomy_results)
+        self.process_source_tissue_info()
+        self.process_cluster_cell_types(cell_type_results)
+        return
+
+    def process_clustering_analyses(self, results):
+        """Create ClusteringAnalysis objects with their child Cluster objects."""
+        parent_counter = 0
+        cluster_counter = 0
+        for result in results:
+            cluster = Cluster(result.cluster_id, result.cluster_uniquename, result.cluster_name)
+            try:
+                self.cluster_dict[result.analysis_id].child_clusters.append(cluster)
+                cluster_counter += 1
+            except KeyError:
+                self.cluster_dict[result.analysis_id] = ClusteringAnalysis(result.analysis_id, result.analysis_uniquename, result.analysis_name)
+                self.cluster_dict[result.analysis_id].child_clusters.append(cluster)
+                parent_counter += 1
+                cluster_counter += 1
+        log.info(f'Found {parent_counter} groups of {cluster_counter} clusters.')
+        return
+
+    def process_cluster_pubs(self, results):
+        """Add publications to clustering analyses."""
+        counter = 0
+        for result in results:
+            try:
+                self.cluster_dict[result.library_id].papers.append((result.uniquename, result.miniref))
+                counter += 1
+            except KeyError:
+                pass
+        log.info(f'Found {counter} papers for clustering analyses.')
+        return
+
+    def process_source_tissue_stage(self, results):
+        """Add source tissue stage terms to clustering analyses."""
+        stage_counter = 0
+        for result in results:
+            try:
+                self.cluster_dict[result.library_id].source_tissue_stage.append(result.name)
+                stage_counter += 1
+            except KeyError:
+                pass
+        log.info(f'Found source tissue stage info for {stage_counter} clustering analyses.')
+        return
+
+    def process_source_tissue_sex_and_anatomy(self, results):
+        """Add source tissue sex and anatomy terms to clustering analyses."""
         anatomy_counter = 0
         sex_counter = 0
         for result in results:
-            if result.ec_type.name == 'anatomy' and result.Db.name == 'FBbt':
+            if result.ec_type_name == 'anatomy' and result.db_name == 'FBbt':
                 try:
-                    self.cluster_dict[result.Library.library_id].source_tissue_anatomy.append(result.cvterm.name)
+                    self.cluster_dict[result.library_id].source_tissue_anatomy.append(result.term_name)
                     anatomy_counter += 1
                 except KeyError:
                     pass
-            elif result.ec_type.name == 'stage' and result.Db.name == 'FBcv':
+            elif result.ec_type_name == 'stage' and result.db_name == 'FBcv':
                 try:
-                    self.cluster_dict[result.Library.library_id].source_tissue_sex.append(result.cvterm.name)
+                    self.cluster_dict[result.library_id].source_tissue_sex.append(result.term_name)
                     sex_counter += 1
                 except KeyError:
                     pass
@@ -300,7 +419,7 @@ class SingleCellRNASeqReporter(object):
         log.info(f'Found {sex_counter} sex terms for clustering analysis tissue sources.')
         return
 
-    def process_source_tissue_info(self, session):
+    def process_source_tissue_info(self):
         """Process source tissue info."""
         log.info('Process source tissue info.')
         for cluster_analysis in self.cluster_dict.values():
@@ -330,33 +449,11 @@ class SingleCellRNASeqReporter(object):
                 cluster_analysis.source_tissue_sex_str = 'male'
         return
 
-    def get_cluster_cell_types(self, session):
-        """Get cell types for expression clusters."""
-        log.info('Get cell types for expression clusters.')
-        cvterm_type = aliased(Cvterm, name='cvterm_type')
-        cell_type = aliased(Cvterm, name='cell_type')
-        lib_type = aliased(Cvterm, name='lib_type')
-        filters = (
-            Library.is_obsolete.is_(False),
-            Library.uniquename.op('~')(self.lib_regex),
-            lib_type.name == 'transcriptional cell cluster',
-            cvterm_type.name == 'anatomy',
-            Db.name == 'FBbt'
-        )
+    def process_cluster_cell_types(self, results):
+        """Add cell types to clusters."""
         counter = 0
-        results = session.query(Library, cell_type).\
-            join(LibraryCvterm, (LibraryCvterm.library_id == Library.library_id)).\
-            join(lib_type, (lib_type.cvterm_id == LibraryCvterm.cvterm_id)).\
-            join(LibraryExpression, (LibraryExpression.library_id == Library.library_id)).\
-            join(ExpressionCvterm, (ExpressionCvterm.expression_id == LibraryExpression.expression_id)).\
-            join(cvterm_type, (cvterm_type.cvterm_id == ExpressionCvterm.cvterm_type_id)).\
-            join(cell_type, (cell_type.cvterm_id == ExpressionCvterm.cvterm_id)).\
-            join(Dbxref, (Dbxref.dbxref_id == cell_type.dbxref_id)).\
-            join(Db, (Db.db_id == Dbxref.db_id)).\
-            filter(*filters).\
-            distinct()
         for result in results:
-            self.cluster_cell_type_dict[result.Library.library_id] = result.cell_type
+            self.cluster_cell_type_dict[result.library_id] = (f'FBbt:{result.accession}', result.name)
             counter += 1
         log.info(f'Found {counter} cluster-to-cell_type term associations.')
         return
@@ -375,7 +472,6 @@ class SingleCellRNASeqReporter(object):
                 lib_counter += 1
                 if lib_counter % 100 == 0:
                     log.info(f'Getting data for cluster #{lib_counter}.')
-                self.mean_expr_spread_dict[cluster.library_id] = []
                 filters = (
                     LibraryFeature.library_id == cluster.library_id,
                     Feature.is_obsolete.is_(False),
@@ -383,7 +479,9 @@ class SingleCellRNASeqReporter(object):
                     mean_expr_type.name == 'mean_expr',
                     spread_type.name == 'spread'
                 )
-                results = session.query(Feature, mean_expr, spread).\
+                # The featureprop IDs keep rows distinct as for whole entities; only the other columns are used.
+                results = session.query(Feature.uniquename, Feature.name, mean_expr.value, spread.value,
+                                        mean_expr.library_featureprop_id, spread.library_featureprop_id).\
                     join(LibraryFeature, (LibraryFeature.feature_id == Feature.feature_id)).\
                     join(mean_expr, (mean_expr.library_feature_id == LibraryFeature.library_feature_id)).\
                     join(mean_expr_type, (mean_expr_type.cvterm_id == mean_expr.type_id)).\
@@ -391,57 +489,44 @@ class SingleCellRNASeqReporter(object):
                     join(spread_type, (spread_type.cvterm_id == spread.type_id)).\
                     filter(*filters).\
                     distinct()
-                for result in results:
-                    datum = {
-                        'id': result.Feature.uniquename,
-                        'name': result.Feature.name,
-                        'mean_expr': result.mean_expr.value,
-                        'spread': result.spread.value
-                    }
-                    self.mean_expr_spread_dict[cluster.library_id].append(datum)
-                    data_counter += 1
+                self.mean_expr_spread_dict[cluster.library_id] = [tuple(str(i) for i in result[0:4]) for result in results]
+                data_counter += len(self.mean_expr_spread_dict[cluster.library_id])
         log.info(f'Found {data_counter} scRNA-Seq "spread" data points.')
         return
 
     def process_database_info(self):
-        """Print out scRNA-Seq data."""
+        """Yield the encoded scRNA-Seq data lines: the encoded prefix of each cluster, then each gene's fields."""
         log.info('Print out scRNA-Seq data.')
         for analysis in self.cluster_dict.values():
             for cluster in analysis.child_clusters:
-                data_key = cluster.library_id
-                for datum in self.mean_expr_spread_dict[data_key]:
-                    data_dict = {
-                        'Pub_ID': f'{analysis.papers[0].uniquename}',
-                        'Pub_miniref': f'{analysis.papers[0].miniref}',
-                        'Clustering_Analysis_ID': f'{analysis.library.uniquename}',
-                        'Clustering_Analysis_Name': f'{analysis.library.name}',
-                        'Source_Tissue_Sex': f'{analysis.source_tissue_sex_str}',
-                        'Source_Tissue_Stage': f'{analysis.source_tissue_stage_str}',
-                        'Source_Tissue_Anatomy': f'{analysis.source_tissue_anatomy_str}',
-                        'Cluster_ID': f'{cluster.uniquename}',
-                        'Cluster_Name': f'{cluster.name}',
-                        'Cluster_Cell_Type_ID': f'FBbt:{self.cluster_cell_type_dict[cluster.library_id].dbxref.accession}',
-                        'Cluster_Cell_Type_Name': f'{self.cluster_cell_type_dict[cluster.library_id].name}',
-                        'Gene_ID': f'{datum["id"]}',
-                        'Gene_Symbol': f'{datum["name"]}',
-                        'Mean_Expression': f'{datum["mean_expr"]}',
-                        'Spread': f'{datum["spread"]}'
-                    }
-                    self.data_to_export.append(data_dict)
+                data = self.mean_expr_spread_dict[cluster.library_id]
+                # Clusters without data may also lack a cell type (or a paper): skip them.
+                if not data:
+                    continue
+                cell_type_id, cell_type_name = self.cluster_cell_type_dict[cluster.library_id]
+                cluster_fields = tuple(str(i) for i in (
+                    analysis.papers[0][0], analysis.papers[0][1], analysis.id, analysis.name,
+                    analysis.source_tissue_sex_str, analysis.source_tissue_stage_str, analysis.source_tissue_anatomy_str,
+                    cluster.id, cluster.name, cell_type_id, cell_type_name))
+                prefix = encode_tsv_fields(cluster_fields) + '\t'
+                for datum in data:
+                    yield prefix + encode_tsv_fields(datum)
         return
 
     def query_chado(self, session):
-        """Run write methods."""
-        log.info('Starting "write_to_chado" method.')
-        self.get_clustering_analyses(session)
-        self.get_cluster_pubs(session)
-        self.get_source_tissue_stage(session)
-        self.get_source_tissue_sex_and_anatomy(session)
-        self.process_source_tissue_info(session)
-        self.get_cluster_cell_types(session)
-        self.get_mean_expr_spread_values(session)
-        self.process_database_info()
-        log.info('Method "write_to_chado" is done.')
+        """Run query methods, all on one snapshot of the database (the given session is not used)."""
+        log.info('Starting "query_chado" method.')
+        # Every session gets a pooled connection on the snapshot of the group (see snapshot_group.py): one per
+        # concurrent metadata query, then one reused for the expression queries.
+        with snapshot_group(set_up_dict) as group:
+            Session = sessionmaker(bind=group.create_engine(pool_size=5))
+            self.get_cluster_metadata(Session)
+            snapshot_session = Session()
+            try:
+                self.get_mean_expr_spread_values(snapshot_session)
+            finally:
+                snapshot_session.close()
+        log.info('Method "query_chado" is done.')
         return
 
 
@@ -470,4 +555,5 @@ def db_query_transaction(object_to_execute):
 
 
 if __name__ == "__main__":
-    main()
+    configure(set_up_db_reading(report_label))
+    run_main(main, log)
@@ -8,7 +8,6 @@
 import argparse
 import configparser
 import datetime
-import json
 import logging
 import os
 import pickle
@@ -16,6 +15,9 @@ import psycopg2
 import re
 import strict_rfc3339
 import sys
+from streaming_output import StreamingJSONWriter
+from profiling import add_profile_arg
+from entry_point import run_main
 # from pprint import pformat
 # from harvdev_utils.char_conversions import *
 
@@ -23,6 +25,7 @@ report_name = 'this_report'
 
 parser = argparse.ArgumentParser(description='inputs')
 parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
+add_profile_arg(parser)
 args = parser.parse_args()
 
 # For running script locally.
@@ -77,7 +80,6 @@ def main():
     to_export_as_json['metaData']['dateProduced'] = the_time
     to_export_as_json['metaData']['databaseRelease'] = database_release
     to_export_as_json['metaData']['AnnotationRelease'] = annotation_release
-    to_export_as_json['data'] = []
 
     # Sample query.
     fb_sample_query = """
@@ -92,22 +94,22 @@ def main():
 
     conn.close()
 
-    # Build the list of data elements for export.
-    to_export_as_json['data'] = [{
-        'gene_name': i[0],
-        'feature_type': i[1]}
-        for i in fb_sample_info]
-
-    if len(to_export_as_json['data']) == 0:
+    if not fb_sample_info:
         log.error('No data to report.')
         raise
 
+    # Build the data elements for export as they are written out.
+    data_elements = ({
+        'gene_name': i[0],
+        'feature_type': i[1]}
+        for i in fb_sample_info)
+
     # Generate the output file.
     log.info('TIME: {}. Writing data to output file.'.format(now()))
 
-    with open(output_filename, 'w') as output_file:
-        json.dump(to_export_as_json, output_file, sort_keys=True, indent=2, separators=(',', ': '))
-        output_file.close()
+    with StreamingJSONWriter(output_filename, to_export_as_json, sort_keys=True, indent=2,
+                             separators=(',', ': '), ensure_ascii=True) as json_writer:
+        json_writer.write_records(data_elements)
 
     log.info('TIME: {}. Done writing data to output file.'.format(now()))
 
@@ -139,4 +141,4 @@ def connect(sql, query, conn):
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -23,9 +23,7 @@ import argparse
 # import psycopg2
 # import re
 # import sys
-from harvdev_utils.general_functions import (
-    generic_FB_tsv_dict, tsv_report_dump
-)
+from harvdev_utils.general_functions import generic_FB_tsv_dict
 from harvdev_utils.psycopg_functions import (
     set_up_db_reading, connect    # other useful functions: add_unique_info, add_list_info, add_unique_dict_info
 )
@@ -35,6 +33,8 @@ from harvdev_utils.psycopg_functions import (
 #     featureprops, feat_cvterm_cvtprop    # current_features, feat_id_symbol_sgml
 # )
 # from harvdev_utils.char_conversions import *
+from streaming_output import tsv_report_stream
+from entry_point import run_main
 
 # Global variables for the output file. Header order will match list order below.
 report_label = 'this_report_label'
@@ -82,7 +82,7 @@ def main():
     database_info = get_database_info(conn)
     data_to_export_as_tsv = generic_FB_tsv_dict(report_title, database)
     data_to_export_as_tsv['data'] = process_database_info(database_info)
-    tsv_report_dump(data_to_export_as_tsv, output_filename, headers=header_list)
+    tsv_report_stream(data_to_export_as_tsv, output_filename, headers=header_list)
     conn.close()
     log.info('Ended main function.')
 
@@ -125,16 +125,16 @@ def get_database_info(db_connection):
 
 
 def process_database_info(input_data):
-    """Convert a list of SQL results into a list of dictionaries for TSV output.
+    """Convert SQL results into dictionaries for TSV output.
 
     Args:
         arg1 (list): A list of tuples representing SQL query output.
 
     Returns:
-        A list of dictionaries representing, in this case, paralog information.
+        A generator of dictionaries representing, in this case, paralog information.
     """
     log.info('Starting to process paralog info retrieved from database.')
-    data_list = [{
+    data_list = ({
         'FBgn_ID': i[0],
         'GeneSymbol': i[1],
         'Arm/Scaffold': i[2],
@@ -147,11 +147,11 @@ def process_database_info(input_data):
         'Paralog_Strand': i[9],
         'DIOPT_score': i[10].count(',') + 1    # Does this count commas correctly?
         }
-        for i in input_data]
-    log.info('Done processing paralog info into a list of dictionaries.')
+        for i in input_data)
+    log.info('Paralog info will be converted to dictionaries as it is written out.')
 
     return data_list
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, log)
@@ -0,0 +1,442 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Record report run statistics in a SQLite history, and flag runtime/memory regressions across releases.
+
+Usage:
+    run_history.py [-h] -f HISTORY_DB [-r RELEASE] [-n TRAILING_RELEASES]
+        [-t THRESHOLD] [-o OUTPUT] [-v VERBOSE]
+
+Example:
+    python run_history.py -f /data/build-reporting/bulk_report_history.sqlite -r 2024_02 -n 3 -t 0.25
+
+Notes:
+    Recording: when the BULK_REPORT_HISTORY_DB environment variable names a
+    SQLite file, each report run through entry_point.run_main() appends one
+    row to its "report_run" table, keyed by report label and
+    database_release (from the script's module globals, else the RELEASE
+    environment variable): wall time, CPU time, DB time and query count,
+    peak RSS, output files, output rows and output bytes, and exit status.
+    Runs that use prepared statements (see prepared_statements.py) also
+    record their per-statement preparation, execution and plan counts (as
+    JSON, in "prepared_statements").
+
+    DB time is the time spent in psycopg2 cursor execute/fetch calls, summed
+    over all connections (so concurrent queries can add up to more than the
+    wall time). The script's module-level psycopg2 connections (opened at
+    import time by set_up_db_reading()) are switched to a timing cursor, and
+    psycopg2.connect() is wrapped for connections opened later (including
+    those of SQLAlchemy engines).
+
+    Output files are the script's "output_filename"/"OUTPUT_FILENAME" (or
+    its ".gz" version), else the files under the current directory created
+    or modified during the run (except logs, manifests and profiling
+    artifacts). For files written by the streaming writers (see
+    streaming_output.py), rows (TSV data rows or JSON records) and
+    uncompressed bytes are those counted by the writer. Other files are read
+    once to count uncompressed bytes and, except for JSON files, data lines
+    ("#" and blank lines skipped).
+
+    Regression check (command line): for each report run in the given
+    release (default: the latest release in the history), the latest
+    successful run is compared to the median of the latest successful runs
+    of the TRAILING_RELEASES releases before it. A report is flagged as
+    SLOWER or BIGGER if its wall time or peak RSS exceeds that median by
+    more than THRESHOLD (a fraction), ignoring changes smaller than
+    MIN_WALL_SECONDS or MIN_RSS_KB. Exit code is 1 if any report is flagged.
+
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import resource
+import socket
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from streaming_output import finished_outputs
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:
+    psycopg2 = None
+
+log = logging.getLogger(__name__)
+
+HISTORY_DB_ENV = 'BULK_REPORT_HISTORY_DB'
+MIN_WALL_SECONDS = 30       # Smaller wall time increases are not flagged.
+MIN_RSS_KB = 102400         # Smaller peak RSS increases are not flagged.
+# Files under the current directory that are never report output.
+NON_OUTPUT_REGEX = re.compile(r'(\.log|\.manifest\.json|\.checkpoint\.json|\.partial\.jsonl|\.cpu\.pstats|\.cpu\.collapsed\.txt|\.mem\.top\.txt|\.mem\.rss\.tsv|\.sqlite)$')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_run (
+    run_id INTEGER PRIMARY KEY,
+    report_label TEXT NOT NULL,
+    database_release TEXT,
+    script TEXT,
+    started TEXT,
+    host TEXT,
+    status TEXT,
+    profile TEXT,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    db_seconds REAL,
+    db_queries INTEGER,
+    peak_rss_kb INTEGER,
+    output_rows INTEGER,
+    output_bytes INTEGER,
+    output_files TEXT,
+    prepared_statements TEXT
+);
+CREATE INDEX IF NOT EXISTS report_run_label_release ON report_run (report_label, database_release);
+"""
+CHECK_HEADERS = [
+    'report_label', 'database_release', 'status', 'baseline_releases',
+    'wall_seconds', 'baseline_wall_seconds', 'wall_ratio',
+    'peak_rss_kb', 'baseline_peak_rss_kb', 'rss_ratio',
+    'db_seconds', 'baseline_db_seconds', 'output_rows', 'baseline_output_rows',
+]
+
+# Running totals for the timing cursor.
+db_time_lock = threading.Lock()
+db_time = {'seconds': 0.0, 'queries': 0}
+# Name-keyed dict of prepared statement statistics, kept by prepared_statements.py.
+prepared_stats = {}
+
+
+def main():
+    """Compare each report's latest run to its trailing releases and print a summary."""
+    parser = argparse.ArgumentParser(description='Flag report runtime/memory regressions against previous releases.')
+    parser.add_argument('-f', '--history_db', default=os.environ.get(HISTORY_DB_ENV), help='SQLite run history file.', required=False)
+    parser.add_argument('-r', '--release', help='Release to check (default: latest in history).', required=False)
+    parser.add_argument('-n', '--trailing_releases', type=int, default=3, help='Number of previous releases in the baseline.', required=False)
+    parser.add_argument('-t', '--threshold', type=float, default=0.25, help='Allowed fractional increase over baseline.', required=False)
+    parser.add_argument('-o', '--output', help='Summary TSV output file (default: STDOUT).', required=False)
+    parser.add_argument('-v', '--verbose', action='store_true', help='DEBUG-level logging.', required=False)
+    args = parser.parse_args()
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=level)
+    if not args.history_db:
+        parser.error('No history file: use -f or set {}.'.format(HISTORY_DB_ENV))
+
+    connection = open_history(args.history_db)
+    summaries = check_regressions(connection, args.release, args.trailing_releases, args.threshold)
+    connection.close()
+    output_file = open(args.output, 'w') if args.output else sys.stdout
+    output_file.write('\t'.join(CHECK_HEADERS) + '\n')
+    for summary in summaries:
+        output_file.write('\t'.join('' if summary[i] is None else str(summary[i]) for i in CHECK_HEADERS) + '\n')
+    if args.output:
+        output_file.close()
+    problems = [i for i in summaries if i['status'] not in ('OK', 'NEW')]
+    for problem in problems:
+        log.warning('{}: {} (wall time ratio {}, peak RSS ratio {}).'.format(problem['report_label'], problem['status'],
+                                                                             problem['wall_ratio'], problem['rss_ratio']))
+    log.info('Checked {} reports; {} regressed.'.format(len(summaries), len(problems)))
+    return 1 if problems else 0
+
+
+def open_history(history_db):
+    """Open (creating if needed) the SQLite run history."""
+    connection = sqlite3.connect(history_db, timeout=60)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    # Histories created before a column was added to the schema get it now.
+    columns = [i['name'] for i in connection.execute('PRAGMA table_info(report_run)')]
+    if 'prepared_statements' not in columns:
+        connection.execute('ALTER TABLE report_run ADD COLUMN prepared_statements TEXT')
+    return connection
+
+
+def latest_runs(connection):
+    """Return a (report label, release)-keyed dict of the latest successful run for each."""
+    runs = {}
+    query = "SELECT * FROM report_run WHERE status = 'ok' ORDER BY run_id"
+    for row in connection.execute(query):
+        runs[(row['report_label'], row['database_release'])] = dict(row)
+    return runs
+
+
+def ratio(value, baseline):
+    """Return value/baseline rounded, or None if either is missing or the baseline is zero."""
+    if value is None or not baseline:
+        return None
+    return round(value / baseline, 3)
+
+
+def check_regressions(connection, release, trailing_releases, threshold):
+    """Compare each report's run in a release to the median of its runs in the trailing releases.
+
+    Args:
+        arg1 (connection): (sqlite3.Connection) The run history.
+        arg2 (release): (str) The release to check; if None, the latest release in the history.
+        arg3 (trailing_releases): (int) The number of previous releases with runs to use as the baseline.
+        arg4 (threshold): (float) The allowed fractional increase in wall time and peak RSS.
+
+    Returns:
+        A list of summary dicts (keys are CHECK_HEADERS), one per report run in the release.
+
+    """
+    runs = latest_runs(connection)
+    releases = sorted({i[1] for i in runs if i[1]})
+    if not release:
+        if not releases:
+            return []
+        release = releases[-1]
+    log.info('Checking release {} against up to {} previous releases.'.format(release, trailing_releases))
+    summaries = []
+    for (report_label, run_release), run in sorted(runs.items()):
+        if run_release != release:
+            continue
+        previous = [runs[(report_label, i)] for i in releases if i < release and (report_label, i) in runs]
+        previous = previous[-trailing_releases:]
+        summary = {
+            'report_label': report_label,
+            'database_release': release,
+            'baseline_releases': ','.join(i['database_release'] for i in previous),
+            'wall_seconds': run['wall_seconds'],
+            'peak_rss_kb': run['peak_rss_kb'],
+            'db_seconds': run['db_seconds'],
+            'output_rows': run['output_rows'],
+        }
+        for key in ('wall_seconds', 'peak_rss_kb', 'db_seconds', 'output_rows'):
+            values = [i[key] for i in previous if i[key] is not None]
+            summary['baseline_' + key] = statistics.median(values) if values else None
+        summary['wall_ratio'] = ratio(run['wall_seconds'], summary['baseline_wall_seconds'])
+        summary['rss_ratio'] = ratio(run['peak_rss_kb'], summary['baseline_peak_rss_kb'])
+        if not previous:
+            summary['status'] = 'NEW'
+        else:
+            flags = []
+            if summary['wall_ratio'] and summary['wall_ratio'] > 1 + threshold \
+                    and run['wall_seconds'] - summary['baseline_wall_seconds'] >= MIN_WALL_SECONDS:
+                flags.append('SLOWER')
+            if summary['rss_ratio'] and summary['rss_ratio'] > 1 + threshold \
+                    and run['peak_rss_kb'] - summary['baseline_peak_rss_kb'] >= MIN_RSS_KB:
+                flags.append('BIGGER')
+            summary['status'] = ','.join(flags) or 'OK'
+        summaries.append(summary)
+    return summaries
+
+
+if psycopg2:
+    class TimingCursor(psycopg2.extensions.cursor):
+        """A psycopg2 cursor that adds the time spent in execute and fetch calls to db_time."""
+
+        def _timed(self, method, *args):
+            """Call a base cursor method, timing it."""
+            start_time = time.perf_counter()
+            try:
+                return method(self, *args)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                with db_time_lock:
+                    db_time['seconds'] += elapsed
+                    if method in (psycopg2.extensions.cursor.execute, psycopg2.extensions.cursor.callproc):
+                        db_time['queries'] += 1
+
+        def execute(self, query, vars=None):
+            """Execute a statement, timing it."""
+            return self._timed(psycopg2.extensions.cursor.execute, query, vars)
+
+        def executemany(self, query, vars_list):
+            """Execute a statement for each set of parameters, timing it."""
+            return self._timed(psycopg2.extensions.cursor.executemany, query, vars_list)
+
+        def callproc(self, procname, parameters=None):
+            """Call a stored procedure, timing it."""
+            return self._timed(psycopg2.extensions.cursor.callproc, procname, parameters)
+
+        def fetchone(self):
+            """Fetch one row, timing it."""
+            return self._timed(psycopg2.extensions.cursor.fetchone)
+
+        def fetchmany(self, size=None):
+            """Fetch rows, timing it."""
+            if size is None:
+                size = self.arraysize
+            return self._timed(psycopg2.extensions.cursor.fetchmany, size)
+
+        def fetchall(self):
+            """Fetch all remaining rows, timing it."""
+            return self._timed(psycopg2.extensions.cursor.fetchall)
+
+
+def measure_output_file(path):
+    """Return the (rows, uncompressed bytes) of an output file, from its streaming writer if it had one.
+
+    Files not written by a streaming writer are read once (decompressing gzipped ones); their rows are data lines
+    ("#" and blank lines skipped), and JSON files, which would need decoding, count no rows.
+
+    """
+    finished = finished_outputs.get(os.path.abspath(path))
+    if finished:
+        return finished
+    count_rows = '.json' not in os.path.basename(path)
+    row_count = 0
+    size = 0
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as input_file:
+        for line in input_file:
+            size += len(line)
+            if count_rows and line.strip() and not line.startswith(b'#'):
+                row_count += 1
+    return row_count, size
+
+
+class RunRecorder(object):
+    """Collect the statistics of one report run and append them to the run history."""
+
+    def __init__(self, history_db, main, profile=None, set_up_dict=None):
+        """Prepare to record a run of a script's main function.
+
+        Args:
+            arg1 (history_db): (str) Path to the SQLite run history.
+            arg2 (main): (function) The script's main function; its module globals identify the run.
+            arg3 (profile): (str) The --profile mode the run uses, if any.
+            arg4 (set_up_dict): (dict) The set_up_dict passed to a hosted report (see run_reports.py), if any.
+
+        """
+        self.history_db = history_db
+        self.module_globals = main.__globals__
+        self.set_up_dict = set_up_dict
+        self.script = os.path.basename(self.module_globals.get('__file__') or sys.argv[0])
+        self.profile = profile
+        self.original_connect = None
+        self.timing_connect = None
+        self.start_time = None
+        self.start_wall_clock = None
+        self.start_db_time = None
+        self.start_prepared_stats = None
+
+    def identify(self):
+        """Return the report label and database_release of the run (read after the script has set them up)."""
+        report_label = self.module_globals.get('report_label') or self.module_globals.get('REPORT_LABEL') \
+            or os.path.splitext(self.script)[0]
+        set_up_dict = self.set_up_dict or self.module_globals.get('set_up_dict') or {}
+        database_release = set_up_dict.get('database_release') or self.module_globals.get('database_release') \
+            or os.environ.get('RELEASE')
+        return report_label, database_release
+
+    def start(self):
+        """Start timing, and switch the script's database connections to timing cursors."""
+        if psycopg2:
+            self.original_connect = psycopg2.connect
+            original_connect = self.original_connect
+
+            def timing_connect(*args, **kwargs):
+                if kwargs.get('cursor_factory') is None:
+                    kwargs['cursor_factory'] = TimingCursor
+                return original_connect(*args, **kwargs)
+
+            self.timing_connect = timing_connect
+            psycopg2.connect = timing_connect
+            candidates = list(self.module_globals.values()) + [self.set_up_dict or {}]
+            candidates += [j for i in candidates if isinstance(i, dict) for j in i.values()]
+            for candidate in candidates:
+                if isinstance(candidate, psycopg2.extensions.connection) and candidate.cursor_factory is None:
+                    candidate.cursor_factory = TimingCursor
+        self.start_db_time = dict(db_time)
+        self.start_prepared_stats = {name: dict(stats) for name, stats in prepared_stats.items()}
+        self.start_wall_clock = time.time()
+        self.start_time = time.perf_counter()
+        return
+
+    def output_files(self):
+        """Return the paths of the run's output files."""
+        for name in ('output_filename', 'OUTPUT_FILENAME'):
+            output_filename = self.module_globals.get(name)
+            if isinstance(output_filename, str):
+                return [i for i in (output_filename, output_filename + '.gz') if os.path.isfile(i)]
+        paths = []
+        for dirpath, _, filenames in os.walk(os.getcwd()):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if not NON_OUTPUT_REGEX.search(filename) and os.path.getmtime(path) >= self.start_wall_clock:
+                    paths.append(path)
+        return sorted(paths)
+
+    def prepared_statements(self):
+        """Return the JSON statistics of the statements prepared (or executed) during the run, or None."""
+        run_stats = {}
+        for name, stats in prepared_stats.items():
+            start_stats = self.start_prepared_stats.get(name, {})
+            run_stats[name] = {key: value if key == 'statement' else round(value - start_stats.get(key, 0), 3)
+                               for key, value in stats.items()}
+        run_stats = {name: stats for name, stats in run_stats.items() if stats['executions']}
+        return json.dumps(run_stats, sort_keys=True) if run_stats else None
+
+    def finish(self, status):
+        """Stop timing, measure the output and append the run to the history.
+
+        Args:
+            arg1 (status): (str) 'ok', or a short description of how the run failed.
+
+        """
+        wall_seconds = time.perf_counter() - self.start_time
+        # Leave psycopg2.connect alone if it has since been wrapped again (e.g., by query_cache).
+        if self.original_connect and psycopg2.connect is self.timing_connect:
+            psycopg2.connect = self.original_connect
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        report_label, database_release = self.identify()
+        output_files = self.output_files()
+        output_rows = 0
+        output_bytes = 0
+        for path in output_files:
+            try:
+                file_rows, file_bytes = measure_output_file(path)
+                output_rows += file_rows
+                output_bytes += file_bytes
+            except (OSError, EOFError, gzip.BadGzipFile) as error:
+                log.warning('Could not measure output file {}: {}'.format(path, error))
+        record = {
+            'report_label': report_label,
+            'database_release': database_release,
+            'script': self.script,
+            'started': datetime.datetime.fromtimestamp(self.start_wall_clock).isoformat(timespec='seconds'),
+            'host': socket.gethostname(),
+            'status': status,
+            'profile': self.profile,
+            'wall_seconds': round(wall_seconds, 3),
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+            'db_seconds': round(db_time['seconds'] - self.start_db_time['seconds'], 3) if psycopg2 else None,
+            'db_queries': db_time['queries'] - self.start_db_time['queries'] if psycopg2 else None,
+            'peak_rss_kb': usage.ru_maxrss,
+            'output_rows': output_rows,
+            'output_bytes': output_bytes,
+            'output_files': json.dumps([os.path.relpath(i) for i in output_files]),
+            'prepared_statements': self.prepared_statements(),
+        }
+        try:
+            connection = open_history(self.history_db)
+            with connection:
+                connection.execute('INSERT INTO report_run ({}) VALUES ({})'.format(
+                    ', '.join(record), ', '.join('?' for _ in record)), list(record.values()))
+            connection.close()
+        except sqlite3.Error as error:
+            log.warning('Could not record run in {}: {}'.format(self.history_db, error))
+            return
+        log.info('Recorded run of {} ({}) in {}: {}s wall, {} DB, {} KB peak RSS, {} rows, {} bytes.'.format(
+            report_label, database_release, self.history_db, record['wall_seconds'],
+            'untimed' if record['db_seconds'] is None else '{}s'.format(record['db_seconds']),
+            record['peak_rss_kb'], output_rows, output_bytes))
+        return
+
+
+def start_run_recorder(main, profile=None, set_up_dict=None):
+    """Return a started RunRecorder (see RunRecorder for args) if BULK_REPORT_HISTORY_DB is set, else None."""
+    history_db = os.environ.get(HISTORY_DB_ENV)
+    if not history_db:
+        return None
+    recorder = RunRecorder(history_db, main, profile, set_up_dict)
+    recorder.start()
+    return recorder
+
+
+if __name__ == "__main__":
+    sys.exit(main())
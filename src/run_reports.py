@@ -0,0 +1,120 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run many bulk report modules in one process, sharing a database connection and SQLAlchemy engine.
+
+Usage:
+    run_reports.py [-h] [-v VERBOSE] [-c CONFIG] -r REPORTS [REPORTS ...]
+
+Example:
+    python run_reports.py -v -c /path/to/config.cfg -r report_hdm report_scrna_seq_data generate_flycyc_files
+
+Notes:
+    Report entry-point contract: a report module can be run by this host if
+    importing it does nothing but define constants and functions (no
+    set_up_db_reading() call, connection, engine or argv parsing at import),
+    and it defines "run_report(set_up_dict)". The set_up_dict has the keys
+    given by set_up_db_reading() ("database", "database_release",
+    "output_dir", "output_filename", "log", "conn", etc.), with
+    "output_filename" set for the report's own label, plus "engine": an
+    SQLAlchemy engine (connection pool) shared by all reports.
+    A hosted report must not close the connection or dispose of the engine.
+    Converted modules keep working as scripts: their __main__ block calls
+    set_up_db_reading() and then the same code path.
+
+    Reports run one after another, in the order given, logging to the host
+    log. A failed report is logged and skipped (its transaction is rolled
+    back); the exit code is 1 if any report failed. If BULK_REPORT_HISTORY_DB
+    is set, each report run is recorded in the run history (peak RSS there
+    is that of the host process so far). If BULK_REPORT_QUERY_CACHE is set,
+    query results are cached on disk (see query_cache.py).
+
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from sqlalchemy import create_engine
+from harvdev_utils.psycopg_functions import set_up_db_reading
+from query_cache import install_query_cache
+from run_history import start_run_recorder
+
+# Label for the host's own log and config; report output filenames swap in each report's label.
+HOST_LABEL = 'bulk_reports'
+# Report modules that follow the entry-point contract.
+HOSTED_REPORTS = [
+    'generate_flycyc_files',
+    'report_hdm',
+    'report_scrna_seq_data',
+]
+
+
+def main():
+    """Set up shared resources once, then run each requested report module."""
+    set_up_dict = set_up_db_reading(HOST_LABEL)
+    log = set_up_dict['log']
+    # Process more input parameters (-c and -v handled by set_up_db_reading() function above).
+    parser = argparse.ArgumentParser(description='Run report modules in one process.')
+    parser.add_argument('-r', '--reports', nargs='+', choices=HOSTED_REPORTS, default=HOSTED_REPORTS,
+                        help='Report modules to run, in order.', required=False)
+    args, extra_args = parser.parse_known_args()
+    log.info('Parsing args specific to this script; ignoring these: {}'.format(extra_args))
+
+    engine_var_rep = 'postgresql://' + set_up_dict['username'] + ":" + set_up_dict['password'] + '@' + set_up_dict['server'] + '/' + set_up_dict['database']
+    set_up_dict['engine'] = create_engine(engine_var_rep)
+    install_query_cache(set_up_dict)
+    failures = []
+    for module_name in args.reports:
+        if not run_hosted_report(module_name, set_up_dict):
+            failures.append(module_name)
+    set_up_dict['engine'].dispose()
+    set_up_dict['conn'].close()
+    if failures:
+        log.error('Failed reports: {}'.format(', '.join(failures)))
+    log.info('Ran {} reports; {} failed.'.format(len(args.reports), len(failures)))
+    return 1 if failures else 0
+
+
+def report_set_up_dict(set_up_dict, report_label):
+    """Return a copy of the host set_up_dict with the output filename for a report label.
+
+    Args:
+        arg1 (set_up_dict): (dict) The host's set_up_db_reading() dict, with the shared "engine".
+        arg2 (report_label): (str) The report's label, as used in its output filename.
+
+    Returns:
+        A set_up_dict for the report.
+
+    """
+    report_dict = dict(set_up_dict)
+    output_dir, host_filename = os.path.split(set_up_dict['output_filename'])
+    report_dict['output_filename'] = os.path.join(output_dir, host_filename.replace(HOST_LABEL, report_label, 1))
+    return report_dict
+
+
+def run_hosted_report(module_name, set_up_dict):
+    """Import a report module and run it with the shared resources, returning True if it succeeded."""
+    log = set_up_dict['log']
+    module = importlib.import_module(module_name)
+    report_label = getattr(module, 'report_label', None) or getattr(module, 'REPORT_LABEL')
+    log.info('Running report {} ({}).'.format(module_name, report_label))
+    start_time = time.perf_counter()
+    report_dict = report_set_up_dict(set_up_dict, report_label)
+    recorder = start_run_recorder(module.main, set_up_dict=report_dict)
+    status = 'ok'
+    try:
+        module.run_report(report_dict)
+    except Exception as error:
+        status = 'error: {}'.format(type(error).__name__)
+        log.exception('Report {} failed.'.format(module_name))
+        set_up_dict['conn'].rollback()
+    finally:
+        if recorder:
+            recorder.finish(status)
+    log.info('Finished report {} ({}) in {:.1f}s.'.format(module_name, status, time.perf_counter() - start_time))
+    return status == 'ok'
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Split a per-entity report loop across worker processes, then merge their output in order.
+
+Usage:
+    from sharding import run_shards, merge_parts, iter_json_parts
+
+Example:
+    group = SnapshotGroup(conn, conn_string)
+    driver_rows = connect(driver_query_with_order_by, 'no_query', conn)
+    part_filenames = run_shards(write_part, driver_rows, [i[0] for i in driver_rows], shards, group, output_filename)
+    group.close()
+    with open(output_filename, 'w') as output_file:
+        output_file.write(header)
+        merge_parts(part_filenames, output_file)
+
+Notes:
+    The leader connection heads a SnapshotGroup (see snapshot_group.py)
+    before running the driver query, so the driver rows and every worker
+    see exactly the same data. The ordered driver rows are cut into
+    contiguous ranges of about equal size, one per shard; a range boundary
+    never falls inside a run of rows with the same driver key (e.g., all
+    transcripts of one gene go to one shard). Each shard runs in its own
+    forked worker process, with its own follower connection of the group,
+    and writes its part of the output to "<part_prefix>.partNNN".
+    Concatenating the parts in shard order gives the same output as the
+    sequential loop.
+
+    The shard worker function is called as shard_worker(conn, rows,
+    part_file). It must be a module-level function (or a functools.partial
+    of one) so that it can be sent to the worker processes. Workers are
+    forked, so they inherit the script's module globals; a worker that
+    replaces a module-level connection with its own must leave the parent's
+    connection referenced elsewhere (e.g., in set_up_dict) and never close
+    it, as closing it in the worker would end the parent's session.
+
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from query_cache import reopen_query_cache
+from snapshot_group import follower_connection
+
+log = logging.getLogger(__name__)
+
+
+def shard_bounds(driver_keys, shards):
+    """Return (start, end) index ranges splitting ordered driver rows into at most N shards.
+
+    Args:
+        arg1 (driver_keys): (list) The driver key of each driver row, in processing order.
+        arg2 (shards): (int) The number of shards wanted.
+
+    Returns:
+        A list of (start, end) index pairs: contiguous, non-empty, and never splitting a run of equal keys.
+
+    """
+    bounds = []
+    start = 0
+    for shard in range(shards, 0, -1):
+        if start >= len(driver_keys):
+            break
+        end = start + max(1, round((len(driver_keys) - start) / shard))
+        while end < len(driver_keys) and driver_keys[end] == driver_keys[end - 1]:
+            end += 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def run_shard(task):
+    """Run one shard in a worker process: open a follower connection and write the part file."""
+    shard_worker, conn_string, snapshot, part_filename, rows = task
+    start_time = time.perf_counter()
+    # The parent's query cache handle must not be used across the fork.
+    query_cache = reopen_query_cache()
+    conn = follower_connection(conn_string, snapshot)
+    try:
+        with open(part_filename, 'w', newline='') as part_file:
+            shard_worker(conn, rows, part_file)
+        conn.rollback()
+    finally:
+        conn.close()
+        if query_cache:
+            query_cache.close()
+    return time.perf_counter() - start_time
+
+
+def run_shards(shard_worker, driver_rows, driver_keys, shards, group, part_prefix):
+    """Process ordered driver rows in parallel shards, each writing a part file.
+
+    Args:
+        arg1 (shard_worker): (function) Called as shard_worker(conn, rows, part_file) in each worker process.
+        arg2 (driver_rows): (list) The driver rows, in processing order.
+        arg3 (driver_keys): (list) The driver key of each row; rows with the same key stay in one shard.
+        arg4 (shards): (int) The number of worker processes.
+        arg5 (group): (SnapshotGroup) The group led by the connection that ran the driver query.
+        arg6 (part_prefix): (str) Path prefix for part files (usually the output filename).
+
+    Returns:
+        The list of part filenames, in shard order.
+
+    Raises:
+        Re-raises the first error of any shard, after removing the part files.
+
+    """
+    bounds = shard_bounds(driver_keys, shards)
+    part_filenames = ['{}.part{:03d}'.format(part_prefix, i) for i in range(len(bounds))]
+    tasks = [(shard_worker, group.conn_string, group.snapshot, part_filename, driver_rows[start:end])
+             for part_filename, (start, end) in zip(part_filenames, bounds)]
+    if not tasks:
+        return []
+    log.info('Processing {} driver rows in {} shards.'.format(len(driver_rows), len(tasks)))
+    start_time = time.perf_counter()
+    try:
+        # Fork, so workers inherit the script's globals without rerunning its module-level set-up.
+        with multiprocessing.get_context('fork').Pool(len(tasks)) as pool:
+            shard_seconds = pool.map(run_shard, tasks, chunksize=1)
+    except Exception:
+        remove_parts(part_filenames)
+        raise
+    for part_filename, (start, end), seconds in zip(part_filenames, bounds, shard_seconds):
+        log.info('Shard {}: {} driver rows in {:.1f}s.'.format(part_filename, end - start, seconds))
+    log.info('All shards done in {:.1f}s.'.format(time.perf_counter() - start_time))
+    return part_filenames
+
+
+def remove_parts(part_filenames):
+    """Remove the part files that exist."""
+    for part_filename in part_filenames:
+        if os.path.exists(part_filename):
+            os.remove(part_filename)
+    return
+
+
+def merge_parts(part_filenames, output_file):
+    """Append part files to an open output file, in order, removing each once copied."""
+    for part_filename in part_filenames:
+        with open(part_filename, newline='') as part_file:
+            shutil.copyfileobj(part_file, output_file)
+        os.remove(part_filename)
+    return
+
+
+def iter_json_parts(part_filenames):
+    """Yield the records of JSON-lines part files, in order, removing each once read."""
+    for part_filename in part_filenames:
+        with open(part_filename) as part_file:
+            for line in part_file:
+                yield json.loads(line)
+        os.remove(part_filename)
+    return
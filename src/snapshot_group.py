@@ -0,0 +1,197 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Give parallel report workers connections that all see one consistent snapshot of the database.
+
+Usage:
+    from snapshot_group import SnapshotGroup, snapshot_group
+
+Example:
+    set_up_dict = set_up_db_reading(report_label)
+    with snapshot_group(set_up_dict, followers=4) as group:
+        results = group.map(get_dataset_rows, dataset_ids)
+
+    group = SnapshotGroup(conn, conn_string)
+    follower_conn = follower_connection(group.conn_string, group.snapshot)    # e.g., in another process
+
+Notes:
+    The leader connection (usually set_up_dict['conn']) starts a REPEATABLE
+    READ, read-only transaction and exports its snapshot
+    (pg_export_snapshot()). Each follower connection imports that snapshot
+    into its own REPEATABLE READ, read-only transaction (SET TRANSACTION
+    SNAPSHOT), so the leader and all followers see exactly the same data,
+    whatever else happens to the database during the run.
+
+    The snapshot can only be imported while the leader's transaction is
+    open, and a follower only sees it until its own transaction ends: the
+    leader must not commit or roll back until the group is closed, and a
+    follower must not commit or roll back mid-work. Followers are for
+    reading only.
+
+    Followers can be plain psycopg2 connections (group.followers,
+    group.connect_follower(), or follower_connection() in a worker
+    process given the group's conn_string and snapshot), or the pooled
+    connections of an SQLAlchemy engine (group.create_engine()), which
+    import the snapshot each time a connection is checked out. The
+    group.map() method fans a function out over the followers, one thread
+    per follower.
+
+"""
+
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+import psycopg2.extensions
+try:
+    from sqlalchemy import create_engine, event
+except ImportError:
+    create_engine = None
+
+log = logging.getLogger(__name__)
+
+
+def conn_string_from_set_up(set_up_dict):
+    """Return a psycopg2 connection string for the database of a set_up_db_reading() dict."""
+    return "host={} dbname={} user={} password='{}'".format(set_up_dict['server'], set_up_dict['database'],
+                                                            set_up_dict['username'], set_up_dict['password'])
+
+
+def export_snapshot(conn):
+    """Start a REPEATABLE READ, read-only transaction on a leader connection and export its snapshot.
+
+    Args:
+        arg1 (conn): (psycopg2 connection) The leader connection; its current transaction is rolled back.
+
+    Returns:
+        The snapshot ID, valid until the leader's transaction ends.
+
+    """
+    conn.rollback()
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    # A plain cursor: the snapshot ID differs on each call, so it must never come from the query cache.
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    cursor.execute('SELECT pg_export_snapshot()')
+    snapshot = cursor.fetchone()[0]
+    cursor.close()
+    log.info('Exported snapshot {}.'.format(snapshot))
+    return snapshot
+
+
+def import_snapshot(conn, snapshot):
+    """Start a REPEATABLE READ, read-only transaction on a connection, using an exported snapshot."""
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    cursor.execute('SET TRANSACTION SNAPSHOT %s', (snapshot, ))
+    cursor.close()
+    return
+
+
+def follower_connection(conn_string, snapshot):
+    """Open a new connection that reads from an exported snapshot (usable in any process)."""
+    conn = psycopg2.connect(conn_string)
+    import_snapshot(conn, snapshot)
+    return conn
+
+
+class SnapshotGroup(object):
+    """A leader connection and any number of follower connections, all on the leader's snapshot."""
+
+    def __init__(self, leader, conn_string, followers=0):
+        """Export the leader's snapshot and open the follower connections.
+
+        Args:
+            arg1 (leader): (psycopg2 connection) The leader connection; its current transaction is rolled back.
+            arg2 (conn_string): (str) The psycopg2 connection string for follower connections.
+            arg3 (followers): (int) The number of follower connections to open now.
+
+        """
+        self.leader = leader
+        self.conn_string = conn_string
+        self.snapshot = export_snapshot(leader)
+        self.followers = []
+        self.engines = []
+        for i in range(followers):
+            self.followers.append(self.connect_follower())
+
+    def __enter__(self):
+        """Return the group."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the group."""
+        self.close()
+        return False
+
+    def connect_follower(self):
+        """Open a new follower connection (closed by the caller, or by close() if added to self.followers)."""
+        return follower_connection(self.conn_string, self.snapshot)
+
+    def create_engine(self, **kwargs):
+        """Return an SQLAlchemy engine whose pooled connections read from the snapshot (disposed of by close())."""
+        if create_engine is None:
+            raise RuntimeError('SQLAlchemy is needed for a snapshot engine.')
+        engine = create_engine('postgresql+psycopg2://', creator=lambda: psycopg2.connect(self.conn_string), **kwargs)
+
+        @event.listens_for(engine, 'checkout')
+        def import_on_checkout(dbapi_connection, connection_record, connection_proxy):
+            # The pool ends the transaction when a connection is returned, so import the snapshot on each checkout.
+            dbapi_connection.rollback()
+            import_snapshot(dbapi_connection, self.snapshot)
+
+        self.engines.append(engine)
+        return engine
+
+    def map(self, function, items):
+        """Call function(conn, item) for each item, in threads each using one follower connection.
+
+        Args:
+            arg1 (function): (function) Called with a follower connection and an item; must not commit or roll back.
+            arg2 (items): (iterable) The items.
+
+        Returns:
+            The list of results, in item order.
+
+        """
+        if not self.followers:
+            self.followers.append(self.connect_follower())
+        idle_followers = queue.Queue()
+        for follower in self.followers:
+            idle_followers.put(follower)
+
+        def call_with_follower(item):
+            follower = idle_followers.get()
+            try:
+                return function(follower, item)
+            finally:
+                idle_followers.put(follower)
+
+        with ThreadPoolExecutor(max_workers=len(self.followers)) as executor:
+            return list(executor.map(call_with_follower, items))
+
+    def close(self):
+        """Close the followers and engines, then end the leader's transaction and restore its session defaults."""
+        for follower in self.followers:
+            follower.rollback()
+            follower.close()
+        self.followers = []
+        for engine in self.engines:
+            engine.dispose()
+        self.engines = []
+        self.leader.rollback()
+        self.leader.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+        log.info('Released snapshot {}.'.format(self.snapshot))
+        return
+
+
+def snapshot_group(set_up_dict, followers=0):
+    """Return a SnapshotGroup led by the connection of a set_up_db_reading() dict.
+
+    Args:
+        arg1 (set_up_dict): (dict) The dict returned by set_up_db_reading().
+        arg2 (followers): (int) The number of follower connections to open now.
+
+    Returns:
+        A SnapshotGroup.
+
+    """
+    return SnapshotGroup(set_up_dict['conn'], conn_string_from_set_up(set_up_dict), followers=followers)
@@ -0,0 +1,594 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Stream bulk report data to file as it is produced.
+
+Usage:
+    from streaming_output import StreamingJSONWriter, StreamingTSVWriter, tsv_report_stream
+
+Example:
+    with StreamingTSVWriter(output_filename, report_title, database, header_list) as writer:
+        writer.write_rows(row for row in some_generator())
+
+    data_to_export_as_tsv = generic_FB_tsv_dict(report_title, database)
+    data_to_export_as_tsv['data'] = some_generator()
+    tsv_report_stream(data_to_export_as_tsv, output_filename, headers=header_list)
+
+    with StreamingJSONWriter(output_filename, {'metaData': meta_data}, indent=2, separators=(',', ': ')) as writer:
+        writer.write_records(record for record in some_generator())
+
+Notes:
+    The TSV writer reproduces the header, footer and line endings ('\\r\\n'
+    for the column header and data rows, from csv.DictWriter) written by the
+    harvdev_utils tsv_report_dump() function, but it accepts any iterable of
+    dicts or tuples for the data, so rows never need to be collected into one
+    big list before writing. Rows are formatted by the csv module in blocks of
+    BLOCK_SIZE rows and written through a large output buffer. Reports with
+    millions of rows that share most of their fields (e.g., all genes of one
+    scRNA-Seq cluster) can instead encode the shared fields once with
+    encode_tsv_fields() and pass ready-made lines (without the line
+    terminator) to write_lines(), or to tsv_report_stream() with
+    encoded=True; the output is the same as for the csv module.
+
+    The JSON writer emits the top-level keys (e.g., "metaData"), then each
+    record of the "data" array as it is produced, then the closing brackets.
+    With the same indent/separators/sort_keys settings, its output is
+    identical to json.dump() of the fully built dict. A compact mode drops
+    all whitespace, and the optional "orjson" backend (if installed) speeds
+    up encoding for the layouts it supports.
+
+    Both writers can gzip their output in-process and write a manifest next
+    to it. Compression is done by a thread pool in independent blocks that
+    are written out as consecutive gzip members, which standard gzip/zcat
+    and Python's gzip module read as one stream. The manifest records the
+    byte size, row/record count and SHA-256 of the file, all computed while
+    writing. The "compress" and "manifest" keyword args default to the
+    BULK_REPORT_COMPRESS and BULK_REPORT_MANIFEST environment variables
+    (set to "1", "true" or "yes" to enable), so that the pipeline can turn
+    them on without changes to each script. The row/record count and
+    uncompressed size of each finished file are also kept in
+    finished_outputs, so that the run history (see run_history.py) need not
+    read the file again.
+
+"""
+
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+# Default sizes for buffered output.
+BUFFER_SIZE = 1 << 20    # Bytes held in the output file buffer between writes.
+BLOCK_SIZE = 10000       # Rows formatted per csv writerows() call.
+GZIP_BLOCK_SIZE = 1 << 22    # Uncompressed bytes per independently compressed gzip member.
+GZIP_LEVEL = 6
+
+# Characters that make the csv module quote a TSV field (with the '\r\n' line terminator of csv.DictWriter and the TSV writer).
+TSV_QUOTED_CHARACTERS = ('"', '\n', '\r')
+
+# Absolute path-keyed dict of (rows or records, uncompressed bytes) of the files finished by the writers (see run_history.py).
+finished_outputs = {}
+
+
+def env_flag(name):
+    """Return True if an environment variable is set to a "true" value."""
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def encode_tsv_fields(fields):
+    """Return str fields as one tab-separated line fragment, quoted as the csv module would, without a line terminator.
+
+    Args:
+        fields (tuple): The str fields, in header order.
+
+    Returns:
+        The encoded text: e.g., a row prefix, or a whole line for write_lines().
+
+    """
+    text = '\t'.join(fields)
+    if text.count('\t') == len(fields) - 1 and not any(i in text for i in TSV_QUOTED_CHARACTERS):
+        return text
+    # Rare fields with tabs, quotes or line breaks: let the csv module quote them.
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter='\t', lineterminator='\r\n').writerow(fields)
+    return buffer.getvalue()[:-2]
+
+
+class HashingOutputSink(io.RawIOBase):
+    """A binary output file that counts and hashes bytes, optionally gzipping them in parallel."""
+
+    def __init__(self, output_filename, compress=False, threads=None, level=GZIP_LEVEL, block_size=GZIP_BLOCK_SIZE):
+        """Open the output file.
+
+        Args:
+            output_filename (str): The output file path.
+            compress (bool): Gzip the output.
+            threads (int): Number of compression threads; default is the CPU count.
+            level (int): Gzip compression level.
+            block_size (int): Uncompressed bytes per gzip member.
+
+        """
+        super().__init__()
+        self.output_filename = output_filename
+        self.compress = compress
+        self.level = level
+        self.block_size = block_size
+        self.raw_file = open(output_filename, 'wb')
+        self.uncompressed_bytes = 0
+        self.uncompressed_sha256 = hashlib.sha256()
+        self.file_bytes = 0
+        self.file_sha256 = hashlib.sha256()
+        if compress:
+            self.threads = threads or os.cpu_count() or 1
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+            self.pending_block = bytearray()
+            self.jobs = []    # Compression futures, in output order.
+
+    def writable(self):
+        """Report that this stream is writable."""
+        return True
+
+    def write(self, data):
+        """Count, hash and write (or queue for compression) a chunk of bytes."""
+        data = bytes(data)
+        self.uncompressed_bytes += len(data)
+        self.uncompressed_sha256.update(data)
+        if not self.compress:
+            self._write_to_file(data)
+            return len(data)
+        self.pending_block += data
+        while len(self.pending_block) >= self.block_size:
+            self._submit_block(bytes(self.pending_block[:self.block_size]))
+            del self.pending_block[:self.block_size]
+        self._drain_jobs(wait=False)
+        return len(data)
+
+    def _write_to_file(self, data):
+        """Write bytes to disk, updating the on-disk size and hash."""
+        self.raw_file.write(data)
+        self.file_bytes += len(data)
+        self.file_sha256.update(data)
+        return
+
+    def _submit_block(self, block):
+        """Compress a block as a gzip member in the thread pool; zlib releases the GIL."""
+        self.jobs.append(self.executor.submit(gzip.compress, block, self.level, mtime=0))
+        return
+
+    def _drain_jobs(self, wait):
+        """Write out finished blocks in order; when waiting, also bound the number in flight."""
+        max_in_flight = 0 if wait else 2 * self.threads
+        while self.jobs and (self.jobs[0].done() or len(self.jobs) > max_in_flight):
+            self._write_to_file(self.jobs.pop(0).result())
+        return
+
+    def close(self):
+        """Compress any remaining data and close the file."""
+        if self.closed:
+            return
+        if self.compress:
+            if self.pending_block or not self.uncompressed_bytes:
+                self._submit_block(bytes(self.pending_block))
+                self.pending_block = bytearray()
+            self._drain_jobs(wait=True)
+            self.executor.shutdown()
+        self.raw_file.close()
+        super().close()
+        return
+
+    def manifest(self):
+        """Return a dict of size and checksum info for the output file."""
+        return {
+            'file': os.path.basename(self.output_filename),
+            'bytes': self.file_bytes,
+            'sha256': self.file_sha256.hexdigest(),
+            'compression': 'gzip' if self.compress else None,
+            'uncompressed_bytes': self.uncompressed_bytes,
+            'uncompressed_sha256': self.uncompressed_sha256.hexdigest(),
+        }
+
+
+def open_output_stream(output_filename, **kwargs):
+    """Open a buffered text stream over a HashingOutputSink.
+
+    Args:
+        output_filename (str): The output file path; ".gz" is appended when compressing.
+
+    Keyword Args:
+        compress (bool): Gzip the output; default from BULK_REPORT_COMPRESS.
+        compress_threads (int): Number of compression threads.
+        compress_level (int): Gzip compression level.
+        buffer_size (int): Text stream buffer size, in bytes.
+
+    Returns:
+        A (text stream, HashingOutputSink) tuple.
+
+    """
+    compress = kwargs.get('compress', env_flag('BULK_REPORT_COMPRESS'))
+    if compress and not output_filename.endswith('.gz'):
+        output_filename += '.gz'
+    sink = HashingOutputSink(output_filename, compress=compress, threads=kwargs.get('compress_threads'),
+                             level=kwargs.get('compress_level', GZIP_LEVEL))
+    buffered = io.BufferedWriter(sink, buffer_size=kwargs.get('buffer_size', BUFFER_SIZE))
+    return io.TextIOWrapper(buffered), sink
+
+
+def write_manifest(sink, count, count_type, **kwargs):
+    """Write a JSON manifest next to a closed output file.
+
+    Args:
+        sink (HashingOutputSink): The closed sink for the output file.
+        count (int): The number of data rows or records written.
+        count_type (str): What was counted: e.g., 'rows' or 'records'.
+
+    Keyword Args:
+        manifest (bool): Write the manifest; default from BULK_REPORT_MANIFEST.
+
+    Returns:
+        The manifest dict, or None if no manifest was requested.
+
+    """
+    if not kwargs.get('manifest', env_flag('BULK_REPORT_MANIFEST')):
+        return None
+    manifest = sink.manifest()
+    manifest[count_type] = count
+    manifest['dateProduced'] = datetime.datetime.now().isoformat(timespec='seconds')
+    manifest_filename = '{}.manifest.json'.format(sink.output_filename)
+    with open(manifest_filename, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+        manifest_file.write('\n')
+    log.info('Wrote manifest {}: {} bytes, {} {}, sha256 {}.'.format(manifest_filename, manifest['bytes'], count,
+                                                                     count_type, manifest['sha256']))
+    return manifest
+
+
+class StreamingTSVWriter(object):
+    """Write a FlyBase TSV report one row (or block of rows) at a time."""
+
+    def __init__(self, output_filename, report_title, database, headers, **kwargs):
+        """Open the output file and write the standard FlyBase TSV header.
+
+        Args:
+            output_filename (str): The output file path.
+            report_title (str): The report title, as for generic_FB_tsv_dict().
+            database (str): The database name, reported as the datasource.
+            headers (list): The column headers; also the key order for dict rows.
+
+        Keyword Args:
+            notes (str|list): Note(s) to print in the file header.
+            date_produced (str): Override the "Generated" timestamp.
+            lineterminator (str): Line ending for the column header and data rows; default is '\\r\\n', as for csv.DictWriter.
+            buffer_size (int): Output file buffer size, in bytes.
+            block_size (int): Number of rows formatted per write.
+            compress, compress_threads, compress_level: See open_output_stream().
+            manifest (bool): See write_manifest().
+
+        """
+        self.output_filename = output_filename
+        self.report_title = report_title
+        self.database = database
+        self.headers = list(headers)
+        self.notes = kwargs.get('notes')
+        self.date_produced = kwargs.get('date_produced', datetime.datetime.now().strftime("%a %b %d %H:%M:%S %Y"))
+        self.lineterminator = kwargs.get('lineterminator', '\r\n')
+        self.block_size = kwargs.get('block_size', BLOCK_SIZE)
+        self.output_kwargs = kwargs
+        self.row_count = 0                 # Number of data rows written.
+        self.elapsed_seconds = None        # Total time spent between open and close.
+        self.manifest = None               # Size/checksum info, if a manifest was written.
+        self.closed = False
+        self.start_time = time.perf_counter()
+        log.info('Opening {} for streaming TSV output.'.format(self.output_filename))
+        self.output_file, self.sink = open_output_stream(self.output_filename, **kwargs)
+        self.output_filename = self.sink.output_filename
+        self.csv_writer = csv.writer(self.output_file, delimiter='\t', lineterminator=self.lineterminator)
+        self.write_header()
+
+    def __enter__(self):
+        """Support use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the file; only write the footer if no error occurred."""
+        self.close(write_footer=exc_type is None)
+        return False
+
+    def write_header(self):
+        """Write the "##" header lines, notes and column headers."""
+        self.output_file.write('## {}\n'.format(self.report_title))
+        self.output_file.write('## Generated: {}\n'.format(self.date_produced))
+        self.output_file.write('## Using datasource: {}\n'.format(self.database))
+        if self.notes:
+            notes = self.notes if isinstance(self.notes, list) else [self.notes]
+            for note in notes:
+                self.output_file.write('## Note: {}\n'.format(note))
+        self.output_file.write('##\n## ')
+        self.csv_writer.writerow(self.headers)
+        return
+
+    def _as_sequence(self, row):
+        """Convert a dict row into a header-ordered list; pass tuples/lists through."""
+        if isinstance(row, dict):
+            return [row.get(header, '') for header in self.headers]
+        return row
+
+    def write_row(self, row):
+        """Write a single dict or tuple row."""
+        self.csv_writer.writerow(self._as_sequence(row))
+        self.row_count += 1
+        return
+
+    def write_rows(self, rows):
+        """Write an iterable of dict or tuple rows, one block at a time.
+
+        Args:
+            rows (iterable): Dicts keyed by header, or tuples in header order.
+
+        Returns:
+            The number of rows written by this call.
+
+        """
+        rows = iter(rows)
+        this_count = 0
+        while True:
+            block = [self._as_sequence(row) for row in islice(rows, self.block_size)]
+            if not block:
+                break
+            self.csv_writer.writerows(block)
+            this_count += len(block)
+        self.row_count += this_count
+        return this_count
+
+    def write_lines(self, lines):
+        """Write an iterable of already encoded rows (see encode_tsv_fields()), one block at a time.
+
+        Each row is ended with the writer's lineterminator, as csv.writer rows are.
+
+        Args:
+            lines (iterable): Encoded rows in header order, without line terminators.
+
+        Returns:
+            The number of rows written by this call.
+
+        """
+        lines = iter(lines)
+        this_count = 0
+        while True:
+            block = list(islice(lines, self.block_size))
+            if not block:
+                break
+            block.append('')
+            self.output_file.write(self.lineterminator.join(block))
+            this_count += len(block) - 1
+        self.row_count += this_count
+        return this_count
+
+    def close(self, write_footer=True):
+        """Write the footer, close the file and log row count and timing."""
+        if self.closed:
+            return
+        if write_footer:
+            self.output_file.write('## Finished {}.'.format(self.report_title))
+        self.output_file.close()
+        self.closed = True
+        self.elapsed_seconds = time.perf_counter() - self.start_time
+        log.info('Wrote {} rows to {} in {:.2f}s.'.format(self.row_count, self.output_filename, self.elapsed_seconds))
+        if write_footer:
+            finished_outputs[os.path.abspath(self.output_filename)] = (self.row_count, self.sink.uncompressed_bytes)
+            self.manifest = write_manifest(self.sink, self.row_count, 'rows', **self.output_kwargs)
+        return
+
+
+def tsv_report_stream(tsv_data_object, output_filename, **kwargs):
+    """Streaming counterpart of the harvdev_utils tsv_report_dump() function.
+
+    Args:
+        tsv_data_object (dict): A generic_FB_tsv_dict() dict; its 'data' value
+            may be a list, generator or any other iterable of dicts or tuples.
+        output_filename (str): The output file path.
+
+    Keyword Args:
+        headers (list): The column headers. Required unless data rows are dicts,
+            in which case the keys of the first row are used.
+        encoded (bool): The data rows are already encoded lines, for write_lines().
+        Other keyword args are passed on to StreamingTSVWriter.
+
+    Returns:
+        The StreamingTSVWriter used, so that callers can read its row_count
+        and elapsed_seconds.
+
+    """
+    meta_data = tsv_data_object['metaData']
+    rows = iter(tsv_data_object['data'])
+    headers = kwargs.pop('headers', None)
+    encoded = kwargs.pop('encoded', False)
+    if headers is None:
+        try:
+            first_row = next(rows)
+        except StopIteration:
+            log.error('No headers given and no data from which to derive them.')
+            raise
+        headers = list(first_row.keys())
+        rows = _chain_first(first_row, rows)
+    kwargs.setdefault('notes', meta_data.get('note'))
+    kwargs.setdefault('date_produced', meta_data['dateProduced'])
+    writer = StreamingTSVWriter(output_filename, meta_data['title'], meta_data['database'], headers, **kwargs)
+    with writer:
+        if encoded:
+            writer.write_lines(rows)
+        else:
+            writer.write_rows(rows)
+    return writer
+
+
+def _chain_first(first_row, rows):
+    """Yield a row that was peeked at, then the rest."""
+    yield first_row
+    yield from rows
+
+
+class StreamingJSONWriter(object):
+    """Write a FlyBase JSON report with its data array encoded one record at a time."""
+
+    def __init__(self, output_filename, header_dict, data_key='data', **kwargs):
+        """Open the output file and write everything that precedes the data array.
+
+        Args:
+            output_filename (str): The output file path.
+            header_dict (dict): The top-level keys other than the data array (e.g., {'metaData': {...}}).
+            data_key (str): The top-level key for the streamed array of records.
+
+        Keyword Args:
+            indent (int): Pretty-print indent, as for json.dump(); default is 2.
+            separators (tuple): Item and key separators, as for json.dump().
+            sort_keys (bool): Sort dict keys, as for json.dump(); default is False.
+            ensure_ascii (bool): Escape non-ASCII characters; default is False.
+            compact (bool): Write with no whitespace at all (ignores indent/separators).
+            backend (str): 'json' (default) or 'orjson' for faster encoding.
+            buffer_size (int): Output file buffer size, in bytes.
+            compress, compress_threads, compress_level: See open_output_stream().
+            manifest (bool): See write_manifest().
+
+        """
+        self.output_filename = output_filename
+        self.data_key = data_key
+        self.sort_keys = kwargs.get('sort_keys', False)
+        self.ensure_ascii = kwargs.get('ensure_ascii', False)
+        if kwargs.get('compact', False):
+            self.indent = None
+            self.separators = (',', ':')
+        else:
+            self.indent = kwargs.get('indent', 2)
+            default_separators = (', ', ': ') if self.indent is None else (',', ': ')
+            self.separators = kwargs.get('separators', default_separators)
+        self.indent_str = ' ' * self.indent if isinstance(self.indent, int) else self.indent
+        self.encode_value = self._pick_encoder(kwargs.get('backend', 'json'))
+        self.output_kwargs = kwargs
+        self.record_count = 0
+        self.elapsed_seconds = None
+        self.manifest = None
+        self.closed = False
+        self.start_time = time.perf_counter()
+        # Split top-level keys into those written before and after the data array.
+        top_level_keys = [key for key in header_dict.keys() if key != data_key] + [data_key]
+        if self.sort_keys:
+            top_level_keys.sort()
+        data_position = top_level_keys.index(data_key)
+        self.keys_before = [(key, header_dict[key]) for key in top_level_keys[:data_position]]
+        self.keys_after = [(key, header_dict[key]) for key in top_level_keys[data_position + 1:]]
+        log.info('Opening {} for streaming JSON output.'.format(self.output_filename))
+        self.output_file, self.sink = open_output_stream(self.output_filename, **kwargs)
+        self.output_filename = self.sink.output_filename
+        self.output_file.write('{')
+        for key, value in self.keys_before:
+            self.output_file.write(self._member(key, value))
+            self.output_file.write(self.separators[0])
+        self.output_file.write('{}{}{}['.format(self._newline(1), self._dumps_key(data_key), self.separators[1]))
+
+    def __enter__(self):
+        """Support use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the file; only write the closing brackets if no error occurred."""
+        self.close(finish=exc_type is None)
+        return False
+
+    def _pick_encoder(self, backend):
+        """Return a function that encodes a value at the top level of indentation."""
+        if backend == 'orjson':
+            orjson_layout_ok = (self.indent is None and self.separators == (',', ':')) or \
+                (self.indent in (2, '  ') and self.separators == (',', ': '))
+            if not orjson_layout_ok:
+                raise ValueError('The orjson backend only supports compact output, or indent=2 with separators=(",", ": ").')
+            if self.ensure_ascii:
+                raise ValueError('The orjson backend does not support ensure_ascii=True.')
+            if orjson is None:
+                log.warning('The orjson package is not installed; using the standard json encoder instead.')
+            else:
+                option = orjson.OPT_NON_STR_KEYS
+                if self.indent is not None:
+                    option |= orjson.OPT_INDENT_2
+                if self.sort_keys:
+                    option |= orjson.OPT_SORT_KEYS
+                return lambda value: orjson.dumps(value, option=option).decode('utf-8')
+        elif backend != 'json':
+            raise ValueError('Unknown JSON encoder backend: {}'.format(backend))
+        encoder = json.JSONEncoder(indent=self.indent, separators=self.separators,
+                                   sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii)
+        return encoder.encode
+
+    def _newline(self, depth):
+        """Return the line break and indentation for a given nesting depth."""
+        if self.indent is None:
+            return ''
+        return '\n' + self.indent_str * depth
+
+    def _dumps_key(self, key):
+        """Encode a top-level key."""
+        return json.dumps(key, ensure_ascii=self.ensure_ascii)
+
+    def _encode(self, value, depth):
+        """Encode a value and re-indent it for the given nesting depth."""
+        text = self.encode_value(value)
+        if self.indent is not None:
+            text = text.replace('\n', self._newline(depth))
+        return text
+
+    def _member(self, key, value):
+        """Encode a top-level key-value pair."""
+        return '{}{}{}{}'.format(self._newline(1), self._dumps_key(key), self.separators[1], self._encode(value, 1))
+
+    def write_record(self, record):
+        """Write one element of the data array."""
+        if self.record_count:
+            self.output_file.write(self.separators[0])
+        self.output_file.write(self._newline(2))
+        self.output_file.write(self._encode(record, 2))
+        self.record_count += 1
+        return
+
+    def write_records(self, records):
+        """Write an iterable of records to the data array.
+
+        Returns:
+            The number of records written by this call.
+
+        """
+        before = self.record_count
+        for record in records:
+            self.write_record(record)
+        return self.record_count - before
+
+    def close(self, finish=True):
+        """Write the closing brackets and any trailing top-level keys, then close the file."""
+        if self.closed:
+            return
+        if finish:
+            if self.record_count:
+                self.output_file.write(self._newline(1))
+            self.output_file.write(']')
+            for key, value in self.keys_after:
+                self.output_file.write(self.separators[0])
+                self.output_file.write(self._member(key, value))
+            self.output_file.write('{}}}'.format(self._newline(0)))
+        self.output_file.close()
+        self.closed = True
+        self.elapsed_seconds = time.perf_counter() - self.start_time
+        log.info('Wrote {} records to {} in {:.2f}s.'.format(self.record_count, self.output_filename, self.elapsed_seconds))
+        if finish:
+            finished_outputs[os.path.abspath(self.output_filename)] = (self.record_count, self.sink.uncompressed_bytes)
+            self.manifest = write_manifest(self.sink, self.record_count, 'records', **self.output_kwargs)
+        return